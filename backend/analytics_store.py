@@ -0,0 +1,429 @@
+# -*- coding: utf-8 -*-
+# -*- Python Version: 3.11 -*-
+
+"""An optional, local SQLite store of every processed project's 'Variants' data, for portfolio queries.
+
+Each workbook is stored once, by its SHA-256: ingesting the same file again is a no-op. The
+numeric values are kept in one narrow table ('variant_values'), indexed by project, variant and
+metric (the Datatype label, its Units and its occurrence on the worksheet), and the 'metric_values'
+view joins them back up by name. Projects can carry free-form attributes (ie: climate, building
+type) to group by.
+
+Usage:
+    python -m backend.analytics_store portfolio.sqlite ingest archive/*.xlsx --attr building_type=Multifamily
+    python -m backend.analytics_store portfolio.sqlite tag <file-sha256> climate=4A
+    python -m backend.analytics_store portfolio.sqlite query "SELECT ... FROM metric_values ..." --csv
+
+Example (the median heating demand per TFA, by climate):
+    SELECT a.value AS climate, m.variant, m.value / m.tfa AS kwh_per_m2
+    FROM metric_values m JOIN project_attributes a ON a.project_id = m.project_id AND a.name = 'climate'
+    WHERE m.datatype = 'Heating Demand'
+"""
+
+import argparse
+import csv
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+import pathlib
+import queue
+import sqlite3
+import sys
+import threading
+import time
+from typing import TYPE_CHECKING, Iterable
+
+if TYPE_CHECKING:
+    # -- Only for type-checking: importing backend.read_phpp pulls in pandas
+    from backend.read_phpp import PHPPData
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS projects (
+    project_id INTEGER PRIMARY KEY,
+    file_sha256 TEXT NOT NULL UNIQUE,
+    file_name TEXT,
+    ingested_at TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS project_attributes (
+    project_id INTEGER NOT NULL REFERENCES projects ON DELETE CASCADE,
+    name TEXT NOT NULL,
+    value TEXT,
+    PRIMARY KEY (project_id, name)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS project_attributes_by_name ON project_attributes (name, value);
+CREATE TABLE IF NOT EXISTS variants (
+    variant_id INTEGER PRIMARY KEY,
+    project_id INTEGER NOT NULL REFERENCES projects ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    tfa REAL,
+    UNIQUE (project_id, position)
+);
+CREATE INDEX IF NOT EXISTS variants_by_name ON variants (name);
+CREATE TABLE IF NOT EXISTS metrics (
+    metric_id INTEGER PRIMARY KEY,
+    datatype TEXT NOT NULL,
+    units TEXT NOT NULL,
+    occurrence INTEGER NOT NULL,
+    UNIQUE (datatype, units, occurrence)
+);
+CREATE TABLE IF NOT EXISTS variant_values (
+    project_id INTEGER NOT NULL REFERENCES projects ON DELETE CASCADE,
+    metric_id INTEGER NOT NULL REFERENCES metrics,
+    variant_id INTEGER NOT NULL REFERENCES variants ON DELETE CASCADE,
+    excel_row INTEGER NOT NULL,
+    value REAL NOT NULL,
+    PRIMARY KEY (project_id, metric_id, variant_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS variant_values_by_metric ON variant_values (metric_id, variant_id);
+CREATE INDEX IF NOT EXISTS variant_values_by_variant ON variant_values (variant_id);
+CREATE VIEW IF NOT EXISTS metric_values AS
+    SELECT p.project_id, p.file_sha256, p.file_name, v.name AS variant, v.position AS variant_position, v.tfa,
+        m.datatype, m.units, m.occurrence, x.excel_row, x.value
+    FROM variant_values x
+    JOIN projects p USING (project_id)
+    JOIN variants v USING (variant_id)
+    JOIN metrics m USING (metric_id);
+"""
+
+# -- The name of the joined-up view, to query by Datatype / Variant name
+VALUES_VIEW = "metric_values"
+
+# -- A read-only query is stopped after this many SQLite VM steps (x1000), so one query cannot hold the server
+QUERY_MAX_STEPS = 50_000
+
+
+@dataclass
+class ProjectRecord:
+    """One project's data, flattened for the store: one (excel_row, datatype, units, occurrence, variant, value)
+    per numeric value in the 'Variants' worksheet data."""
+
+    file_sha256: str
+    file_name: str | None
+    variant_names: list[str]
+    variant_tfa: list[float | None]
+    values: list[tuple[int, str, str, int, int, float]]
+    attributes: dict[str, str] = field(default_factory=dict)
+
+
+def project_record(
+    _phpp_data: "PHPPData", _file_sha256: str, _file_name: str | None = None, _attributes: dict | None = None
+) -> ProjectRecord:
+    """Return the project's numeric 'Variants' data, flattened for the store.
+
+    The values are read directly from the compact (rows, variants) float array: only the
+    non-NaN cells of labelled rows are kept.
+
+    Arguments:
+    ----------
+        * _phpp_data (PHPPData): The PHPPData object with all the data from the PHPP.
+        * _file_sha256 (str): The SHA-256 (hex) of the workbook file.
+        * _file_name (str | None): The workbook's file name.
+        * _attributes (dict | None): Any attributes of the project (ie: {"climate": "4A"}).
+
+    Returns:
+    --------
+        * (ProjectRecord): The flattened project.
+    """
+    import numpy as np
+
+    table = _phpp_data.compact_tables()["df_main"]
+    variant_names = [str(name) for name in _phpp_data.variant_names]
+    values = table.numeric_array(list(_phpp_data.variant_names))
+
+    datatypes = table.labels[table.columns.get_loc("Datatype")]
+    units = table.labels[table.columns.get_loc("Units")]
+    labelled = datatypes.codes >= 0
+    occurrence = np.zeros(len(datatypes), dtype=int)
+    counts: dict[int, int] = {}
+    for row, code in enumerate(datatypes.codes.tolist()):
+        occurrence[row] = counts.get(code, 0)
+        counts[code] = occurrence[row] + 1
+
+    rows, columns = np.nonzero(~np.isnan(values) & labelled[:, None])
+    excel_rows = table.index.to_numpy()[rows].tolist()
+    row_datatypes = np.asarray(datatypes.take(rows), dtype=object).tolist()
+    row_units = [u if isinstance(u, str) else "" for u in np.asarray(units.take(rows), dtype=object).tolist()]
+
+    tfa = _phpp_data.df_tfa
+    variant_tfa = [float(v) if isinstance(v, (int, float)) else None for v in tfa.reindex(_phpp_data.variant_names)]
+
+    return ProjectRecord(
+        file_sha256=_file_sha256,
+        file_name=_file_name,
+        variant_names=variant_names,
+        variant_tfa=variant_tfa,
+        values=list(
+            zip(
+                excel_rows,
+                row_datatypes,
+                row_units,
+                occurrence[rows].tolist(),
+                columns.tolist(),
+                values[rows, columns].tolist(),
+            )
+        ),
+        attributes=dict(_attributes or {}),
+    )
+
+
+class AnalyticsStore:
+    """A SQLite file holding the numeric 'Variants' data of every ingested project. Safe to share between threads."""
+
+    def __init__(self, path: str | pathlib.Path):
+        self.path = pathlib.Path(path)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA foreign_keys=ON")
+        self._conn.executescript(SCHEMA)
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    def has_project(self, _file_sha256: str) -> bool:
+        """Return True if the workbook is already in the store."""
+        with self._lock:
+            row = self._conn.execute("SELECT 1 FROM projects WHERE file_sha256 = ?", (_file_sha256,)).fetchone()
+        return row is not None
+
+    def _metric_ids(self, _keys: set[tuple[str, str, int]]) -> dict[tuple[str, str, int], int]:
+        """Return the metric_id of each (datatype, units, occurrence), adding any new ones."""
+        self._conn.executemany(
+            "INSERT OR IGNORE INTO metrics (datatype, units, occurrence) VALUES (?, ?, ?)", sorted(_keys)
+        )
+        rows = self._conn.execute("SELECT datatype, units, occurrence, metric_id FROM metrics").fetchall()
+        return {(datatype, units, occurrence): metric_id for datatype, units, occurrence, metric_id in rows}
+
+    def _insert_project(self, _record: ProjectRecord, _metric_ids: dict) -> None:
+        cursor = self._conn.execute(
+            "INSERT INTO projects (file_sha256, file_name, ingested_at) VALUES (?, ?, ?)",
+            (_record.file_sha256, _record.file_name, datetime.now(timezone.utc).isoformat()),
+        )
+        project_id = cursor.lastrowid
+        self._conn.executemany(
+            "INSERT INTO project_attributes (project_id, name, value) VALUES (?, ?, ?)",
+            [(project_id, name, value) for name, value in _record.attributes.items()],
+        )
+
+        variant_ids = []
+        for position, (name, tfa) in enumerate(zip(_record.variant_names, _record.variant_tfa)):
+            cursor = self._conn.execute(
+                "INSERT INTO variants (project_id, position, name, tfa) VALUES (?, ?, ?, ?)",
+                (project_id, position, name, tfa),
+            )
+            variant_ids.append(cursor.lastrowid)
+
+        self._conn.executemany(
+            "INSERT INTO variant_values (project_id, metric_id, variant_id, excel_row, value) VALUES (?, ?, ?, ?, ?)",
+            (
+                (project_id, _metric_ids[(datatype, units, occurrence)], variant_ids[variant], excel_row, value)
+                for excel_row, datatype, units, occurrence, variant, value in _record.values
+            ),
+        )
+
+    def ingest(self, _records: Iterable[ProjectRecord], _replace: bool = False) -> list[str]:
+        """Add the projects in a single transaction. Workbooks already in the store are skipped (or replaced).
+
+        Arguments:
+        ----------
+            * _records (Iterable[ProjectRecord]): The flattened projects.
+            * _replace (bool): Default=False. Replace the stored data of a workbook already in the store.
+
+        Returns:
+        --------
+            * (list[str]): The SHA-256 of each workbook added.
+        """
+        records = {record.file_sha256: record for record in _records}
+        if not records:
+            return []
+
+        added = []
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                if _replace:
+                    self._conn.executemany("DELETE FROM projects WHERE file_sha256 = ?", [(k,) for k in records])
+                existing = {
+                    row[0]
+                    for row in self._conn.execute(
+                        f"SELECT file_sha256 FROM projects WHERE file_sha256 IN ({','.join('?' * len(records))})",
+                        list(records),
+                    )
+                }
+                new_records = [record for sha, record in records.items() if sha not in existing]
+                if new_records:
+                    metric_ids = self._metric_ids({value[1:4] for r in new_records for value in r.values})
+                    for record in new_records:
+                        self._insert_project(record, metric_ids)
+                        added.append(record.file_sha256)
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        return added
+
+    def set_attributes(self, _file_sha256: str, _attributes: dict[str, str]) -> bool:
+        """Set (or replace) attributes of a stored project. Returns False if the project is not in the store."""
+        with self._lock:
+            sql = "SELECT project_id FROM projects WHERE file_sha256 = ?"
+            row = self._conn.execute(sql, (_file_sha256,)).fetchone()
+            if row is None:
+                return False
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO project_attributes (project_id, name, value) VALUES (?, ?, ?)",
+                [(row[0], name, value) for name, value in _attributes.items()],
+            )
+        return True
+
+    def query(self, _sql: str, _params: tuple | dict = ()) -> tuple[list[str], list[tuple]]:
+        """Run a read-only query, on its own connection, and return the (column names, rows).
+
+        The connection is opened read-only and cannot ATTACH other files. A query running longer
+        than QUERY_MAX_STEPS is stopped (sqlite3.OperationalError: interrupted).
+        """
+        conn = sqlite3.connect(f"{self.path.resolve().as_uri()}?mode=ro", uri=True)
+        try:
+            conn.set_authorizer(
+                lambda action, *_: sqlite3.SQLITE_DENY if action == sqlite3.SQLITE_ATTACH else sqlite3.SQLITE_OK
+            )
+            steps = [0]
+
+            def _limit_steps() -> int:
+                steps[0] += 1
+                return steps[0] > QUERY_MAX_STEPS
+
+            conn.set_progress_handler(_limit_steps, 1000)
+            cursor = conn.execute(_sql, _params)
+            rows = cursor.fetchall()
+            columns = [description[0] for description in cursor.description or []]
+        finally:
+            conn.close()
+        return columns, rows
+
+
+class AnalyticsSink:
+    """Adds processed projects to an AnalyticsStore in the background, in batches of up to `batch_size`.
+
+    `submit()` only queues the project, so the upload response is not held up by the store.
+    Projects already in the store (by file SHA-256) are skipped before any flattening.
+    """
+
+    def __init__(self, store: AnalyticsStore, batch_size: int = 20, flush_interval_s: float = 5.0):
+        self.store = store
+        self.batch_size = batch_size
+        self.flush_interval_s = flush_interval_s
+        self._queue: queue.Queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="analytics_sink", daemon=True)
+        self._thread.start()
+
+    def submit(
+        self, _phpp_data: "PHPPData", _file_sha256: str, _file_name: str | None = None, _attributes: dict | None = None
+    ) -> None:
+        """Queue a processed project to be added to the store."""
+        self._queue.put((_phpp_data, _file_sha256, _file_name, _attributes))
+
+    def flush(self) -> None:
+        """Wait until everything submitted so far is in the store."""
+        self._queue.join()
+
+    def _run(self) -> None:
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.flush_interval_s
+            while len(batch) < self.batch_size and (timeout := deadline - time.monotonic()) > 0:
+                try:
+                    batch.append(self._queue.get(timeout=timeout))
+                except queue.Empty:
+                    break
+            try:
+                records = [project_record(*item) for item in batch if not self.store.has_project(item[1])]
+                if records:
+                    self.store.ingest(records)
+            except Exception as e:
+                print(f"Analytics store error: {e}")
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+
+def _parse_attributes(_pairs: list[str]) -> dict[str, str]:
+    """Return the 'name=value' pairs as a dict."""
+    attributes = {}
+    for pair in _pairs:
+        name, sep, value = pair.partition("=")
+        if not sep:
+            raise argparse.ArgumentTypeError(f"Attributes must be 'name=value', not: '{pair}'")
+        attributes[name.strip()] = value.strip()
+    return attributes
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("database", type=pathlib.Path, help="The SQLite file (created if needed).")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    ingest_parser = commands.add_parser("ingest", help="Add PHPP workbooks (skipping any already in the store).")
+    ingest_parser.add_argument("workbooks", nargs="+", type=pathlib.Path)
+    ingest_parser.add_argument("--attr", action="append", default=[], help="A 'name=value' attribute for all.")
+    ingest_parser.add_argument("--replace", action="store_true", help="Replace any workbooks already stored.")
+    ingest_parser.add_argument("--batch-size", type=int, default=20, help="Workbooks per transaction.")
+
+    tag_parser = commands.add_parser("tag", help="Set 'name=value' attributes of a stored project.")
+    tag_parser.add_argument("file_sha256")
+    tag_parser.add_argument("attributes", nargs="+")
+
+    query_parser = commands.add_parser("query", help=f"Run a read-only SQL query (see the '{VALUES_VIEW}' view).")
+    query_parser.add_argument("sql")
+    query_parser.add_argument("--csv", action="store_true", help="Write CSV to stdout (default: aligned text).")
+    args = parser.parse_args()
+
+    store = AnalyticsStore(args.database)
+    if args.command == "ingest":
+        from backend.read_phpp import load_phpp_data
+        from backend.result_store import hash_file
+
+        attributes = _parse_attributes(args.attr)
+        batch: list[ProjectRecord] = []
+        num_added = 0
+        for path in args.workbooks:
+            with open(path, "rb") as f:
+                file_sha256 = hash_file(f)
+                if not args.replace and store.has_project(file_sha256):
+                    print(f"  {path.name}: already stored")
+                    continue
+                start = time.perf_counter()
+                try:
+                    phpp_data = load_phpp_data(f)
+                except Exception as e:
+                    print(f"  {path.name}: FAILED ({e})")
+                    continue
+            batch.append(project_record(phpp_data, file_sha256, path.name, attributes))
+            print(f"  {path.name}: read in {time.perf_counter() - start:.1f} s")
+            if len(batch) >= args.batch_size:
+                num_added += len(store.ingest(batch, args.replace))
+                batch = []
+        if batch:
+            num_added += len(store.ingest(batch, args.replace))
+        print(f"Added {num_added} project(s) to {args.database}")
+
+    elif args.command == "tag":
+        if not store.set_attributes(args.file_sha256, _parse_attributes(args.attributes)):
+            sys.exit(f"No project with the SHA-256: {args.file_sha256}")
+
+    elif args.command == "query":
+        columns, rows = store.query(args.sql)
+        if args.csv:
+            writer = csv.writer(sys.stdout)
+            writer.writerow(columns)
+            writer.writerows(rows)
+        else:
+            widths = [max(len(str(v)) for v in [name, *(row[i] for row in rows)]) for i, name in enumerate(columns)]
+            print("  ".join(name.ljust(w) for name, w in zip(columns, widths)))
+            for row in rows:
+                print("  ".join(str(v).ljust(w) for v, w in zip(row, widths)))
+    store.close()
+
+
+if __name__ == "__main__":
+    main()
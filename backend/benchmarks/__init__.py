@@ -0,0 +1 @@
+"""Benchmarks for the PHPP-to-CSV backend. Run each one with: `python -m backend.benchmarks.<name> --help`"""
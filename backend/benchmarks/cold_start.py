@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+# -*- Python Version: 3.11 -*-
+
+"""Benchmark the backend's cold-start: the time for a fresh process to import the app, and to
+process its first (and second) upload of the built-in sample workbook.
+
+Usage:
+    python -m backend.benchmarks.cold_start --repeat 5 --output cold_start_history.jsonl
+"""
+
+import argparse
+from datetime import datetime, timezone
+import json
+import platform
+import statistics
+import subprocess
+import sys
+import time
+
+# -- Run in a fresh interpreter for each repeat, and print the timings (seconds) as JSON
+_CHILD_SCRIPT = """
+import io, json, time
+t0 = time.perf_counter()
+import backend.main
+t1 = time.perf_counter()
+pipeline = backend.main.get_pipeline()
+t2 = time.perf_counter()
+from backend.sample_workbook import build_sample_workbook
+workbook = build_sample_workbook()
+t3 = time.perf_counter()
+pipeline.create_csv_files_from_phpp_data(pipeline.load_phpp_data(io.BytesIO(workbook)), 5.0, [])
+t4 = time.perf_counter()
+pipeline.create_csv_files_from_phpp_data(pipeline.load_phpp_data(io.BytesIO(workbook)), 5.0, [])
+t5 = time.perf_counter()
+print(json.dumps({
+    "import_app": t1 - t0,
+    "import_pipeline": t2 - t1,
+    "first_upload": t4 - t3,
+    "warm_upload": t5 - t4,
+}))
+"""
+
+
+def measure_cold_start() -> dict[str, float]:
+    """Run one cold-start in a fresh interpreter and return its timings (seconds)."""
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable, "-c", _CHILD_SCRIPT], capture_output=True, text=True, check=True)
+    timings = json.loads(result.stdout.strip().splitlines()[-1])
+    timings["process_total"] = time.perf_counter() - start
+    return timings
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=5, help="The number of fresh processes to time.")
+    parser.add_argument("--output", help="Append the median results as one JSON line to this file.")
+    args = parser.parse_args()
+
+    runs = [measure_cold_start() for _ in range(args.repeat)]
+    medians = {key: statistics.median(run[key] for run in runs) for key in runs[0]}
+
+    print(f"Cold-start (median of {args.repeat} fresh processes):")
+    for key, seconds in medians.items():
+        print(f"  {key:<18}{seconds * 1000:>10.1f} ms")
+
+    if args.output:
+        record = {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "repeat": args.repeat,
+            "median_seconds": medians,
+        }
+        with open(args.output, "a") as f:
+            f.write(json.dumps(record) + "\n")
+
+
+if __name__ == "__main__":
+    main()
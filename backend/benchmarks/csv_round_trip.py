@@ -0,0 +1,118 @@
+# -*- coding: utf-8 -*-
+# -*- Python Version: 3.11 -*-
+
+"""Benchmark getting the outputs as DataFrames: the CSV round-trip (write each CSV, then `pd.read_csv`
+it back) against the typed tables of backend.convert, from the same (already read) PHPP-Data.
+
+Also counts the 'object' (untyped) columns of each, and times `convert` end-to-end (read included).
+
+Usage:
+    python -m backend.benchmarks.csv_round_trip --rooms 10,500 --repeat 5
+"""
+
+import argparse
+from dataclasses import dataclass
+import io
+import statistics
+import time
+from typing import Callable
+
+import pandas as pd
+
+from backend.convert import RENDERERS, convert
+from backend.read_phpp import PHPPData, load_phpp_data
+from backend.sample_workbook import build_sample_workbook
+from backend.write_csv import iter_csv_files_from_phpp_data
+from backend.write_csv.generate_csv_files import get_table_writers, run_writers
+
+
+@dataclass
+class RoundTripResult:
+    """The median time of one way of getting the outputs, and how many of their columns are untyped."""
+
+    rooms: int
+    name: str
+    median_ms: float
+    num_outputs: int
+    object_columns: int
+
+
+def csv_round_trip(_phpp_data: PHPPData) -> dict[str, pd.DataFrame]:
+    """The outputs as DataFrames, by writing each CSV and parsing it back (as a script using the CSVs would)."""
+    return {
+        file_name: pd.read_csv(io.StringIO(csv_string))
+        for file_name, csv_string in iter_csv_files_from_phpp_data(_phpp_data, 5.0, [])
+    }
+
+
+def typed_tables(_phpp_data: PHPPData, _output_type: str = "pandas") -> dict:
+    """The outputs as typed tables, straight from the writers (as `convert`, without the read)."""
+    return dict(run_writers(get_table_writers(_phpp_data, 5.0, []), RENDERERS[_output_type]))
+
+
+def object_columns(_tables: dict) -> int:
+    """Return the number of columns, of all the DataFrames, with an 'object' (untyped) dtype."""
+    return sum(int((df.dtypes == object).sum()) for df in _tables.values() if isinstance(df, pd.DataFrame))
+
+
+def time_ways(_ways: list[tuple[str, Callable[[], dict]]], _repeat: int) -> list[tuple[float, dict]]:
+    """Return the median time (ms), and the outputs, of each way of getting the outputs.
+
+    The ways take turns in each repeat, so any drift in the machine's speed affects them all alike.
+    """
+    times: list[list[float]] = [[] for _ in _ways]
+    outputs: list[dict] = [{} for _ in _ways]
+    for _ in range(_repeat):
+        for i, (_, get_outputs) in enumerate(_ways):
+            start = time.perf_counter()
+            outputs[i] = get_outputs()
+            times[i].append((time.perf_counter() - start) * 1000)
+    return [(statistics.median(way_times), way_outputs) for way_times, way_outputs in zip(times, outputs)]
+
+
+def run_benchmark(_num_rooms: int, _repeat: int, _arrow: bool) -> list[RoundTripResult]:
+    """Time each way of getting the outputs of the sample workbook with the number of rooms."""
+    workbook = build_sample_workbook(_num_rooms)
+    phpp_data = load_phpp_data(io.BytesIO(workbook))
+
+    ways: list[tuple[str, Callable[[], dict]]] = [
+        ("CSV + read_csv", lambda: csv_round_trip(phpp_data)),
+        ("typed DataFrames", lambda: typed_tables(phpp_data)),
+    ]
+    if _arrow:
+        ways.append(("Arrow tables", lambda: typed_tables(phpp_data, "arrow")))
+    ways.append(("convert (incl. read)", lambda: convert(workbook)))
+
+    return [
+        RoundTripResult(_num_rooms, name, median_ms, len(outputs), object_columns(outputs))
+        for (name, _), (median_ms, outputs) in zip(ways, time_ways(ways, _repeat))
+    ]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rooms", default="10,500", help="The sample workbook sizes (rooms) to build outputs from.")
+    parser.add_argument("--repeat", type=int, default=5, help="The number of runs to take the median of.")
+    args = parser.parse_args()
+
+    try:
+        import pyarrow  # noqa: F401
+
+        arrow = True
+    except ImportError:
+        print("(pyarrow is not installed: skipping Arrow tables)")
+        arrow = False
+
+    print(f"{'rooms':>6}  {'outputs as':<22}{'median ms':>12}{'vs CSV':>9}{'outputs':>9}{'object cols':>13}")
+    for rooms in (int(n) for n in args.rooms.split(",")):
+        results = run_benchmark(rooms, args.repeat, arrow)
+        csv_ms = results[0].median_ms
+        for result in results:
+            print(
+                f"{result.rooms:>6}  {result.name:<22}{result.median_ms:>12.1f}{csv_ms / result.median_ms:>8.1f}x"
+                f"{result.num_outputs:>9}{result.object_columns:>13}"
+            )
+
+
+if __name__ == "__main__":
+    main()
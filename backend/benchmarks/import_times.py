@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+# -*- Python Version: 3.11 -*-
+
+"""Report the import-time cost of each module, as measured by `python -X importtime`.
+
+Usage:
+    python -m backend.benchmarks.import_times --module backend.main --top 25
+"""
+
+import argparse
+from dataclasses import asdict, dataclass
+import json
+import subprocess
+import sys
+
+
+@dataclass
+class ImportTime:
+    """The import time of a single module (microseconds)."""
+
+    module: str
+    self_us: int
+    cumulative_us: int
+    depth: int
+
+
+def measure_import_times(_module: str) -> list[ImportTime]:
+    """Import the module in a fresh interpreter with `-X importtime` and return the time for every module imported.
+
+    Arguments:
+    ----------
+        * _module (str): The dotted name of the module to import, ie: "backend.main".
+
+    Returns:
+    --------
+        * (list[ImportTime]): The import time of each module, in the order they finished importing.
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {_module}"],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+
+    import_times: list[ImportTime] = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:") :].split("|")
+        depth = (len(name) - len(name.lstrip(" "))) // 2
+        import_times.append(ImportTime(name.strip(), int(self_us), int(cumulative_us), depth))
+    return import_times
+
+
+def totals_by_package(_import_times: list[ImportTime]) -> dict[str, int]:
+    """Return the total (self) import time of each top-level package, largest first."""
+    totals: dict[str, int] = {}
+    for item in _import_times:
+        package = item.module.split(".")[0]
+        totals[package] = totals.get(package, 0) + item.self_us
+    return dict(sorted(totals.items(), key=lambda kv: kv[1], reverse=True))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--module", default="backend.main", help="The module to import.")
+    parser.add_argument("--top", type=int, default=20, help="The number of modules / packages to list.")
+    parser.add_argument("--json", dest="json_path", help="Also save all of the import times to this JSON file.")
+    args = parser.parse_args()
+
+    import_times = measure_import_times(args.module)
+    total_us = sum(item.self_us for item in import_times)
+    print(f"Total import time for '{args.module}': {total_us / 1000:.1f} ms ({len(import_times)} modules)\n")
+
+    print(f"{'Package':<30}{'Self (ms)':>12}")
+    for package, us in list(totals_by_package(import_times).items())[: args.top]:
+        print(f"{package:<30}{us / 1000:>12.1f}")
+
+    print(f"\n{'Module':<50}{'Cumulative (ms)':>18}{'Self (ms)':>12}")
+    for item in sorted(import_times, key=lambda i: i.cumulative_us, reverse=True)[: args.top]:
+        print(f"{item.module:<50}{item.cumulative_us / 1000:>18.1f}{item.self_us / 1000:>12.1f}")
+
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            json.dump([asdict(item) for item in import_times], f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,363 @@
+# -*- coding: utf-8 -*-
+# -*- Python Version: 3.11 -*-
+
+"""Load-test the '/upload/' endpoint with a mix of synthetic PHPP sizes and concurrency levels.
+
+For each configuration, report the p50/p95/p99 latency, throughput, error rate and the server's
+peak RSS. The server is either:
+
+    * in-process (default): the app is run by uvicorn on a background thread of this process
+        (the client threads share the GIL with the server, so use --workers for sizing numbers).
+    * --workers N: a local 'uvicorn backend.main:app --workers N' sub-process.
+    * --url URL: an already running server (peak RSS only if --server-pid is given).
+
+Usage:
+    python -m backend.benchmarks.load_test --mix 10:3,200:1 --concurrency 1,4,8 --requests 40 \\
+        --output-json load_test.json --output-csv load_test.csv
+"""
+
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+import csv
+from dataclasses import asdict, dataclass
+from datetime import datetime, timezone
+import http.client
+import json
+import os
+import platform
+import random
+import resource
+import socket
+import subprocess
+import sys
+import threading
+import time
+import urllib.parse
+import uuid
+
+from backend.sample_workbook import build_sample_workbook
+
+
+@dataclass
+class LoadTestResult:
+    """The results of one load-test configuration."""
+
+    server: str
+    concurrency: int
+    mix: str
+    requests: int
+    errors: int
+    error_rate: float
+    duration_s: float
+    throughput_rps: float
+    p50_ms: float
+    p95_ms: float
+    p99_ms: float
+    peak_rss_mb: float | None
+
+
+def parse_mix(_mix: str) -> list[tuple[int, int]]:
+    """Return the [(num_rooms, weight), ...] from a mix string like '10:3,200:1'. A missing weight is 1."""
+    mix = []
+    for item in _mix.split(","):
+        num_rooms, _, weight = item.partition(":")
+        mix.append((int(num_rooms), int(weight or 1)))
+    return mix
+
+
+def percentile(_values: list[float], _pct: float) -> float:
+    """Return the percentile (0-100) of the values, by linear interpolation between the closest ranks."""
+    ordered = sorted(_values)
+    if not ordered:
+        return float("nan")
+    rank = (len(ordered) - 1) * _pct / 100
+    lower = int(rank)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (rank - lower)
+
+
+def encode_upload(_file_name: str, _data: bytes) -> tuple[bytes, str]:
+    """Return the multipart/form-data body and its Content-Type for uploading the file as 'file'."""
+    boundary = uuid.uuid4().hex
+    body = (
+        (
+            f"--{boundary}\r\n"
+            f'Content-Disposition: form-data; name="file"; filename="{_file_name}"\r\n'
+            "Content-Type: application/vnd.openxmlformats-officedocument.spreadsheetml.sheet\r\n\r\n"
+        ).encode("utf-8")
+        + _data
+        + f"\r\n--{boundary}--\r\n".encode("utf-8")
+    )
+    return body, f"multipart/form-data; boundary={boundary}"
+
+
+def build_workbook_pool(_mix: list[tuple[int, int]], _per_size: int) -> dict[int, list[bytes]]:
+    """Return distinct synthetic workbooks (different seeds) for each size, so result-store hits are rare."""
+    return {num_rooms: [build_sample_workbook(num_rooms, seed) for seed in range(_per_size)] for num_rooms, _ in _mix}
+
+
+# -----------------------------------------------------------------------------
+# -- Peak RSS
+
+
+def _process_tree(_pid: int) -> list[int]:
+    """Return the pid and all its descendant pids (from /proc)."""
+    children: dict[int, list[int]] = {}
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                ppid = int(f.read().rsplit(")", 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        children.setdefault(ppid, []).append(int(entry))
+
+    pids, stack = [], [_pid]
+    while stack:
+        pid = stack.pop()
+        pids.append(pid)
+        stack.extend(children.get(pid, []))
+    return pids
+
+
+def _tree_rss_bytes(_pid: int) -> int:
+    """Return the total resident memory (bytes) of the process and its descendants."""
+    page_size = os.sysconf("SC_PAGE_SIZE")
+    total = 0
+    for pid in _process_tree(_pid):
+        try:
+            with open(f"/proc/{pid}/statm") as f:
+                total += int(f.read().split()[1]) * page_size
+        except (OSError, IndexError, ValueError):
+            continue
+    return total
+
+
+class RSSSampler:
+    """Sample the RSS of a process tree in a background thread, keeping the peak."""
+
+    def __init__(self, pid: int, interval_s: float = 0.05):
+        self.pid = pid
+        self.interval_s = interval_s
+        self.peak_bytes = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            self.peak_bytes = max(self.peak_bytes, _tree_rss_bytes(self.pid))
+            self._stop.wait(self.interval_s)
+
+    def __enter__(self) -> "RSSSampler":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *_) -> None:
+        self._stop.set()
+        self._thread.join()
+
+    @property
+    def peak_mb(self) -> float | None:
+        """The peak RSS (MB), or None if /proc could not be read (ie: not on Linux)."""
+        return self.peak_bytes / (1024 * 1024) if self.peak_bytes else None
+
+
+# -----------------------------------------------------------------------------
+# -- Servers
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _wait_until_ready(_url: str, _timeout_s: float = 60.0) -> None:
+    """Poll '/server_ready' until the server answers."""
+    deadline = time.monotonic() + _timeout_s
+    while True:
+        try:
+            status, _ = send_request(_url, "GET", "/server_ready")
+            if status == 200:
+                return
+        except OSError:
+            pass
+        if time.monotonic() > deadline:
+            raise TimeoutError(f"The server at {_url} did not start.")
+        time.sleep(0.2)
+
+
+def start_in_process_server() -> tuple[str, int]:
+    """Run the app with uvicorn on a background thread. Returns the (url, pid)."""
+    import uvicorn
+
+    port = _free_port()
+    config = uvicorn.Config("backend.main:app", host="127.0.0.1", port=port, log_level="warning")
+    threading.Thread(target=uvicorn.Server(config).run, daemon=True).start()
+    url = f"http://127.0.0.1:{port}"
+    _wait_until_ready(url)
+    return url, os.getpid()
+
+
+def start_uvicorn_workers(_workers: int) -> tuple[str, subprocess.Popen]:
+    """Run the app with 'uvicorn --workers N' in a sub-process. Returns the (url, process)."""
+    port = _free_port()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "backend.main:app", "--port", str(port), "--workers", str(_workers)],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    url = f"http://127.0.0.1:{port}"
+    _wait_until_ready(url)
+    return url, process
+
+
+# -----------------------------------------------------------------------------
+# -- Load
+
+
+def send_request(
+    _url: str, _method: str, _path: str, _body: bytes | None = None, _headers: dict | None = None
+) -> tuple[int, str]:
+    """Send one HTTP request and return the (status, content-type). The response body is read and discarded."""
+    parsed = urllib.parse.urlsplit(_url)
+    connection = http.client.HTTPConnection(parsed.hostname, parsed.port, timeout=600)
+    try:
+        connection.request(_method, parsed.path.rstrip("/") + _path, body=_body, headers=_headers or {})
+        response = connection.getresponse()
+        response.read()
+        return response.status, response.getheader("content-type", "")
+    finally:
+        connection.close()
+
+
+def run_configuration(
+    _url: str,
+    _server_pid: int | None,
+    _server_name: str,
+    _pool: dict[int, list[bytes]],
+    _mix: list[tuple[int, int]],
+    _concurrency: int,
+    _num_requests: int,
+    _seed: int = 0,
+) -> LoadTestResult:
+    """Send the requests, `_concurrency` at a time, and return the results."""
+    rnd = random.Random(_seed)
+    sizes = rnd.choices([num_rooms for num_rooms, _ in _mix], weights=[w for _, w in _mix], k=_num_requests)
+    uploads = [encode_upload("phpp.xlsx", rnd.choice(_pool[num_rooms])) for num_rooms in sizes]
+
+    def upload(_upload: tuple[bytes, str]) -> tuple[float, bool]:
+        body, content_type = _upload
+        start = time.perf_counter()
+        try:
+            status, response_type = send_request(_url, "POST", "/upload/", body, {"Content-Type": content_type})
+            ok = status == 200 and response_type == "application/zip"
+        except OSError:
+            ok = False
+        return time.perf_counter() - start, ok
+
+    sampler = RSSSampler(_server_pid) if _server_pid and os.path.isdir("/proc") else None
+    start = time.perf_counter()
+    if sampler:
+        with sampler, ThreadPoolExecutor(_concurrency) as executor:
+            results = list(executor.map(upload, uploads))
+    else:
+        with ThreadPoolExecutor(_concurrency) as executor:
+            results = list(executor.map(upload, uploads))
+    duration = time.perf_counter() - start
+
+    latencies_ms = [seconds * 1000 for seconds, _ in results]
+    errors = sum(not ok for _, ok in results)
+    peak_rss_mb = sampler.peak_mb if sampler else None
+    if peak_rss_mb is None and _server_pid == os.getpid():
+        # -- Linux reports ru_maxrss in KB: the process's lifetime peak, not just this configuration's.
+        peak_rss_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+    return LoadTestResult(
+        server=_server_name,
+        concurrency=_concurrency,
+        mix=",".join(f"{n}:{w}" for n, w in _mix),
+        requests=_num_requests,
+        errors=errors,
+        error_rate=errors / _num_requests,
+        duration_s=duration,
+        throughput_rps=_num_requests / duration,
+        p50_ms=percentile(latencies_ms, 50),
+        p95_ms=percentile(latencies_ms, 95),
+        p99_ms=percentile(latencies_ms, 99),
+        peak_rss_mb=peak_rss_mb,
+    )
+
+
+def write_results(_results: list[LoadTestResult], _json_path: str | None, _csv_path: str | None) -> None:
+    """Save the results as a JSON document and/or a CSV table."""
+    rows = [asdict(result) for result in _results]
+    if _json_path:
+        record = {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "cpu_count": os.cpu_count(),
+            "results": rows,
+        }
+        with open(_json_path, "w") as f:
+            json.dump(record, f, indent=2)
+    if _csv_path and rows:
+        with open(_csv_path, "w", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=list(rows[0]))
+            writer.writeheader()
+            writer.writerows(rows)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", help="Test an already running server, instead of starting one.")
+    parser.add_argument("--server-pid", type=int, help="With --url: the server's pid, to sample its peak RSS.")
+    parser.add_argument("--workers", type=int, help="Start 'uvicorn --workers N' in a sub-process.")
+    parser.add_argument("--mix", default="10:3,200:1", help="Workbook sizes (rooms) and their weights.")
+    parser.add_argument("--concurrency", default="1,4", help="The concurrency levels to test.")
+    parser.add_argument("--requests", type=int, default=20, help="The number of uploads per configuration.")
+    parser.add_argument("--distinct", type=int, default=4, help="The number of distinct workbooks of each size.")
+    parser.add_argument("--use-result-store", action="store_true", help="Keep the server's result store on.")
+    parser.add_argument("--output-json", help="Save the results to this .json file.")
+    parser.add_argument("--output-csv", help="Save the results to this .csv file.")
+    args = parser.parse_args()
+
+    if not args.use_result_store:
+        # -- So repeated workbooks are processed each time (started servers read the settings on import)
+        os.environ["PHPP_TO_CSV_RESULT_STORE_MB"] = "0"
+
+    mix = parse_mix(args.mix)
+    pool = build_workbook_pool(mix, args.distinct)
+
+    process = None
+    if args.url:
+        url, server_pid, server_name = args.url, args.server_pid, args.url
+    elif args.workers:
+        url, process = start_uvicorn_workers(args.workers)
+        server_pid, server_name = process.pid, f"uvicorn --workers {args.workers}"
+    else:
+        url, server_pid = start_in_process_server()
+        server_name = "in-process"
+
+    results = []
+    try:
+        for concurrency in [int(c) for c in args.concurrency.split(",")]:
+            result = run_configuration(url, server_pid, server_name, pool, mix, concurrency, args.requests)
+            results.append(result)
+            rss = f"{result.peak_rss_mb:.0f} MB" if result.peak_rss_mb else "n/a"
+            print(
+                f"{server_name} | concurrency {concurrency:>3} | {result.throughput_rps:6.2f} req/s | "
+                f"p50 {result.p50_ms:7.0f} ms | p95 {result.p95_ms:7.0f} ms | p99 {result.p99_ms:7.0f} ms | "
+                f"errors {result.error_rate:5.1%} | peak RSS {rss}"
+            )
+    finally:
+        if process:
+            process.terminate()
+            process.wait()
+
+    write_results(results, args.output_json, args.output_csv)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+# -*- coding: utf-8 -*-
+# -*- Python Version: 3.11 -*-
+
+"""Benchmark the .ZIP build of an upload's CSV outputs: the original `zipfile.writestr` loop (stored,
+and deflated) against the parallel per-member compression of backend.zip_archive, at several levels.
+
+Usage:
+    python -m backend.benchmarks.zip_build --rooms 10,500 --threads 1,4 --repeat 5
+"""
+
+import argparse
+from concurrent.futures import Executor, ThreadPoolExecutor
+from dataclasses import dataclass
+import io
+import statistics
+import time
+from typing import Callable
+import zipfile
+
+from backend.zip_archive import COMPRESSION_METHODS, ZipCompression, build_zip
+
+
+@dataclass
+class ZipBenchmarkResult:
+    """The median time, and the size, of one way of building the .ZIP."""
+
+    rooms: int
+    name: str
+    threads: int
+    median_ms: float
+    size_bytes: int
+
+
+def sample_outputs(_num_rooms: int) -> list[tuple[str, str]]:
+    """Return the (filename, csv_string) outputs of the built-in sample workbook with the number of rooms."""
+    from backend.read_phpp import load_phpp_data
+    from backend.sample_workbook import build_sample_workbook
+    from backend.write_csv import create_csv_files_from_phpp_data
+
+    phpp_data = load_phpp_data(io.BytesIO(build_sample_workbook(_num_rooms)))
+    return create_csv_files_from_phpp_data(phpp_data, 5.0, [])
+
+
+def writestr_loop(_outputs: list[tuple[str, str]], _compress_type: int, _level: int | None) -> bytes:
+    """The original .ZIP build: each CSV added in turn with `ZipFile.writestr`."""
+    memory_file = io.BytesIO()
+    with zipfile.ZipFile(memory_file, "w", _compress_type, compresslevel=_level) as zf:
+        for file_name, csv_string in _outputs:
+            zf.writestr(f"{file_name}.csv", csv_string)
+    return memory_file.getvalue()
+
+
+def parallel_build(_outputs: list[tuple[str, str]], _compression: ZipCompression, _executor: Executor | None) -> bytes:
+    """The .ZIP build with each member compressed on the thread pool (or in turn, with no pool)."""
+    memory_file = io.BytesIO()
+    entries = [(f"{file_name}.csv", csv_string) for file_name, csv_string in _outputs]
+    build_zip(memory_file, entries, _compression, _executor)
+    return memory_file.getvalue()
+
+
+def time_build(_build: Callable[[], bytes], _repeat: int) -> tuple[float, int]:
+    """Return the median time (ms) and the size (bytes) of the build."""
+    times = []
+    for _ in range(_repeat):
+        start = time.perf_counter()
+        data = _build()
+        times.append((time.perf_counter() - start) * 1000)
+    return statistics.median(times), len(data)
+
+
+def run_benchmark(
+    _num_rooms: int, _threads: list[int], _levels: dict[str, list[int]], _repeat: int
+) -> list[ZipBenchmarkResult]:
+    """Time each way of building the .ZIP of the sample outputs with the number of rooms."""
+    outputs = sample_outputs(_num_rooms)
+    results = []
+    for name, compress_type, level in (
+        ("writestr stored", zipfile.ZIP_STORED, None),
+        ("writestr deflate", zipfile.ZIP_DEFLATED, None),
+    ):
+        median_ms, size = time_build(lambda: writestr_loop(outputs, compress_type, level), _repeat)
+        results.append(ZipBenchmarkResult(_num_rooms, name, 1, median_ms, size))
+
+    for method, levels in _levels.items():
+        for level in levels:
+            compression = ZipCompression(method, level)
+            name = f"parallel {compression.label}"
+            for threads in _threads:
+                executor = ThreadPoolExecutor(threads) if threads > 1 else None
+                median_ms, size = time_build(lambda: parallel_build(outputs, compression, executor), _repeat)
+                if executor:
+                    executor.shutdown()
+                results.append(ZipBenchmarkResult(_num_rooms, name, threads, median_ms, size))
+    return results
+
+
+def parse_levels(_text: str) -> dict[str, list[int]]:
+    """ie: 'deflate:1,6;zstd:3' -> {'deflate': [1, 6], 'zstd': [3]}."""
+    levels = {}
+    for part in filter(None, _text.split(";")):
+        method, _, numbers = part.partition(":")
+        if method not in COMPRESSION_METHODS:
+            raise argparse.ArgumentTypeError(f"Unknown compression: '{method}'")
+        levels[method] = [int(n) for n in numbers.split(",")]
+    return levels
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rooms", default="10,500", help="The sample workbook sizes (rooms) to build outputs from.")
+    parser.add_argument("--threads", default="1,4", help="The thread counts of the parallel build.")
+    parser.add_argument("--levels", type=parse_levels, default="deflate:1,6;zstd:3", help="ie: 'deflate:1,6;zstd:3'")
+    parser.add_argument("--repeat", type=int, default=5, help="The number of builds to take the median of.")
+    args = parser.parse_args()
+
+    levels = dict(args.levels)
+    if "zstd" in levels:
+        try:
+            import zstandard  # noqa: F401
+        except ImportError:
+            print("(zstandard is not installed: skipping zstd)")
+            del levels["zstd"]
+
+    threads = [int(n) for n in args.threads.split(",")]
+    print(f"{'rooms':>6}  {'build':<24}{'threads':>8}{'median ms':>12}{'size KB':>10}")
+    for rooms in (int(n) for n in args.rooms.split(",")):
+        for result in run_benchmark(rooms, threads, levels, args.repeat):
+            print(
+                f"{result.rooms:>6}  {result.name:<24}{result.threads:>8}"
+                f"{result.median_ms:>12.1f}{result.size_bytes / 1024:>10.1f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+# -*- coding: utf-8 -*-
+# -*- Python Version: 3.11 -*-
+
+"""Convert a PHPP workbook straight to typed tables, in-process, for Python scripts (ie: analytics).
+
+The workbook is read once, and each wanted output is returned as a pandas DataFrame (or an Arrow
+table) with numeric columns as numbers, without writing and re-parsing the CSV files:
+
+    from backend.convert import convert
+
+    tables = convert("2301_Smith.xlsx", outputs=["energy_Site", "room_airflows"])
+    tables["energy_Site"]["As-Drawn"].sum()
+
+With `output_type="csv"`, the outputs are instead the exact CSV strings of the web app's .ZIP.
+"""
+
+import io
+import os
+from typing import TYPE_CHECKING, Any, BinaryIO, Collection
+
+import pandas as pd
+
+from backend.read_phpp import PHPPData, load_phpp_data
+from backend.write_csv.generate_csv_files import Tables, get_table_writers, render_csv, run_writers, typed_table
+
+if TYPE_CHECKING:
+    import pyarrow as pa
+
+# -- The default report options (as the web app's)
+CO2E_LIMIT_TONS_YEAR = 5.0
+
+
+def arrow_table(_df: pd.DataFrame) -> "pa.Table":
+    """Return the (typed) table as an Arrow table. Columns with any text become (nullable) strings."""
+    import pyarrow as pa
+
+    df = _df.copy(deep=False)
+    df.columns = [str(name) for name in df.columns]
+    for i, dtype in enumerate(df.dtypes):
+        if dtype == object:
+            df.isetitem(i, df.iloc[:, i].astype("string"))
+    return pa.Table.from_pandas(df, preserve_index=False)
+
+
+def render_typed(_writer: str, _tables: Tables) -> list[tuple[str, pd.DataFrame]]:
+    """Return the writer's tables as typed DataFrames."""
+    return [(file_name, typed_table(df)) for file_name, df in _tables]
+
+
+def render_arrow(_writer: str, _tables: Tables) -> list[tuple[str, "pa.Table"]]:
+    """Return the writer's tables as Arrow tables."""
+    return [(file_name, arrow_table(typed_table(df))) for file_name, df in _tables]
+
+
+# -- How the writers' tables are returned, by `output_type`
+RENDERERS = {"pandas": render_typed, "arrow": render_arrow, "csv": render_csv}
+OUTPUT_TYPES = tuple(RENDERERS)
+
+
+def _read_phpp(_phpp_file: str | os.PathLike | bytes | BinaryIO) -> PHPPData:
+    if isinstance(_phpp_file, (bytes, bytearray)):
+        return load_phpp_data(io.BytesIO(_phpp_file))
+    if isinstance(_phpp_file, (str, os.PathLike)):
+        with open(_phpp_file, "rb") as f:
+            return load_phpp_data(f)
+    return load_phpp_data(_phpp_file)
+
+
+def convert(
+    phpp_file: str | os.PathLike | bytes | BinaryIO,
+    outputs: Collection[str] | None = None,
+    output_type: str = "pandas",
+    co2e_limit_tons_yr: float = CO2E_LIMIT_TONS_YEAR,
+    omitted_assemblies: list[str] | None = None,
+    combined_demand_detail: bool = False,
+) -> dict[str, Any]:
+    """Read the PHPP workbook once, and return its outputs, by file name (ie: 'energy_Site'), in output order.
+
+    Arguments:
+    ----------
+        * phpp_file (str | os.PathLike | bytes | BinaryIO): The PHPP Excel file: its path, bytes, or an open file.
+        * outputs (Collection[str] | None): Default=None (all). The outputs to build, by writer name,
+            ie: ['energy_Site', 'heating_demand']. Some writers have several outputs (ie: 'heating_demand'
+            has one per Variant). An unknown name raises ValueError, with the list of names.
+        * output_type (str): Default='pandas'. One of:
+            - 'pandas': typed DataFrames (see `typed_table`).
+            - 'arrow': pyarrow Tables (needs the 'pyarrow' package).
+            - 'csv': the CSV strings, exactly as in the web app's .ZIP.
+        * co2e_limit_tons_yr (float): Default=5.0. The CO2e limit in tons/year.
+        * omitted_assemblies (list[str] | None): Default=None. The assemblies to leave out of the Variant table.
+        * combined_demand_detail (bool): Default=False. Set True to also output the detailed
+            heating / cooling demand of all Variants as a single table each.
+
+    Returns:
+    --------
+        * (dict[str, Any]): The outputs by file name: a pd.DataFrame, pa.Table or str, by `output_type`.
+    """
+    if output_type not in RENDERERS:
+        raise ValueError(f"Unknown output type: '{output_type}'. Use one of: {', '.join(OUTPUT_TYPES)}")
+    if output_type == "arrow":
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            raise ValueError("Arrow outputs need the 'pyarrow' package, which is not installed.")
+
+    phpp_data = _read_phpp(phpp_file)
+    omitted_assemblies = omitted_assemblies or []
+    writers = get_table_writers(phpp_data, co2e_limit_tons_yr, omitted_assemblies, combined_demand_detail, outputs)
+    return dict(run_writers(writers, RENDERERS[output_type]))
@@ -0,0 +1,36 @@
+# -*- coding: utf-8 -*-
+# -*- Python Version: 3.11 -*-
+
+"""A per-request deadline, checked between the pipeline's stages (a worksheet read, a CSV writer)."""
+
+import time
+
+
+class DeadlineExceeded(Exception):
+    """The deadline passed before the stage could start."""
+
+
+class Deadline:
+    """A point in time (monotonic) by which a request's pipeline should be done.
+
+    Nothing is interrupted: the pipeline checks the deadline before each stage, and either
+    stops (`check`, which raises DeadlineExceeded) or skips what is left (`expired`).
+    """
+
+    def __init__(self, seconds: float):
+        self.seconds = seconds
+        self.at = time.monotonic() + seconds
+
+    @property
+    def remaining(self) -> float:
+        """The seconds left (negative once past)."""
+        return self.at - time.monotonic()
+
+    @property
+    def expired(self) -> bool:
+        return self.remaining <= 0
+
+    def check(self, _stage: str) -> None:
+        """Raise DeadlineExceeded if the deadline has passed, before the (named) stage starts."""
+        if self.expired:
+            raise DeadlineExceeded(f"The {self.seconds:g} s deadline passed before {_stage}.")
@@ -1,16 +1,45 @@
 # -*- coding: utf-8 -*-
 # -*- Python Version: 3.11 -*-
 
+import asyncio
+from contextlib import nullcontext
+import csv
+from functools import cache
+import hmac
 import io
+import itertools
+import json
+import os
+import re
+import sqlite3
+import tempfile
+import threading
 import traceback
-import zipfile
+from typing import TYPE_CHECKING, Callable, NamedTuple
 
-from fastapi import FastAPI, File, UploadFile, HTTPException
+from fastapi import BackgroundTasks, FastAPI, File, Form, UploadFile, Header, HTTPException, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
-from starlette.responses import StreamingResponse
+from pydantic import BaseModel
+from starlette.background import BackgroundTask
+from starlette.concurrency import run_in_threadpool
+from starlette.responses import FileResponse, Response, StreamingResponse
 
-from backend.read_phpp import load_phpp_data
-from backend.write_csv import create_csv_files_from_phpp_data
+from backend.analytics_store import AnalyticsSink, AnalyticsStore
+from backend.deadline import Deadline, DeadlineExceeded
+from backend.memory_budget import MemoryBudget, MemoryBudgetExceeded
+from backend.profiling import RequestProfiler
+from backend.progress import JobCancelled, ProgressJob, ProgressRegistry, RequestIdInUse
+from backend.project_store import ProjectStore
+from backend.result_store import ResultStore, hash_file, result_key
+from backend.settings import settings
+from backend.single_flight import SingleFlight
+from backend.upload_sessions import UPLOAD_SESSIONS_SUPPORTED, UploadSession, UploadSessionError, UploadSessionStore
+from backend.workbook_preflight import WorkbookValidationError, validate_workbook
+from backend.zip_archive import PARALLEL_MIN_BYTES, ZipCompression, build_zip, get_executor
+
+if TYPE_CHECKING:
+    # -- Only for type-checking: importing backend.read_phpp pulls in pandas (see get_pipeline)
+    from backend.read_phpp import PHPPData
 
 app = FastAPI()
 
@@ -28,72 +57,1038 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag", "X-Project-Id", "X-Request-Id", "Upload-Offset", "X-Outputs-Complete"],
 )
 
-# TODO: get these as user-defined inputs
+# -- The default report options, if not supplied with the upload
 CO2E_LIMIT_TONS_YEAR = 5.0  # <-- into the PHPP....
 OMITTED_ASSEMBLIES: list[str] = []
 
+# -- Generated .ZIP files, so repeat uploads of the same workbook (and options) skip the pipeline.
+result_store = (
+    ResultStore(settings.result_store_dir, int(settings.result_store_mb * 1024 * 1024))
+    if settings.result_store_mb > 0
+    else None
+)
+
+# -- Identical concurrent uploads (same result key) are processed once, and the others answered from the result store
+single_flight = (
+    SingleFlight(settings.result_store_dir, settings.coalesce_wait_s)
+    if result_store and settings.coalesce_wait_s > 0
+    else None
+)
+
+# -- Parsed projects, so the report options can be changed without re-uploading the file.
+project_store = ProjectStore(settings.project_ttl_seconds, int(settings.project_store_mb * 1024 * 1024))
+
+# -- The memory all concurrent uploads may (by estimate) use. Uploads which do not fit wait, then are turned away.
+memory_budget = MemoryBudget(int(settings.server_memory_mb * 1024 * 1024)) if settings.server_memory_mb > 0 else None
+PIPELINE_MEMORY_BYTES = int(settings.pipeline_memory_mb * 1024 * 1024) or None
+
+# -- Every processed project's data, added (in the background) to a SQLite file for portfolio queries.
+analytics_sink = AnalyticsSink(AnalyticsStore(settings.analytics_db)) if settings.analytics_db else None
+
+# -- The progress events of each upload, by (server-issued) request id, for `GET /jobs/{request_id}/events`
+progress_jobs = ProgressRegistry()
+# -- Seconds between checks that an upload's client is still connected (if not, its job is cancelled)
+DISCONNECT_POLL_S = 0.5
+
+# -- How the .ZIP members are compressed (on `settings.zip_threads` threads), unless the upload asks otherwise
+ZIP_COMPRESSION = ZipCompression(settings.zip_compression, settings.zip_level)
+
+# -- Resumable (chunked) uploads, for large workbooks over poor connections. See `POST /uploads/`
+# -- (Not available without file locks, ie: on Windows. Files are then uploaded whole, with `POST /upload/`.)
+upload_sessions = (
+    UploadSessionStore(
+        settings.upload_session_dir,
+        settings.upload_session_ttl_s,
+        int(settings.upload_max_mb * 1024 * 1024),
+        int(settings.upload_chunk_mb * 1024 * 1024),
+    )
+    if UPLOAD_SESSIONS_SUPPORTED
+    else None
+)
+
+# -- The upload's output: a .ZIP of the CSV files, or one formatted Excel report (a worksheet per table)
+OUTPUT_FORMATS = ("zip", "xlsx")
+
+# -- The file formats of a diff of two revisions
+DIFF_FORMATS = ("csv", "parquet")
+XLSX_MEDIA_TYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+# -- Reading an .xlsx with openpyxl takes around 50x the file size in memory
+UPLOAD_MEMORY_FACTOR = 50
+
+
+class ReportOptions(BaseModel):
+    """The user's report options."""
+
+    co2e_limit_tons_yr: float = CO2E_LIMIT_TONS_YEAR
+    omitted_assemblies: list[str] = OMITTED_ASSEMBLIES
+
+
+class RenderOptions(ReportOptions):
+    """The report options of a re-render. These are not part of the result key."""
+
+    # -- Add the CO2e limit as the CO2e table's last ('Limit') row (off: the table is as in the upload's .ZIP)
+    co2e_limit_row: bool = False
+
+
+def get_options(
+    _co2e_limit_tons_yr: float,
+    _omitted_assemblies: list[str],
+    _compression: ZipCompression = ZIP_COMPRESSION,
+    _output_format: str = "zip",
+) -> dict:
+    """Return the options the uploaded files are processed with (and so, which are part of the result key)."""
+    options = ReportOptions(co2e_limit_tons_yr=_co2e_limit_tons_yr, omitted_assemblies=_omitted_assemblies)
+    if _output_format != "zip":
+        return {**options.model_dump(), "output": _output_format}
+    return {**options.model_dump(), "compression": _compression.label}
+
+
+def get_compression(_method: str | None, _level: int | None) -> ZipCompression:
+    """Return the .ZIP compression an upload asked for (or the server's). Raises ValueError if it is not valid."""
+    if _method is None and _level is None:
+        return ZIP_COMPRESSION
+    return ZipCompression(_method or ZIP_COMPRESSION.method, _level)
+
+
+def get_deadline(_deadline_s: float | None) -> Deadline | None:
+    """Return the upload's pipeline deadline: the server's, or the upload's `deadline_s` if shorter (or None)."""
+    limits = [s for s in (settings.request_deadline_s, _deadline_s) if s is not None and s > 0]
+    return Deadline(min(limits)) if limits else None
+
+
+def etag_matches(_if_none_match: str | None, _etag: str) -> bool:
+    """Return True if the 'If-None-Match' request header matches the ETag."""
+    if not _if_none_match:
+        return False
+    candidates = [tag.strip().removeprefix("W/") for tag in _if_none_match.split(",")]
+    return "*" in candidates or _etag in candidates
+
+
+def build_csv_zip(_csv_files: list[tuple[str, str]]) -> bytes:
+    """Return the data of a .zip file with each of the CSV files in it (compressed in parallel, if large)."""
+    memory_file = io.BytesIO()
+    entries = [(f"{file_name}.csv", csv_file) for file_name, csv_file in _csv_files]
+    parallel = sum(len(csv_file) for _, csv_file in _csv_files) >= PARALLEL_MIN_BYTES
+    build_zip(memory_file, entries, ZIP_COMPRESSION, get_executor(settings.zip_threads) if parallel else None)
+    return memory_file.getvalue()
+
+
+class QueryOptions(BaseModel):
+    """A query of the 'Variants' worksheet data. See backend.read_phpp.query.RowQuery."""
+
+    datatypes: list[str] = []
+    pattern: str | None = None
+    row_ranges: list[tuple[int, int]] = []
+    units: dict[str, str] = {}
+    shape: str = "wide"
+    dropna: bool = True
+    format: str = "json"
+
+
+class DiffOptions(BaseModel):
+    """The options of a diff of two revisions of a PHPP. See backend.read_phpp.diff.diff_phpp_data."""
+
+    abs_threshold: float = 0.0
+    rel_threshold: float = 0.0
+    format: str = "csv"
+
+
+class EnergyScenarioOptions(BaseModel):
+    """Fuel-factor scenarios for the Source Energy and CO2e of each Variant, as factor matrices: for each fuel
+    type, its factor in each scenario, in the order of `scenarios`. With no scenarios, the default factors are
+    used. See backend.write_csv.csv_writers.energy_scenarios.
+    """
+
+    scenarios: list[str] = []
+    source_factors: dict[str, list[float]] = {}
+    co2e_factors: dict[str, list[float]] = {}
+    end_use_fuels: dict[str, str] = {}
+    format: str = "json"
+
+
+class AnalyticsQuery(BaseModel):
+    """A read-only SQL query of the analytics store. See backend.analytics_store."""
+
+    sql: str
+    format: str = "json"
+
+
+class UploadSessionOptions(BaseModel):
+    """A resumable upload's file: its name, size (bytes) and SHA-256 (hex), which it is checked against."""
+
+    filename: str
+    size: int
+    sha256: str
+
+
+class Pipeline(NamedTuple):
+    """The PHPP read / CSV write functions."""
+
+    load_phpp_data: Callable
+    create_csv_files_from_phpp_data: Callable
+    create_csv_files_for_report_options: Callable
+    iter_csv_files_from_phpp_data: Callable
+    iter_tables_from_phpp_data: Callable
+    write_xlsx_report: Callable
+
+
+@cache
+def get_pipeline() -> Pipeline:
+    """Return the PHPP read / CSV write functions.
+
+    These pull in pandas, numpy, openpyxl and all the writers, so they are only imported
+    on first use (or by the pre-warm) to keep the server's cold-start fast.
+    """
+    from backend.read_phpp import load_phpp_data
+    from backend.write_csv import (
+        create_csv_files_for_report_options,
+        create_csv_files_from_phpp_data,
+        iter_csv_files_from_phpp_data,
+        iter_tables_from_phpp_data,
+        write_xlsx_report,
+    )
+
+    return Pipeline(
+        load_phpp_data,
+        create_csv_files_from_phpp_data,
+        create_csv_files_for_report_options,
+        iter_csv_files_from_phpp_data,
+        iter_tables_from_phpp_data,
+        write_xlsx_report,
+    )
+
+
+def estimate_upload_memory(_file) -> int:
+    """Return the (estimated) peak memory to process the uploaded file: the parse, plus the pipeline's outputs."""
+    _file.seek(0, os.SEEK_END)
+    file_size = _file.tell()
+    _file.seek(0)
+    return file_size * UPLOAD_MEMORY_FACTOR + (PIPELINE_MEMORY_BYTES or 0)
+
+
+def reserve_upload_memory(_nbytes: int) -> dict | None:
+    """Reserve the (estimated) memory of an upload, waiting if the server is busy with other uploads. Blocks,
+    so call it in the threadpool. Release it with `memory_budget.release` once the upload is processed.
+
+    Returns an error dict if the upload can never fit, and raises a '503' (with 'Retry-After') if it does not
+    fit within the queue time.
+    """
+    if memory_budget is None:
+        return None
+    if _nbytes > memory_budget.max_bytes:
+        return {"error": "Sorry, the file is too large for this server to process.", "code": "too_large"}
+    try:
+        memory_budget.acquire(_nbytes, settings.memory_queue_timeout_s)
+    except MemoryBudgetExceeded:
+        raise HTTPException(
+            status_code=503,
+            detail="Sorry, the server is busy. Please try again in a little while.",
+            headers={"Retry-After": "30"},
+        )
+    return None
+
+
+_prewarm_lock = threading.Lock()
+_prewarm_started = False
+
+
+def prewarm_pipeline() -> None:
+    """Import the pipeline and run it once on a tiny built-in workbook so the first real upload hits warm code."""
+    from backend.sample_workbook import build_sample_workbook
+
+    pipeline = get_pipeline()
+    try:
+        phpp_data = pipeline.load_phpp_data(io.BytesIO(build_sample_workbook()))
+        pipeline.create_csv_files_from_phpp_data(phpp_data, CO2E_LIMIT_TONS_YEAR, OMITTED_ASSEMBLIES)
+    except Exception:
+        print(f"Pre-warm Error: {traceback.format_exc()}")
+
 
 @app.get("/server_ready")
-def awake() -> dict[str, str]:
-    """Check if the server is ready to go."""
+def awake(background_tasks: BackgroundTasks) -> dict[str, str]:
+    """Check if the server is ready to go. The first call also starts the pipeline pre-warm in the background."""
+    global _prewarm_started
+
+    with _prewarm_lock:
+        if settings.prewarm_on_server_ready and not _prewarm_started:
+            _prewarm_started = True
+            background_tasks.add_task(prewarm_pipeline)
+
     return {"message": "Server is ready"}
 
 
+@app.get("/results/key")
+def get_result_key(
+    file_sha256: str,
+    co2e_limit_tons_yr: float = CO2E_LIMIT_TONS_YEAR,
+    omitted_assemblies: list[str] = Query(OMITTED_ASSEMBLIES),
+    compression: str | None = None,
+    compression_level: int | None = None,
+    output_format: str = "zip",
+) -> dict[str, str]:
+    """Return the result key (ETag) for a file with the given SHA-256, processed with the given options."""
+    try:
+        zip_compression = get_compression(compression, compression_level)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    options = get_options(co2e_limit_tons_yr, omitted_assemblies, zip_compression, output_format)
+    return {"key": result_key(file_sha256.lower(), options)}
+
+
+@app.api_route("/results/{key}", methods=["GET", "HEAD"])
+def get_result(key: str, request: Request):
+    """Return a stored .ZIP result, without re-uploading the file. Answers 304 if 'If-None-Match' matches."""
+    path = result_store.get(key) if result_store else None
+    if not path:
+        raise HTTPException(status_code=404, detail="No stored result for that key.")
+
+    etag = f'"{key}"'
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers={"ETag": etag})
+    return FileResponse(path, media_type="application/zip", filename="output.zip", headers={"ETag": etag})
+
+
 @app.post("/upload/")
-async def upload_file(file: UploadFile = File(...)):
-    """Upload a PHPP Excel file and return a .ZIP file containing .CSV files of the data."""
+async def upload_file(
+    request: Request,
+    file: UploadFile = File(...),
+    co2e_limit_tons_yr: float = Form(CO2E_LIMIT_TONS_YEAR),
+    omitted_assemblies: list[str] = Form(OMITTED_ASSEMBLIES),
+    profile: bool = Form(False),
+    request_id: str | None = Form(None),
+    compression: str | None = Form(None),
+    compression_level: int | None = Form(None),
+    output_format: str = Form("zip"),
+    deadline_s: float | None = Form(None),
+):
+    """Upload a PHPP Excel file and return a .ZIP file containing .CSV files of the data.
+
+    The response has an 'ETag' (the result key). Identical repeat uploads are answered from the
+    result store, and can be checked first with `HEAD /results/{key}`, without re-sending the file.
+
+    An upload identical (same file and options) to one already being processed waits for it, and is
+    answered with the same .ZIP (see backend.single_flight, and `GET /metrics/coalescing`).
+
+    The response's 'X-Project-Id' is the handle of the parsed project, for `POST /projects/{id}/render`.
+
+    The .ZIP is compressed with the server's method (PHPP_TO_CSV_ZIP_COMPRESSION), unless the upload asks
+    for another with `compression` ('stored', 'deflate' or 'zstd') and `compression_level`. Note: zstd .ZIP
+    files need 7-Zip, libarchive (bsdtar) or Python 3.14+ to open.
+
+    With `output_format=xlsx`, the response is instead one formatted Excel report, with a worksheet per
+    table (typed numbers, formatted with their units). These are not kept in the result store.
+
+    The pipeline has a deadline (PHPP_TO_CSV_REQUEST_DEADLINE_S, or the upload's `deadline_s` if shorter).
+    The CSV writers not started by then are skipped, and any writer which fails is left out, so the .ZIP
+    has every CSV which could be made. Its 'manifest.json' lists each writer's outcome ('ok', 'failed'
+    or 'skipped'), files and seconds. A partial .ZIP has 'X-Outputs-Complete: false' (and no ETag).
+
+    With `profile=true` (only if the server allows it), the pipeline is profiled and the .ZIP also has
+    'profile.pstats', 'profile_collapsed.txt' (for flamegraphs) and 'profile_summary.csv'.
+
+    Each stage (received, validated, each worksheet read, each CSV written, zipped) is published as a
+    Server-Sent Event at `GET /jobs/{request_id}/events`, with the `request_id` from `POST /jobs/` (or the
+    response's 'X-Request-Id'). Each upload needs a new `request_id`: one already used is a '409'. The job
+    stops at its next stage if cancelled (`POST /jobs/{request_id}/cancel`), or if the client disconnects.
+    """
+    deadline = get_deadline(deadline_s)
+    job = start_job(request_id)
+
+    try:
+        zip_compression = get_compression(compression, compression_level)
+    except ValueError as e:
+        job.finish("error", str(e))
+        return {"error": f"Sorry, {str(e)}", "code": "invalid_compression"}
+
+    if output_format not in OUTPUT_FORMATS or (profile and output_format != "zip"):
+        error = f"Sorry, the output format must be one of {OUTPUT_FORMATS} (and 'zip' to profile): '{output_format}'"
+        job.finish("error", error)
+        return {"error": error, "code": "invalid_output_format"}
+
+    try:
+        response = await handle_upload(
+            request,
+            job,
+            file,
+            co2e_limit_tons_yr,
+            omitted_assemblies,
+            profile,
+            zip_compression,
+            output_format,
+            deadline,
+        )
+    except JobCancelled:
+        job.finish("cancelled")
+        return {"error": "The upload was cancelled.", "code": "cancelled"}
+    except BaseException as e:
+        job.finish("error", str(e))
+        raise
+
+    if isinstance(response, dict):
+        job.finish("error", response.get("error"))
+        return response
+    job.finish("done")
+    response.headers["X-Request-Id"] = job.request_id
+    return response
+
+
+def start_job(_request_id: str | None) -> ProgressJob:
+    """Return the upload's progress job (a new one with no request id), or raise a 404 / 409 if the
+    request id was never issued (or expired) / was already used by an upload.
+    """
+    try:
+        return progress_jobs.start(_request_id)
+    except KeyError:
+        raise HTTPException(status_code=404, detail="No job with that request id (or it expired).")
+    except RequestIdInUse:
+        raise HTTPException(status_code=409, detail="The request id was already used. Get a new one (POST /jobs/).")
+
+
+async def run_until_disconnected(_request: Request, _job: ProgressJob, _func: Callable, *_args):
+    """Run the (blocking) function in the threadpool and return its result. If the client disconnects
+    before it is done, the job is cancelled, so the function stops at its next stage.
+    """
+    task = asyncio.ensure_future(run_in_threadpool(_func, *_args))
+    while True:
+        done, _ = await asyncio.wait({task}, timeout=DISCONNECT_POLL_S)
+        if done:
+            return task.result()
+        if not _job.cancelled and await _request.is_disconnected():
+            _job.cancel()
+
+
+async def handle_upload(
+    _request: Request,
+    _job: ProgressJob,
+    _file: UploadFile,
+    _co2e_limit_tons_yr: float,
+    _omitted_assemblies: list[str],
+    _profile: bool,
+    _compression: ZipCompression,
+    _output_format: str,
+    _deadline: Deadline | None,
+) -> Response | dict:
+    """Check and process an upload, publishing its progress to the job. See `upload_file`."""
+    _job.publish("received", _file.filename if _file else None)
 
     # -------------------------------------------------------------------------
     # Check th uploaded file is an Excel file
-    if not file:
+    if not _file:
         return {"error": "No file provided?"}
 
-    filename = file.filename or ""
+    filename = _file.filename or ""
     if not filename.endswith(".xlsx"):
         return {"error": "Sorry, only Excel files (xlsx) are allowed."}
 
+    if _profile and not settings.allow_profiling:
+        return {"error": "Sorry, profiling is not enabled on this server.", "code": "profiling_disabled"}
+
     # -------------------------------------------------------------------------
-    # Read in the Excel file using Pandas and output the PHPP-Data
-    try:
-        phpp_data = load_phpp_data(file.file)
-    except Exception as e:
-        error_info = traceback.format_exc()
-        print(f"Error: {error_info}")
-        return {"error": f"Sorry, there was an error reading the Excel file: {str(e)}"}
+    # Check for an already stored result of the same file and options (a profile always runs the pipeline)
+    file_sha256 = await run_in_threadpool(hash_file, _file.file)
+    options = get_options(_co2e_limit_tons_yr, _omitted_assemblies, _compression, _output_format)
+    key = result_key(file_sha256, options)
+    headers = {"ETag": f'"{key}"'}
+    if project_id := project_store.get_id_for_file(file_sha256):
+        headers["X-Project-Id"] = project_id
+    if not _profile and etag_matches(_request.headers.get("if-none-match"), headers["ETag"]):
+        return Response(status_code=304, headers=headers)
+    if not _profile and result_store and (stored_path := result_store.get(key)):
+        _job.publish("cached")
+        return FileResponse(stored_path, media_type="application/zip", filename="output.zip", headers=headers)
 
     # -------------------------------------------------------------------------
-    # Create the CSV files from the PHPP-Data in memory
+    # Wait for any identical upload already being processed, then answer with its result
+    coalesce = single_flight is not None and not _profile and _output_format == "zip"
+    async with single_flight.flight(key) if coalesce else nullcontext(False) as waited:
+        if waited and result_store and (stored_path := result_store.get(key)):
+            single_flight.record_answered()
+            if project_id := project_store.get_id_for_file(file_sha256):
+                headers["X-Project-Id"] = project_id
+            _job.publish("coalesced")
+            return FileResponse(stored_path, media_type="application/zip", filename="output.zip", headers=headers)
+
+        # ---------------------------------------------------------------------
+        # Check the workbook's worksheets and layout before the (slow) full read
+        try:
+            await run_in_threadpool(validate_workbook, _file.file)
+        except WorkbookValidationError as e:
+            return e.to_dict()
+        _job.publish("validated")
+
+        # ---------------------------------------------------------------------
+        # Reserve the (estimated) memory needed, waiting if the server is busy with other uploads
+        reservation = estimate_upload_memory(_file.file)
+        if error := await run_in_threadpool(reserve_upload_memory, reservation):
+            return error
+
+        try:
+            return await run_until_disconnected(
+                _request,
+                _job,
+                process_upload,
+                _file,
+                file_sha256,
+                key,
+                headers,
+                _co2e_limit_tons_yr,
+                _omitted_assemblies,
+                _profile,
+                _compression,
+                _output_format,
+                _deadline,
+                _job,
+            )
+        finally:
+            if memory_budget:
+                memory_budget.release(reservation)
+
+
+def process_upload(
+    _file: UploadFile,
+    _file_sha256: str,
+    _key: str,
+    _headers: dict[str, str],
+    _co2e_limit_tons_yr: float,
+    _omitted_assemblies: list[str],
+    _profile: bool,
+    _compression: ZipCompression,
+    _output_format: str,
+    _deadline: Deadline | None,
+    _job: ProgressJob,
+) -> Response | dict:
+    """Run the pipeline on an uploaded file and return the .ZIP (or .xlsx report) file response, or an error dict.
+
+    Each stage is published to the job, which raises JobCancelled there if the job was cancelled.
+
+    While the PHPPData and the CSVs fit within PIPELINE_MEMORY_BYTES they are kept in memory.
+    Beyond that, the CSVs are spilled to temp files and the .ZIP is written to (and streamed from) disk.
+    An .xlsx report is always written to disk, each table in turn, so only one is in memory at a time.
+
+    Each CSV writer's outcome is recorded in the manifest (see iter_csv_files_from_phpp_data). A writer
+    which fails, or is skipped at the deadline, is left out, and the (partial) result is not stored.
+    """
+    from backend.write_csv.output_manifest import OutputManifest
+    from backend.write_csv.spill import SpillingOutputs
+
+    pipeline = get_pipeline()
+    profiler = RequestProfiler() if _profile else nullcontext()
+
+    with profiler:
+        # ---------------------------------------------------------------------
+        # Read in the Excel file using Pandas and output the PHPP-Data
+        try:
+            phpp_data = pipeline.load_phpp_data(_file.file, _on_progress=_job.publish, _deadline=_deadline)
+        except JobCancelled:
+            raise
+        except DeadlineExceeded as e:
+            return {"error": f"Sorry, the file took too long to read. {str(e)}", "code": "deadline_exceeded"}
+        except Exception as e:
+            error_info = traceback.format_exc()
+            print(f"Error: {error_info}")
+            return {"error": f"Sorry, there was an error reading the Excel file: {str(e)}"}
+
+        # ---------------------------------------------------------------------
+        # Create the CSV files from the PHPP-Data, in memory while they fit (or write them to the report)
+        _job.publish("parsed")
+        outputs = SpillingOutputs(PIPELINE_MEMORY_BYTES, phpp_data.nbytes)
+        manifest = OutputManifest(_deadline.seconds if _deadline else None)
+        report_path = None
+        if _output_format == "xlsx":
+            report_fd, report_path = tempfile.mkstemp(suffix=".xlsx")
+            os.close(report_fd)
+
+        def discard_outputs() -> None:
+            outputs.close()
+            if report_path:
+                os.remove(report_path)
+
+        try:
+            if report_path:
+                # -- The report is written from the writers' (typed) tables, not from their CSVs
+                tables = _job.track(
+                    pipeline.iter_tables_from_phpp_data(
+                        phpp_data,
+                        _co2e_limit_tons_yr,
+                        _omitted_assemblies,
+                        deadline=_deadline,
+                        manifest=manifest,
+                    ),
+                    "csv",
+                )
+                pipeline.write_xlsx_report(report_path, itertools.chain(tables, manifest.iter_table_output()))
+            else:
+                csv_files = _job.track(
+                    pipeline.iter_csv_files_from_phpp_data(
+                        phpp_data,
+                        _co2e_limit_tons_yr,
+                        _omitted_assemblies,
+                        deadline=_deadline,
+                        manifest=manifest,
+                    ),
+                    "csv",
+                )
+                outputs.extend(csv_files)
+        except JobCancelled:
+            discard_outputs()
+            raise
+        except Exception as e:
+            discard_outputs()
+            error_info = traceback.format_exc()
+            print(f"Error: {error_info}")
+            raise HTTPException(status_code=500, detail=f"Sorry, there was an error creating the CSV files: {str(e)}")
+
+        if not manifest.num_files:
+            discard_outputs()
+            errors = [f"{record.writer}: {record.error}" for record in manifest.incomplete()]
+            print(f"Error: No CSV files were created: {errors}")
+            raise HTTPException(status_code=500, detail=f"Sorry, none of the CSV files could be created: {errors[:3]}")
+
+    headers = dict(_headers)
+    headers["X-Project-Id"] = project_store.put(phpp_data, _file_sha256)
+    if analytics_sink:
+        analytics_sink.submit(phpp_data, _file_sha256, _file.filename)
+    extra_files = {"manifest.json": manifest.to_json()}
+    store_result = result_store is not None and manifest.complete
+    if not manifest.complete:
+        headers.pop("ETag")
+        headers["X-Outputs-Complete"] = "false"
+        _job.publish("partial", ", ".join(record.writer for record in manifest.incomplete()))
+    if isinstance(profiler, RequestProfiler):
+        extra_files.update(profiler.output_files())
+        headers.pop("ETag", None)
+        store_result = False
+
+    # -------------------------------------------------------------------------
+    # The Excel report: stream it from disk (it is not kept in the result store)
+    if report_path:
+        _job.publish("report")
+        return FileResponse(
+            report_path,
+            media_type=XLSX_MEDIA_TYPE,
+            filename="output.xlsx",
+            headers=headers,
+            background=BackgroundTask(os.remove, report_path),
+        )
+
+    with outputs:
+        # ---------------------------------------------------------------------
+        # Spilled outputs: write the .zip file to disk, and stream it from there
+        if outputs.num_spilled:
+            zip_fd, zip_path = tempfile.mkstemp(suffix=".zip")
+            with os.fdopen(zip_fd, "wb") as zip_file:
+                outputs.write_zip(zip_file, extra_files, _compression)
+            _job.publish("zipped")
+            if store_result:
+                result_store.put_file(_key, zip_path)
+            return FileResponse(
+                zip_path,
+                media_type="application/zip",
+                filename="output.zip",
+                headers=headers,
+                background=BackgroundTask(os.remove, zip_path),
+            )
+
+        # ---------------------------------------------------------------------
+        # Create a .zip file in memory, and keep a copy in the result store (if complete, and not profiled)
+        memory_file = io.BytesIO()
+        outputs.write_zip(memory_file, extra_files, _compression, settings.zip_threads)
+        zip_data = memory_file.getvalue()
+        _job.publish("zipped")
+        if store_result:
+            result_store.put(_key, zip_data)
+
+    # -------------------------------------------------------------------------
+    # Create a StreamingResponse to return the zip file
+    response = StreamingResponse(io.BytesIO(zip_data), media_type="application/zip")
+    response.headers["Content-Disposition"] = "attachment; filename=output.zip"
+    response.headers.update(headers)
+
+    return response
+
+
+@app.post("/uploads/")
+def create_upload_session(options: UploadSessionOptions) -> dict:
+    """Start a resumable upload of a (large) workbook. The file is then sent in chunks, each with
+    `PUT /uploads/{upload_id}` and a 'Content-Range: bytes <first>-<last>/<size>' header, in order.
+
+    After a dropped connection, `GET /uploads/{upload_id}` gives the offset (bytes received) to resume
+    from. Once all are sent, `POST /uploads/{upload_id}/finish` checks the file's SHA-256 and runs it
+    through the pipeline, exactly as `POST /upload/`.
+    """
+    if upload_sessions is None:
+        return {"error": "Sorry, resumable uploads are not available on this server.", "code": "uploads_unavailable"}
+    try:
+        session = upload_sessions.create(options.filename, options.size, options.sha256)
+    except UploadSessionError as e:
+        return e.to_dict()
+    return {"upload_id": session.upload_id, "offset": session.offset, "chunk_size": upload_sessions.max_chunk_bytes}
+
+
+def get_upload_session_or_404(_upload_id: str) -> UploadSession:
+    """Return the resumable upload, or raise a 404 if there is no such upload (or it expired)."""
+    if upload_sessions is None:
+        raise HTTPException(status_code=404, detail="Resumable uploads are not available on this server.")
+    try:
+        return upload_sessions.get(_upload_id)
+    except UploadSessionError as e:
+        raise HTTPException(status_code=404, detail=e.message)
+
+
+@app.api_route("/uploads/{upload_id}", methods=["GET", "HEAD"])
+def get_upload_session(upload_id: str, response: Response) -> dict:
+    """Return a resumable upload's size and offset (the bytes received so far, also the 'Upload-Offset' header)."""
+    session = get_upload_session_or_404(upload_id)
+    response.headers["Upload-Offset"] = str(session.offset)
+    response.headers["Cache-Control"] = "no-store"
+    return {
+        "upload_id": session.upload_id,
+        "filename": session.filename,
+        "size": session.size,
+        "offset": session.offset,
+    }
+
+
+@app.put("/uploads/{upload_id}")
+async def put_upload_chunk(upload_id: str, request: Request) -> dict:
+    """Add a chunk (the request body, streamed straight to disk) to a resumable upload. It must start
+    at the upload's offset, else the error code is 'offset_mismatch', with the offset to resume from.
+    """
+    get_upload_session_or_404(upload_id)
+    try:
+        session = await upload_sessions.write_chunk(
+            upload_id, request.headers.get("content-range"), request.stream(), run_in_threadpool
+        )
+    except UploadSessionError as e:
+        return e.to_dict()
+    return {"upload_id": session.upload_id, "offset": session.offset, "complete": session.complete}
+
+
+@app.delete("/uploads/{upload_id}")
+def delete_upload_session(upload_id: str) -> dict[str, str]:
+    """Abandon a resumable upload, and remove what was received of it."""
+    get_upload_session_or_404(upload_id)
+    upload_sessions.remove(upload_id)
+    return {"message": "Removed"}
+
+
+@app.post("/uploads/{upload_id}/finish")
+async def finish_upload_session(
+    upload_id: str,
+    request: Request,
+    co2e_limit_tons_yr: float = Form(CO2E_LIMIT_TONS_YEAR),
+    omitted_assemblies: list[str] = Form(OMITTED_ASSEMBLIES),
+    profile: bool = Form(False),
+    request_id: str | None = Form(None),
+    compression: str | None = Form(None),
+    compression_level: int | None = Form(None),
+    output_format: str = Form("zip"),
+    deadline_s: float | None = Form(None),
+):
+    """Check a resumable upload's file (all received, with its SHA-256), then process it as `POST /upload/`,
+    with the same options, and return its response.
+
+    The upload is removed once processed. If the server was busy ('503'), the request id could not be
+    used ('404' / '409') or the job was cancelled, it is kept, so the finish can be tried again without
+    re-sending the file.
+    """
+    get_upload_session_or_404(upload_id)
+    try:
+        session, path = await run_in_threadpool(upload_sessions.finish, upload_id)
+    except UploadSessionError as e:
+        return e.to_dict()
+
+    keep_session = False
+    try:
+        with open(path, "rb") as f:
+            response = await upload_file(
+                request,
+                UploadFile(f, size=session.size, filename=session.filename),
+                co2e_limit_tons_yr,
+                omitted_assemblies,
+                profile,
+                request_id,
+                compression,
+                compression_level,
+                output_format,
+                deadline_s,
+            )
+        keep_session = isinstance(response, dict) and response.get("code") == "cancelled"
+        return response
+    except HTTPException as e:
+        keep_session = e.status_code in (404, 409, 503)
+        raise
+    finally:
+        if not keep_session:
+            upload_sessions.remove(upload_id)
+
+
+@app.get("/metrics/coalescing")
+def coalescing_metrics() -> dict:
+    """Return this server process's counts of uploads processed once for several identical requests."""
+    if single_flight is None:
+        return {"enabled": False}
+    return {"enabled": True, "in_flight": single_flight.in_flight, **single_flight.metrics.to_dict()}
+
+
+@app.post("/jobs/")
+def create_job() -> dict[str, str]:
+    """Start a progress job, for an upload to come. Returns its (new) `request_id`, to send with the upload.
+
+    Each upload needs its own request id. Only the client which holds it can follow, or cancel, the upload.
+    """
+    return {"request_id": progress_jobs.create().request_id}
+
+
+@app.get("/jobs/{request_id}/events")
+async def job_events(request_id: str):
+    """Follow an upload's progress, as Server-Sent Events. Each 'progress' event's data is JSON:
+    {"stage", "detail", "elapsed_s", "stage_s"}. The stream ends after the 'done', 'error' or 'cancelled' stage.
+
+    A client may subscribe before it sends the upload (with the same `request_id`), so no event is missed.
+    """
+    job = progress_jobs.get(request_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="No job with that request id (or it expired).")
+
+    return StreamingResponse(
+        job.subscribe(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.post("/jobs/{request_id}/cancel")
+def cancel_job(request_id: str) -> dict[str, str]:
+    """Cancel an upload's processing. It stops at its next stage, and the upload is answered with
+    the error code 'cancelled'.
+    """
+    job = progress_jobs.get(request_id)
+    if job is None or job.finished is not None:
+        raise HTTPException(status_code=404, detail="No running upload with that request id.")
+    job.cancel()
+    return {"message": "Cancelling"}
+
+
+@app.post("/projects/{project_id}/render")
+def render_project(project_id: str, options: RenderOptions):
+    """Re-render only the reports which depend on the report options, for an already uploaded (parsed) project.
+
+    Returns a .ZIP file with the re-rendered .CSV files (the CO2e and Variant tables).
+    """
+    phpp_data = project_store.get(project_id)
+    if phpp_data is None:
+        raise HTTPException(status_code=404, detail="Project not found (or expired). Please upload the file again.")
+
     try:
-        csv_files = create_csv_files_from_phpp_data(
-            phpp_data,
-            CO2E_LIMIT_TONS_YEAR,
-            OMITTED_ASSEMBLIES,
+        csv_files = get_pipeline().create_csv_files_for_report_options(
+            phpp_data, options.co2e_limit_tons_yr, options.omitted_assemblies, options.co2e_limit_row
         )
-    except KeyError as e:
+    except Exception as e:
         error_info = traceback.format_exc()
         print(f"Error: {error_info}")
-        raise HTTPException(status_code=500, detail=f"Sorry, there was an error creating the CSV file: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Sorry, there was an error creating the CSV files: {str(e)}")
+
+    response = StreamingResponse(io.BytesIO(build_csv_zip(csv_files)), media_type="application/zip")
+    response.headers["Content-Disposition"] = "attachment; filename=output.zip"
+    return response
+
+
+def read_uploaded_project(_file: UploadFile, _deadline: Deadline | None) -> tuple[str, "PHPPData"] | dict:
+    """Return the (project-id, PHPPData) of an uploaded workbook, or an error dict.
+
+    A workbook already in the project store is not read again. Otherwise it is checked, read (within
+    the deadline), and stored. The caller reserves its memory (see `diff_uploads`).
+    """
+    if not (_file.filename or "").endswith(".xlsx"):
+        return {"error": f"Sorry, only Excel files (xlsx) are allowed: '{_file.filename}'"}
+
+    file_sha256 = hash_file(_file.file)
+    if (project_id := project_store.get_id_for_file(file_sha256)) and (phpp_data := project_store.get(project_id)):
+        return project_id, phpp_data
+
+    try:
+        validate_workbook(_file.file)
+    except WorkbookValidationError as e:
+        return e.to_dict()
+
+    try:
+        phpp_data = get_pipeline().load_phpp_data(_file.file, _deadline=_deadline)
+    except DeadlineExceeded as e:
+        return {
+            "error": f"Sorry, the file '{_file.filename}' took too long to read. {str(e)}",
+            "code": "deadline_exceeded",
+        }
     except Exception as e:
         error_info = traceback.format_exc()
         print(f"Error: {error_info}")
-        raise HTTPException(status_code=500, detail=f"Sorry, there was an error creating the CSV files: {str(e)}")
+        return {"error": f"Sorry, there was an error reading the Excel file '{_file.filename}': {str(e)}"}
+    if analytics_sink:
+        analytics_sink.submit(phpp_data, file_sha256, _file.filename)
+    return project_store.put(phpp_data, file_sha256), phpp_data
 
-    # -------------------------------------------------------------------------
-    # Create a .zip file in memory
-    memory_file = io.BytesIO()
-    with zipfile.ZipFile(memory_file, "w") as zf:
-        # Loop through each CSV name and data-string in the collection
-        # and add each CSV file data to the .zip file
-        for file_name, csv_file in csv_files:
-            zf.writestr(f"{file_name}.csv", csv_file)
 
-    # -------------------------------------------------------------------------
-    # Create a StreamingResponse to return the zip file
-    # Reset the memory file pointer to the start before steaming it back
-    memory_file.seek(0)
-    response = StreamingResponse(memory_file, media_type="application/zip")
-    response.headers["Content-Disposition"] = "attachment; filename=output.zip"
+def diff_response(_old: "PHPPData", _new: "PHPPData", _options: DiffOptions, _new_project_id: str) -> Response | dict:
+    """Return the diff of the two projects as a CSV or Parquet file response (or an error dict)."""
+    from backend.read_phpp.diff import diff_phpp_data
 
-    return response
+    df = diff_phpp_data(_old, _new, _options.abs_threshold, _options.rel_threshold)
+    headers = {"X-Project-Id": _new_project_id, "Content-Disposition": f"attachment; filename=diff.{_options.format}"}
+    if _options.format == "csv":
+        return Response(df.to_csv(index=False), media_type="text/csv", headers=headers)
+
+    try:
+        parquet_file = io.BytesIO()
+        df.to_parquet(parquet_file, index=False)
+    except ImportError:
+        return {"error": "Sorry, Parquet output is not available on this server.", "code": "parquet_unavailable"}
+    return Response(parquet_file.getvalue(), media_type="application/vnd.apache.parquet", headers=headers)
+
+
+def diff_uploads(_old: "PHPPData | None", _files: list[UploadFile], _options: DiffOptions) -> Response | dict:
+    """Read the uploaded revisions (the old, then the new; or only the new, with the `_old` project) and
+    return their diff response (or an error dict).
+
+    The format is checked first, before any workbook is read. The memory of all the files is then reserved
+    at once (as an upload's, see `handle_upload`), and held until the diff is made. The reads share the
+    server's deadline.
+    """
+    if _options.format not in DIFF_FORMATS:
+        return {"error": f"Sorry, the diff format must be 'csv' or 'parquet', not '{_options.format}'."}
+
+    reservation = sum(estimate_upload_memory(file.file) for file in _files)
+    if error := reserve_upload_memory(reservation):
+        return error
+    try:
+        deadline = get_deadline(None)
+        projects = []
+        for file in _files:
+            project = read_uploaded_project(file, deadline)
+            if isinstance(project, dict):
+                return project
+            projects.append(project)
+
+        old = _old if _old is not None else projects[0][1]
+        return diff_response(old, projects[-1][1], _options, projects[-1][0])
+    finally:
+        if memory_budget:
+            memory_budget.release(reservation)
+
+
+@app.post("/diff/")
+def diff_files(
+    old_file: UploadFile = File(...),
+    new_file: UploadFile = File(...),
+    abs_threshold: float = Form(0.0),
+    rel_threshold: float = Form(0.0),
+    format: str = Form("csv"),
+):
+    """Upload two revisions of a PHPP and return the 'Variants' values which changed, as a CSV (or Parquet) file.
+
+    Rows are matched by Datatype and columns by Variant name. Only values added, removed, or changed by
+    more than both thresholds are listed. The response's 'X-Project-Id' is the handle of the new revision.
+    """
+    options = DiffOptions(abs_threshold=abs_threshold, rel_threshold=rel_threshold, format=format)
+    return diff_uploads(None, [old_file, new_file], options)
+
+
+@app.post("/projects/{project_id}/diff")
+def diff_project(
+    project_id: str,
+    file: UploadFile = File(...),
+    abs_threshold: float = Form(0.0),
+    rel_threshold: float = Form(0.0),
+    format: str = Form("csv"),
+):
+    """Upload a new revision of an already uploaded (parsed) project and return the 'Variants' values which
+    changed, as a CSV (or Parquet) file. See `POST /diff/`.
+    """
+    phpp_data = project_store.get(project_id)
+    if phpp_data is None:
+        raise HTTPException(status_code=404, detail="Project not found (or expired). Please upload the file again.")
+
+    options = DiffOptions(abs_threshold=abs_threshold, rel_threshold=rel_threshold, format=format)
+    return diff_uploads(phpp_data, [file], options)
+
+
+@app.post("/projects/{project_id}/query")
+def query_project(project_id: str, options: QueryOptions):
+    """Return the rows of an already uploaded (parsed) project's 'Variants' data, selected by Datatype,
+    regex or Excel row-range, as JSON records (default) or CSV (`"format": "csv"`).
+    """
+    from backend.read_phpp.query import RowQuery, query_phpp_data
+
+    phpp_data = project_store.get(project_id)
+    if phpp_data is None:
+        raise HTTPException(status_code=404, detail="Project not found (or expired). Please upload the file again.")
+
+    try:
+        df = query_phpp_data(phpp_data, RowQuery(**options.model_dump(exclude={"format"})))
+    except (ValueError, re.error) as e:
+        return {"error": f"Sorry, there was an error in the query: {str(e)}"}
+
+    if options.format == "csv":
+        return Response(df.to_csv(index=False), media_type="text/csv")
+    return Response(df.to_json(orient="records"), media_type="application/json")
+
+
+@app.post("/projects/{project_id}/energy_scenarios")
+def energy_scenarios_project(project_id: str, options: EnergyScenarioOptions):
+    """Return the Site, Source Energy and CO2e of each Variant of an already uploaded (parsed) project, under
+    every fuel-factor scenario (one row per scenario x Variant), as JSON records (default) or CSV (`"format": "csv"`).
+    """
+    from backend.write_csv.csv_writers.energy_scenarios import (
+        CO2E_FACTORS,
+        SOURCE_FACTORS,
+        EnergyScenarios,
+        calc_energy_scenarios,
+    )
+
+    phpp_data = project_store.get(project_id)
+    if phpp_data is None:
+        raise HTTPException(status_code=404, detail="Project not found (or expired). Please upload the file again.")
+
+    try:
+        if options.scenarios:
+            scenarios = EnergyScenarios.from_columns(options.scenarios, options.source_factors, options.co2e_factors)
+        else:
+            scenarios = EnergyScenarios.single("Default", SOURCE_FACTORS, CO2E_FACTORS)
+        df = calc_energy_scenarios(phpp_data, scenarios, options.end_use_fuels)
+    except ValueError as e:
+        return {"error": f"Sorry, there was an error in the scenarios: {str(e)}"}
+
+    if options.format == "csv":
+        return Response(df.to_csv(index=False), media_type="text/csv")
+    return Response(df.to_json(orient="records"), media_type="application/json")
+
+
+@app.post("/analytics/query")
+def query_analytics(options: AnalyticsQuery, authorization: str | None = Header(None)):
+    """Run a read-only SQL query of the analytics store (every processed project's 'Variants' data), and return
+    the rows as JSON records (default) or CSV (`"format": "csv"`). Query the 'metric_values' view by Datatype,
+    Variant, project attributes, etc..
+
+    As it reads every customer's data, the request needs the server's token (PHPP_TO_CSV_ANALYTICS_TOKEN) as
+    'Authorization: Bearer <token>'. Without a token set, the endpoint is off.
+    """
+    if analytics_sink is None or not settings.analytics_token:
+        raise HTTPException(status_code=404, detail="The analytics query is not enabled on this server.")
+    if not hmac.compare_digest((authorization or "").encode(), f"Bearer {settings.analytics_token}".encode()):
+        raise HTTPException(status_code=401, detail="Not authorized.", headers={"WWW-Authenticate": "Bearer"})
+
+    try:
+        columns, rows = analytics_sink.store.query(options.sql)
+    except sqlite3.Error as e:
+        return {"error": f"Sorry, there was an error in the query: {str(e)}"}
+
+    if options.format == "csv":
+        csv_file = io.StringIO()
+        writer = csv.writer(csv_file)
+        writer.writerow(columns)
+        writer.writerows(rows)
+        return Response(csv_file.getvalue(), media_type="text/csv")
+    return Response(json.dumps([dict(zip(columns, row)) for row in rows]), media_type="application/json")
@@ -0,0 +1,51 @@
+# -*- coding: utf-8 -*-
+# -*- Python Version: 3.11 -*-
+
+"""A server-wide memory budget, which uploads reserve from before they are processed."""
+
+from contextlib import contextmanager
+import threading
+from typing import Iterator
+
+
+class MemoryBudgetExceeded(Exception):
+    """The work does not fit within the memory budget (now, or within the wait time)."""
+
+
+class MemoryBudget:
+    """Reservations of (estimated) memory, up to `max_bytes` in total.
+
+    A reservation which does not fit waits (queues) until enough is released, up to the timeout.
+    A reservation larger than the whole budget can never fit and fails at once.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.reserved_bytes = 0
+        self._condition = threading.Condition()
+
+    def acquire(self, _nbytes: int, _timeout_s: float) -> None:
+        """Reserve the bytes, waiting up to the timeout for them to be free. Raises MemoryBudgetExceeded."""
+        if _nbytes > self.max_bytes:
+            raise MemoryBudgetExceeded(f"{_nbytes:,} bytes is more than the whole budget of {self.max_bytes:,} bytes.")
+
+        with self._condition:
+            fits = self._condition.wait_for(lambda: self.reserved_bytes + _nbytes <= self.max_bytes, _timeout_s)
+            if not fits:
+                raise MemoryBudgetExceeded(f"No room for {_nbytes:,} bytes within {_timeout_s} seconds.")
+            self.reserved_bytes += _nbytes
+
+    def release(self, _nbytes: int) -> None:
+        """Return reserved bytes to the budget, and wake any waiting reservations."""
+        with self._condition:
+            self.reserved_bytes = max(self.reserved_bytes - _nbytes, 0)
+            self._condition.notify_all()
+
+    @contextmanager
+    def reserve(self, _nbytes: int, _timeout_s: float) -> Iterator[None]:
+        """Reserve the bytes for the duration of the `with` block."""
+        self.acquire(_nbytes, _timeout_s)
+        try:
+            yield
+        finally:
+            self.release(_nbytes)
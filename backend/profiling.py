@@ -0,0 +1,109 @@
+# -*- coding: utf-8 -*-
+# -*- Python Version: 3.11 -*-
+
+"""Opt-in profiling of a single upload: a deterministic (cProfile) profile plus a sampled, flamegraph-ready stack."""
+
+from collections import Counter
+import cProfile
+import csv
+import io
+import marshal
+import os
+import pstats
+import sys
+import threading
+from types import FrameType
+
+# -- The functions whose time is listed in the summary (as well as every 'create_csv_*' / 'create_df_*' writer)
+SUMMARY_FUNCTIONS = ("load_phpp_data", "clean_main_DataFrame")
+SUMMARY_PREFIXES = ("create_csv_", "create_df_")
+
+
+def _frame_label(_frame: FrameType) -> str:
+    """Return a ';'-free label for a stack frame, ie: 'load_phpp_data (load_phpp_data.py:182)'."""
+    code = _frame.f_code
+    return f"{code.co_qualname} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})".replace(";", ":")
+
+
+class StackSampler:
+    """Sample the call-stack of one thread at a fixed interval, counting each unique (collapsed) stack."""
+
+    def __init__(self, thread_id: int, interval_s: float = 0.005):
+        self.thread_id = thread_id
+        self.interval_s = interval_s
+        self.stacks: Counter[str] = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval_s):
+            frame = sys._current_frames().get(self.thread_id)
+            labels = []
+            while frame is not None:
+                labels.append(_frame_label(frame))
+                frame = frame.f_back
+            if labels:
+                self.stacks[";".join(reversed(labels))] += 1
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join()
+
+    def collapsed(self) -> str:
+        """Return the stacks in the 'collapsed' format read by flamegraph.pl / speedscope: 'a;b;c <count>'."""
+        return "".join(f"{stack} {count}\n" for stack, count in sorted(self.stacks.items()))
+
+
+class RequestProfiler:
+    """Profile everything run in the calling thread within the `with` block.
+
+    Usage:
+        with RequestProfiler() as profiler:
+            ...
+        extra_files = profiler.output_files()
+    """
+
+    def __init__(self, sample_interval_s: float = 0.005):
+        self.profile = cProfile.Profile()
+        self.sampler = StackSampler(threading.get_ident(), sample_interval_s)
+
+    def __enter__(self) -> "RequestProfiler":
+        self.sampler.start()
+        self.profile.enable()
+        return self
+
+    def __exit__(self, *_) -> None:
+        self.profile.disable()
+        self.sampler.stop()
+
+    def pstats_data(self) -> bytes:
+        """Return the profile in the binary format written by pstats.Stats.dump_stats()."""
+        stats = pstats.Stats(self.profile)
+        return marshal.dumps(stats.stats)  # type: ignore[attr-defined]
+
+    def summary_csv(self) -> str:
+        """Return a CSV of the calls and time (seconds) spent in the reader, cleaner and each CSV writer."""
+        stats = pstats.Stats(self.profile).stats  # type: ignore[attr-defined]
+        rows = []
+        for (file_name, line, func_name), (_, num_calls, total_time, cumulative_time, _) in stats.items():
+            if func_name in SUMMARY_FUNCTIONS or func_name.startswith(SUMMARY_PREFIXES):
+                location = f"{os.path.basename(file_name)}:{line}"
+                rows.append((func_name, location, num_calls, round(total_time, 6), round(cumulative_time, 6)))
+        rows.sort(key=lambda row: row[-1], reverse=True)
+
+        output = io.StringIO()
+        writer = csv.writer(output, lineterminator="\n")
+        writer.writerow(["Function", "Location", "Calls", "Own Time (s)", "Cumulative Time (s)"])
+        writer.writerows(rows)
+        return output.getvalue()
+
+    def output_files(self) -> dict[str, bytes | str]:
+        """Return the profile files to add to the result .zip, by file name."""
+        return {
+            "profile.pstats": self.pstats_data(),
+            "profile_collapsed.txt": self.sampler.collapsed(),
+            "profile_summary.csv": self.summary_csv(),
+        }
@@ -0,0 +1,188 @@
+# -*- coding: utf-8 -*-
+# -*- Python Version: 3.11 -*-
+
+"""Per-request progress events of the upload pipeline, for clients to follow (Server-Sent Events) or cancel."""
+
+import asyncio
+from dataclasses import asdict, dataclass
+import json
+import threading
+import time
+from typing import AsyncIterator, Iterable, Iterator, TypeVar
+import uuid
+
+T = TypeVar("T")
+
+# -- The stages which end a job
+FINAL_STAGES = ("done", "error", "cancelled")
+
+
+class JobCancelled(Exception):
+    """The job was cancelled (by the client, or because it disconnected)."""
+
+
+class RequestIdInUse(Exception):
+    """The request id's job already has an upload. Each upload needs a new request id."""
+
+
+@dataclass
+class ProgressEvent:
+    """One stage of a job. The timings are seconds since its first event, and since the previous event."""
+
+    stage: str
+    detail: str | None
+    elapsed_s: float
+    stage_s: float
+
+    def to_sse(self) -> str:
+        """Return the event as a Server-Sent Events message."""
+        return f"event: progress\ndata: {json.dumps(asdict(self))}\n\n"
+
+
+class ProgressJob:
+    """The progress events of one request. Events are published from the worker thread and
+    followed by any number of (asyncio) subscribers.
+
+    `publish()` is also the job's cancellation checkpoint: once `cancel()` is called, the next
+    `publish()` raises JobCancelled, so the pipeline stops at its next stage.
+    """
+
+    def __init__(self, request_id: str):
+        self.request_id = request_id
+        self.started = False  # Set once an upload claims the job
+        self.events: list[ProgressEvent] = []
+        self.created = time.monotonic()
+        self.finished: float | None = None
+        self._start: float | None = None
+        self._last: float | None = None
+        self._cancelled = threading.Event()
+        self._lock = threading.Lock()
+        self._waiters: set[tuple[asyncio.AbstractEventLoop, asyncio.Event]] = set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled.is_set()
+
+    def cancel(self) -> None:
+        """Ask the job to stop at its next stage."""
+        self._cancelled.set()
+
+    def _add(self, _stage: str, _detail: str | None) -> None:
+        with self._lock:
+            if self.finished is not None:
+                return
+            now = time.monotonic()
+            if self._start is None:
+                self._start = self._last = now
+            self.events.append(ProgressEvent(_stage, _detail, round(now - self._start, 4), round(now - self._last, 4)))
+            self._last = now
+            if _stage in FINAL_STAGES:
+                self.finished = now
+            waiters = list(self._waiters)
+        for loop, event in waiters:
+            loop.call_soon_threadsafe(event.set)
+
+    def publish(self, _stage: str, _detail: str | None = None) -> None:
+        """Add a stage event. Raises JobCancelled (instead) if the job was cancelled."""
+        if self.cancelled:
+            raise JobCancelled(self.request_id)
+        self._add(_stage, _detail)
+
+    def finish(self, _stage: str = "done", _detail: str | None = None) -> None:
+        """Add the final ('done', 'error' or 'cancelled') event. Any later events are ignored."""
+        self._add(_stage, _detail)
+
+    def track(self, _items: Iterable[tuple[str, T]], _stage: str) -> Iterator[tuple[str, T]]:
+        """Yield the (name, ...) items, publishing a stage event (detail: the name) as each one is made."""
+        for item in _items:
+            self.publish(_stage, item[0])
+            yield item
+
+    async def subscribe(self, _keepalive_s: float = 15.0) -> AsyncIterator[str]:
+        """Yield the job's events (from the first) as Server-Sent Events messages, until the job is finished."""
+        loop = asyncio.get_running_loop()
+        waiter = (loop, asyncio.Event())
+        with self._lock:
+            self._waiters.add(waiter)
+        try:
+            sent = 0
+            while True:
+                waiter[1].clear()
+                events = self.events[sent:]
+                for event in events:
+                    yield event.to_sse()
+                sent += len(events)
+                if self.finished is not None and sent == len(self.events):
+                    return
+                try:
+                    await asyncio.wait_for(waiter[1].wait(), _keepalive_s)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+        finally:
+            with self._lock:
+                self._waiters.discard(waiter)
+
+
+class ProgressRegistry:
+    """The progress jobs, by request id. Finished (or never started) jobs are dropped after `retention_s`.
+
+    The request ids are issued by the server (random, so they can't be guessed): knowing a job's
+    request id is what allows a client to follow, or cancel, it.
+    """
+
+    def __init__(self, retention_s: float = 300.0):
+        self.retention_s = retention_s
+        self._jobs: dict[str, ProgressJob] = {}
+        self._lock = threading.Lock()
+
+    def create(self) -> ProgressJob:
+        """Return a new job, with a new request id.
+
+        A client may get (and subscribe to) the job before it sends its upload, so no event is missed.
+        """
+        job = ProgressJob(uuid.uuid4().hex)
+        with self._lock:
+            self._prune()
+            self._jobs[job.request_id] = job
+        return job
+
+    def start(self, _request_id: str | None = None) -> ProgressJob:
+        """Return the job of an upload: the (issued) job with the request id, or a new one if there is none.
+
+        Arguments:
+        ----------
+            * _request_id (str | None): The request id from `create()`, or None.
+
+        Returns:
+        --------
+            * (ProgressJob): The upload's job.
+
+        Raises:
+        -------
+            * KeyError: If no job has the request id (it was never issued, or it expired).
+            * RequestIdInUse: If the job already has an upload.
+        """
+        if _request_id is None:
+            job = self.create()
+            job.started = True
+            return job
+
+        with self._lock:
+            self._prune()
+            job = self._jobs[_request_id]
+            if job.started:
+                raise RequestIdInUse(_request_id)
+            job.started = True
+            return job
+
+    def get(self, _request_id: str) -> ProgressJob | None:
+        with self._lock:
+            return self._jobs.get(_request_id)
+
+    def _prune(self) -> None:
+        cutoff = time.monotonic() - self.retention_s
+        for request_id, job in list(self._jobs.items()):
+            if job.finished is not None and job.finished < cutoff:
+                del self._jobs[request_id]
+            elif not job.started and job.created < cutoff:
+                del self._jobs[request_id]  # Issued, but no upload ever came
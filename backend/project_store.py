@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+# -*- Python Version: 3.11 -*-
+
+"""An in-memory store of parsed PHPP projects, so reports can be re-rendered without re-uploading the file."""
+
+from dataclasses import dataclass
+import threading
+import time
+from typing import TYPE_CHECKING
+import uuid
+
+if TYPE_CHECKING:
+    # -- Only for type-checking: importing backend.read_phpp pulls in pandas (see main.get_pipeline)
+    from backend.read_phpp import PHPPData
+
+
+@dataclass
+class StoredProject:
+    """A parsed PHPP project in the store."""
+
+    project_id: str
+    file_sha256: str
+    phpp_data: "PHPPData"
+    nbytes: int
+    last_used: float
+
+
+class ProjectStore:
+    """Holds parsed PHPPData by project-id. Projects are evicted once unused for `ttl_seconds`,
+    or least-recently-used first, once the total PHPPData size is over `max_bytes`."""
+
+    def __init__(self, ttl_seconds: float, max_bytes: int):
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self._projects: dict[str, StoredProject] = {}
+        self._lock = threading.Lock()
+
+    def put(self, _phpp_data: "PHPPData", _file_sha256: str) -> str:
+        """Add a parsed project and return its project-id. A file already in the store keeps its existing id."""
+        with self._lock:
+            self._evict()
+            if project_id := self._find_file(_file_sha256):
+                self._projects[project_id].last_used = time.monotonic()
+                return project_id
+
+            project_id = uuid.uuid4().hex
+            self._projects[project_id] = StoredProject(
+                project_id, _file_sha256, _phpp_data, _phpp_data.nbytes, time.monotonic()
+            )
+            self._evict()
+            return project_id
+
+    def get(self, _project_id: str) -> "PHPPData | None":
+        """Return the project's PHPPData (and mark it as recently used), or None if it is not in the store."""
+        with self._lock:
+            self._evict()
+            project = self._projects.get(_project_id)
+            if not project:
+                return None
+            project.last_used = time.monotonic()
+            return project.phpp_data
+
+    def get_id_for_file(self, _file_sha256: str) -> str | None:
+        """Return the project-id of an already stored file, or None."""
+        with self._lock:
+            self._evict()
+            return self._find_file(_file_sha256)
+
+    def _find_file(self, _file_sha256: str) -> str | None:
+        for project in self._projects.values():
+            if project.file_sha256 == _file_sha256:
+                return project.project_id
+        return None
+
+    def _evict(self) -> None:
+        """Remove expired projects, then the least-recently-used ones until within the size limit."""
+        now = time.monotonic()
+        for project_id in [p.project_id for p in self._projects.values() if now - p.last_used > self.ttl_seconds]:
+            del self._projects[project_id]
+
+        total = sum(p.nbytes for p in self._projects.values())
+        for project in sorted(self._projects.values(), key=lambda p: p.last_used):
+            if total <= self.max_bytes:
+                break
+            del self._projects[project.project_id]
+            total -= project.nbytes
@@ -1 +1,3 @@
+from backend.read_phpp.diff import diff_phpp_data
 from backend.read_phpp.load_phpp_data import PHPPData, load_phpp_data
+from backend.read_phpp.query import RowQuery, query_phpp_data
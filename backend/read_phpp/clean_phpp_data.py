@@ -43,6 +43,24 @@ def clean_main_DataFrame(_df_main: pd.DataFrame) -> pd.DataFrame:
     return clean_df
 
 
+def get_row_blocks(_df_main: pd.DataFrame, _row_blocks: tuple[tuple[int, int], ...]) -> pd.DataFrame:
+    """Return only the specified blocks of rows from the Main DataFrame.
+
+    Arguments:
+    ----------
+        * _df_main (pd.DataFrame): The Main DataFrame with data from the Variants Worksheet.
+        * _row_blocks (tuple[tuple[int, int], ...]): The (first, last) row of each block to keep (inclusive).
+
+    Returns:
+    --------
+        * (pd.DataFrame): A new DataFrame with only the rows in the blocks.
+    """
+    keep = np.zeros(len(_df_main), dtype=bool)
+    for first, last in _row_blocks:
+        keep |= (_df_main.index >= first) & (_df_main.index <= last)
+    return _df_main.loc[keep]
+
+
 def get_tfa_as_DataFrame(_df_main: pd.DataFrame) -> pd.Series:
     """Return the Treated Floor Area (TFA) for each Variant as a pandas.Series
 
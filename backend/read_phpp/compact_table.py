@@ -0,0 +1,201 @@
+# -*- coding: utf-8 -*-
+# -*- Python Version: 3.11 -*-
+
+"""A memory-compact, read-only store for the DataFrames read from the PHPP."""
+
+import sys
+from typing import Any
+
+import numpy as np
+import pandas as pd
+
+
+def _is_label_column(_series: pd.Series) -> bool:
+    """Return True if the (object) Series holds mostly text (names, units, etc..) rather than numbers."""
+    if _series.dtype != object:
+        return False
+    values = _series.dropna().to_numpy()
+    num_text = sum(isinstance(v, str) for v in values)
+    return num_text > len(values) - num_text
+
+
+def _is_number(_value: Any) -> bool:
+    """Return True if the value can be stored in the float array (bool is kept as-is)."""
+    return isinstance(_value, (int, float, np.integer, np.floating)) and not isinstance(_value, (bool, np.bool_))
+
+
+class CompactTable:
+    """A DataFrame broken down into a compact, read-only form:
+
+    * Text columns (Datatype, Units, Room name...) are stored as pandas.Categorical.
+    * All other values are held in a single 2D float64 array (one column per DataFrame column).
+    * Integers in mixed (object) columns are flagged so they can be restored as int.
+    * Any remaining non-numeric cells (text in a numeric column, bool, etc..) are kept in a small
+        per-column lookup.
+
+    The original DataFrame (same index, columns, dtypes and values) is rebuilt with `to_DataFrame()`.
+    """
+
+    __slots__ = (
+        "index",
+        "columns",
+        "dtypes",
+        "labels",
+        "values",
+        "value_positions",
+        "is_int",
+        "other",
+        "_label_indexes",
+    )
+
+    def __init__(
+        self,
+        index: pd.Index,
+        columns: pd.Index,
+        dtypes: list[np.dtype],
+        labels: dict[int, pd.Categorical],
+        values: np.ndarray,
+        value_positions: list[int],
+        is_int: np.ndarray,
+        other: dict[int, dict[int, Any]],
+    ):
+        self.index = index
+        self.columns = columns
+        self.dtypes = dtypes
+        self.labels = labels
+        self.values = values
+        self.value_positions = value_positions
+        self.is_int = is_int
+        self.other = other
+        self.values.flags.writeable = False
+        self.is_int.flags.writeable = False
+        self._label_indexes: dict[int, dict[str, np.ndarray]] = {}
+
+    @classmethod
+    def from_DataFrame(cls, _df: pd.DataFrame) -> "CompactTable":
+        """Return a new CompactTable with the data from the DataFrame.
+
+        Arguments:
+        ----------
+            * _df (pd.DataFrame): The DataFrame to store.
+
+        Returns:
+        --------
+            * (CompactTable): The new CompactTable.
+        """
+        labels: dict[int, pd.Categorical] = {}
+        value_positions: list[int] = []
+        for i in range(_df.shape[1]):
+            if _is_label_column(_df.iloc[:, i]):
+                labels[i] = pd.Categorical(_df.iloc[:, i].to_numpy())
+            else:
+                value_positions.append(i)
+
+        num_rows = _df.shape[0]
+        values = np.full((num_rows, len(value_positions)), np.nan, order="F")
+        is_int = np.zeros((num_rows, len(value_positions)), dtype=bool, order="F")
+        other: dict[int, dict[int, Any]] = {}
+        for j, i in enumerate(value_positions):
+            column = _df.iloc[:, i]
+            if column.dtype != object:
+                values[:, j] = column.to_numpy(dtype=float)
+                continue
+
+            for row, value in enumerate(column.to_numpy()):
+                if _is_number(value):
+                    values[row, j] = value
+                    is_int[row, j] = isinstance(value, (int, np.integer))
+                elif not pd.isna(value):
+                    other.setdefault(i, {})[row] = value
+
+        return cls(_df.index, _df.columns, _df.dtypes.tolist(), labels, values, value_positions, is_int, other)
+
+    def _column_array(self, _position: int, _rows: np.ndarray | None = None) -> np.ndarray:
+        """Return the original array for a single column (or only the rows at the `_rows` positions).
+
+        Float columns (all rows) are returned as a view of `values`.
+        """
+        dtype = self.dtypes[_position]
+        if _position in self.labels:
+            labels = self.labels[_position]
+            return np.asarray(labels if _rows is None else labels.take(_rows), dtype=object)
+
+        j = self.value_positions.index(_position)
+        column = self.values[:, j] if _rows is None else self.values[_rows, j]
+        if dtype == np.float64:
+            return column
+        if dtype != object:
+            return column.astype(dtype)
+
+        array = column.astype(object)
+        is_int = self.is_int[:, j] if _rows is None else self.is_int[_rows, j]
+        for row in np.flatnonzero(is_int):
+            array[row] = int(column[row])
+        other = self.other.get(_position, {})
+        if _rows is None:
+            for row, value in other.items():
+                array[row] = value
+        elif other:
+            for i, row in enumerate(_rows.tolist()):
+                if row in other:
+                    array[i] = other[row]
+        return array
+
+    def to_DataFrame(self, _rows: np.ndarray | None = None) -> pd.DataFrame:
+        """Return a new read-only DataFrame rebuilt from the compact data.
+
+        Arguments:
+        ----------
+            * _rows (np.ndarray | None): Default=None. The row positions to rebuild. None rebuilds all rows.
+
+        Returns:
+        --------
+            * (pd.DataFrame): The rebuilt DataFrame.
+        """
+        column_arrays = {}
+        for i in range(len(self.columns)):
+            column_arrays[i] = self._column_array(i, _rows)
+            column_arrays[i].flags.writeable = False
+
+        index = self.index if _rows is None else self.index[_rows]
+        df = pd.DataFrame(column_arrays, index=index, copy=False)
+        df.columns = self.columns
+        return df
+
+    def numeric_array(self, _columns: list[str]) -> np.ndarray:
+        """Return a (rows, columns) float array of the columns' numeric values, taken directly from the compact data.
+
+        Text columns, and any non-numeric cells, are NaN.
+        """
+        positions = [self.columns.get_loc(name) for name in _columns]
+        is_label = np.array([p in self.labels for p in positions], dtype=bool)
+        value_columns = [0 if p in self.labels else self.value_positions.index(p) for p in positions]
+        array = self.values[:, value_columns]  # A (writeable) copy
+        array[:, is_label] = np.nan
+        return array
+
+    def label_index(self, _column: str) -> dict[str, np.ndarray]:
+        """Return the row positions of each label in a text column, ie: {'TFA': array([268]), ...}
+
+        The index is built (from the Categorical codes) on first use, then kept with the table.
+        """
+        position = self.columns.get_loc(_column)
+        if position not in self._label_indexes:
+            labels = self.labels[position]
+            order = np.argsort(labels.codes, kind="stable")
+            bounds = np.searchsorted(labels.codes[order], np.arange(len(labels.categories) + 1))
+            self._label_indexes[position] = {
+                label: order[bounds[i] : bounds[i + 1]] for i, label in enumerate(labels.categories)
+            }
+        return self._label_indexes[position]
+
+    @property
+    def nbytes(self) -> int:
+        """The total memory (bytes) used by the stored data, including the labels and lookups."""
+        total = self.values.nbytes + self.is_int.nbytes
+        total += self.index.memory_usage(deep=True) + self.columns.memory_usage(deep=True)
+        for categorical in self.labels.values():
+            total += categorical.codes.nbytes + categorical.categories.memory_usage(deep=True)
+        for lookup in self.other.values():
+            total += sys.getsizeof(lookup) + sum(sys.getsizeof(v) for v in lookup.values())
+        return total
@@ -0,0 +1,140 @@
+# -*- coding: utf-8 -*-
+# -*- Python Version: 3.11 -*-
+
+"""Compare the 'Variants' worksheet data of two revisions of a PHPP, listing only the values which changed."""
+
+import numpy as np
+import pandas as pd
+
+from backend.read_phpp.compact_table import CompactTable
+from backend.read_phpp.load_phpp_data import PHPPData
+
+DIFF_COLUMNS = [
+    "Datatype",
+    "Units",
+    "Variant",
+    "Change",
+    "Old",
+    "New",
+    "Delta",
+    "Relative Delta",
+    "Row (old)",
+    "Row (new)",
+]
+CHANGE_TYPES = ["changed", "added", "removed"]
+
+
+def _row_keys(_table: CompactTable) -> tuple[pd.MultiIndex, np.ndarray]:
+    """Return the (Datatype, occurrence) key of each labelled row, and the row positions they are for.
+
+    A Datatype used on more than one row (ie: the same label in two blocks) is told apart by
+    its occurrence number, counted in worksheet order. Rows without a Datatype are left out.
+    """
+    datatypes = _table.labels[_table.columns.get_loc("Datatype")]
+    positions = np.flatnonzero(datatypes.codes >= 0)
+    codes = datatypes.codes[positions]
+    occurrence = pd.Series(codes).groupby(codes).cumcount().to_numpy()
+    return pd.MultiIndex.from_arrays([datatypes.categories[codes], occurrence]), positions
+
+
+def _aligned_values(
+    _table: CompactTable,
+    _keys: pd.MultiIndex,
+    _positions: np.ndarray,
+    _all_keys: pd.MultiIndex,
+    _all_variants: pd.Index,
+    _variant_names: pd.Index,
+) -> tuple[np.ndarray, np.ndarray]:
+    """Return the (keys, variants) values of the table aligned to all the keys and variants (NaN where missing),
+    and the table's row position for each key (-1 where missing).
+    """
+    values = _table.numeric_array(list(_variant_names))[_positions]
+    # -- A trailing row and column of NaN, which the missing (-1) keys and variants take
+    values = np.pad(values, ((0, 1), (0, 1)), constant_values=np.nan)
+    key_rows = _keys.get_indexer(_all_keys)
+    variant_columns = _variant_names.get_indexer(_all_variants)
+    table_rows = np.where(key_rows >= 0, _positions[key_rows], -1)
+    return values[np.ix_(key_rows, variant_columns)], table_rows
+
+
+def _units(_table: CompactTable, _rows: np.ndarray) -> np.ndarray:
+    """Return the Units of each row position (None where the position is -1)."""
+    units = np.asarray(_table.labels[_table.columns.get_loc("Units")].take(np.maximum(_rows, 0)), dtype=object)
+    units[_rows < 0] = None
+    return units
+
+
+def _row_numbers(_table: CompactTable, _rows: np.ndarray) -> pd.arrays.IntegerArray:
+    """Return the Excel row number of each row position (<NA> where the position is -1)."""
+    row_numbers = pd.array(_table.index.to_numpy()[np.maximum(_rows, 0)], dtype="Int64")
+    row_numbers[_rows < 0] = pd.NA
+    return row_numbers
+
+
+def diff_phpp_data(
+    _old: PHPPData, _new: PHPPData, _abs_threshold: float = 0.0, _rel_threshold: float = 0.0
+) -> pd.DataFrame:
+    """Return the numeric values of the 'Variants' worksheet data which changed between two revisions of a PHPP.
+
+    The rows are matched by their Datatype label (not their Excel row, so inserted rows do not shift
+    the comparison) and the columns by Variant name. The deltas of every value are computed at once
+    on the aligned (rows, variants) arrays.
+
+    A value is listed if it was added or removed, or if both its absolute change is above
+    `_abs_threshold` and its relative change (to the old value) is above `_rel_threshold`.
+
+    Arguments:
+    ----------
+        * _old (PHPPData): The earlier revision.
+        * _new (PHPPData): The later revision.
+        * _abs_threshold (float): Default=0.0. Leave out changes no larger than this (in the row's Units).
+        * _rel_threshold (float): Default=0.0. Leave out changes no larger than this fraction of the old value.
+
+    Returns:
+    --------
+        * (pd.DataFrame): One row per changed value, in the new worksheet's order, with the columns:
+            Datatype, Units, Variant, Change, Old, New, Delta, Relative Delta, Row (old), Row (new)
+    """
+    old_table = _old.compact_tables()["df_main"]
+    new_table = _new.compact_tables()["df_main"]
+    old_keys, old_positions = _row_keys(old_table)
+    new_keys, new_positions = _row_keys(new_table)
+
+    # -- All the rows and variants, in the new revision's order, then any only in the old one
+    all_keys = new_keys.append(old_keys[~old_keys.isin(new_keys)])
+    all_variants = _new.variant_names.append(_old.variant_names.difference(_new.variant_names, sort=False))
+
+    old_values, old_rows = _aligned_values(
+        old_table, old_keys, old_positions, all_keys, all_variants, _old.variant_names
+    )
+    new_values, new_rows = _aligned_values(
+        new_table, new_keys, new_positions, all_keys, all_variants, _new.variant_names
+    )
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        delta = new_values - old_values
+        relative = np.where(old_values != 0, delta / np.abs(old_values), np.nan)
+
+    old_missing = np.isnan(old_values)
+    new_missing = np.isnan(new_values)
+    above_threshold = (np.abs(delta) > _abs_threshold) & ~(np.abs(relative) <= _rel_threshold)
+    change = np.select([old_missing & ~new_missing, ~old_missing & new_missing, above_threshold], [1, 2, 0], -1)
+
+    rows, columns = np.nonzero(change >= 0)
+    units = np.where(new_rows >= 0, _units(new_table, new_rows), _units(old_table, old_rows))
+
+    return pd.DataFrame(
+        {
+            "Datatype": all_keys.get_level_values(0)[rows],
+            "Units": units[rows],
+            "Variant": pd.Categorical.from_codes(columns, all_variants),
+            "Change": pd.Categorical.from_codes(change[rows, columns], CHANGE_TYPES),
+            "Old": old_values[rows, columns],
+            "New": new_values[rows, columns],
+            "Delta": delta[rows, columns],
+            "Relative Delta": relative[rows, columns],
+            "Row (old)": _row_numbers(old_table, old_rows[rows]),
+            "Row (new)": _row_numbers(new_table, new_rows[rows]),
+        },
+        columns=DIFF_COLUMNS,
+    )
@@ -3,58 +3,178 @@
 
 """Functions to read data from the PHPP File."""
 
-from dataclasses import dataclass
+import numpy as np
 import pandas as pd
-from typing import BinaryIO
+from typing import BinaryIO, Callable
+import weakref
 
+from backend.deadline import Deadline
 from backend.read_phpp.clean_phpp_data import (
     clean_main_DataFrame,
     get_absolute_certification_limits_as_DataFrame,
+    get_row_blocks,
     get_tfa_as_DataFrame,
     get_variant_names_as_Series,
 )
+from backend.read_phpp.compact_table import CompactTable
 
 
-@dataclass
 class PHPPData:
-    """Collection of PHPP Data"""
-
-    df_main: pd.DataFrame
-    df_climate: pd.DataFrame
-    df_vent: pd.DataFrame
-    df_cert_limits: pd.DataFrame
-    df_tfa: pd.DataFrame
-    variant_names: pd.Series
-
-
-def _find_number_of_vent_rooms(_phpp_file: BinaryIO) -> int:
-    try:
-        col = pd.read_excel(_phpp_file, sheet_name="Addl vent", header=52, usecols="D")
-        mask = col.isin(
-            ["Additional rows: please select full rows above, and copy and insert them multiple times."]
-        )  # <-- marker to indicate end of sections
-        masked = col[mask == True]
-        masked.dropna(inplace=True)
-        first_instance = list(masked.index)[0]
-        return first_instance - 2  # Correct for 0 base
-    except Exception as e:
-        print('Error: Check "Additional Ventilation" worksheet format?', e)
-        return 33
+    """Collection of PHPP Data
+
+    The data is held in a memory-compact, read-only form (see CompactTable). Each attribute returns a
+    read-only DataFrame rebuilt from that data. While any caller still holds it, the same DataFrame is
+    returned to every other caller (it is only rebuilt once it has been released), so it must not be
+    changed: its values can not be, and columns, index, etc.. must not be either.
+    """
+
+    __slots__ = ("_df_main", "_df_climate", "_df_vent", "_df_cert_limits", "_df_tfa", "_variant_names", "_frames")
+
+    def __init__(
+        self,
+        df_main: pd.DataFrame,
+        df_climate: pd.DataFrame,
+        df_vent: pd.DataFrame,
+        df_cert_limits: pd.DataFrame,
+        df_tfa: pd.Series,
+        variant_names: pd.Index,
+    ):
+        object.__setattr__(self, "_df_main", CompactTable.from_DataFrame(df_main))
+        object.__setattr__(self, "_df_climate", CompactTable.from_DataFrame(df_climate))
+        object.__setattr__(self, "_df_vent", CompactTable.from_DataFrame(df_vent))
+        object.__setattr__(self, "_df_cert_limits", CompactTable.from_DataFrame(df_cert_limits))
+        object.__setattr__(self, "_df_tfa", CompactTable.from_DataFrame(df_tfa.to_frame()))
+        object.__setattr__(self, "_variant_names", variant_names)
+        object.__setattr__(self, "_frames", weakref.WeakValueDictionary())
+
+    @classmethod
+    def from_compact_tables(cls, _tables: dict[str, CompactTable], _variant_names: pd.Index) -> "PHPPData":
+        """Return a new PHPPData using already-compacted tables (as returned by `compact_tables()`), without copying.
+
+        Arguments:
+        ----------
+            * _tables (dict[str, CompactTable]): The tables, keyed by attribute name ("df_main", "df_climate", ...).
+            * _variant_names (pd.Index): The Variant names.
+
+        Returns:
+        --------
+            * (PHPPData): The new PHPPData object.
+        """
+        obj = object.__new__(cls)
+        for name, table in _tables.items():
+            object.__setattr__(obj, f"_{name}", table)
+        object.__setattr__(obj, "_variant_names", _variant_names)
+        object.__setattr__(obj, "_frames", weakref.WeakValueDictionary())
+        return obj
+
+    def compact_tables(self) -> dict[str, CompactTable]:
+        """Return the compact tables holding the data, keyed by attribute name ("df_main", "df_climate", ...)."""
+        return {name[1:]: getattr(self, name) for name in self.__slots__ if name.startswith("_df_")}
+
+    def __setattr__(self, name: str, value) -> None:
+        raise AttributeError(f"PHPPData is read-only. Cannot set '{name}'.")
+
+    def _frame(self, _name: str) -> pd.DataFrame | pd.Series:
+        """Return the table's DataFrame (a Series for the TFA): the one already held by a caller, or else a newly
+        rebuilt one."""
+        df = self._frames.get(_name)
+        if df is None:
+            df = getattr(self, f"_{_name}").to_DataFrame()
+            if _name == "df_tfa":
+                df = df.iloc[:, 0]
+            self._frames[_name] = df
+        return df
+
+    @property
+    def df_main(self) -> pd.DataFrame:
+        return self._frame("df_main")
+
+    @property
+    def df_climate(self) -> pd.DataFrame:
+        return self._frame("df_climate")
+
+    @property
+    def df_vent(self) -> pd.DataFrame:
+        return self._frame("df_vent")
+
+    @property
+    def df_cert_limits(self) -> pd.DataFrame:
+        return self._frame("df_cert_limits")
+
+    @property
+    def df_tfa(self) -> pd.Series:
+        return self._frame("df_tfa")
+
+    @property
+    def variant_names(self) -> pd.Index:
+        """The Variant names. A pandas.Index is already immutable."""
+        return self._variant_names
+
+    @property
+    def nbytes(self) -> int:
+        """The total memory (bytes) used to hold this project's data."""
+        tables = (self._df_main, self._df_climate, self._df_vent, self._df_cert_limits, self._df_tfa)
+        return sum(table.nbytes for table in tables) + self._variant_names.memory_usage(deep=True)
+
+
+# -- The rows of the 'Variants' worksheet used by any of the CSV writers. All others are dropped.
+MAIN_ROW_BLOCKS = (
+    (210, 210),
+    (278, 325),
+    (327, 347),
+    (350, 371),
+    (374, 406),
+    (408, 430),
+    (436, 442),
+    (446, 465),
+    (468, 483),
+)
+
+
+# -- Marker text in the 'Addl vent' worksheet which indicates the end of the room rows
+VENT_ROOMS_END_MARKER = "Additional rows: please select full rows above, and copy and insert them multiple times."
+
+
+def _find_number_of_vent_rooms(_df_vent: pd.DataFrame) -> int:
+    """Return the number of room rows in the raw 'Addl vent' DataFrame.
+
+    The room rows end 2 rows above the 'Additional rows...' marker. If no marker
+    can be found, every row down to the last one with a room name is used.
+
+    Arguments:
+    ----------
+        * _df_vent (pd.DataFrame): The raw 'Addl vent' DataFrame (D:V, all rows).
+
+    Returns:
+    --------
+        * (int): The number of rows which hold room data.
+    """
+    marker_rows = np.flatnonzero(_df_vent.iloc[:, 0].to_numpy() == VENT_ROOMS_END_MARKER)
+    if len(marker_rows):
+        return max(int(marker_rows[0]) - 2, 0)
+
+    print('Error: Check "Additional Ventilation" worksheet format? No end-of-rooms marker found.')
+    named_rows = np.flatnonzero(_df_vent.iloc[:, 1].notna().to_numpy())
+    return int(named_rows[-1]) + 1 if len(named_rows) else 0
 
 
 def _read_phpp_to_DataFrame(
     _phpp_file: BinaryIO,
+    _on_progress: Callable[[str, str], None] | None = None,
+    _deadline: Deadline | None = None,
 ) -> tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame]:
     """Reads in the PHPP Data from the Variants, Climate and Additional-Ventilation
     Worksheets and converts results to a pandas.DataFrame. This will read the data from:
 
     Variants: C7:K~
     Climate: C20:P32
-    Additional Vent: D52:V85
+    Additional Vent: D53:V~
 
     Arguments:
     ----------
         * _phpp_file (BinaryIO): The PHPP Excel file to read from.
+        * _on_progress (Callable[[str, str], None] | None): Called with ("sheet", <worksheet name>) as each is read.
+        * _deadline (Deadline | None): If given, checked before each worksheet is read (raises DeadlineExceeded).
 
     Returns:
     --------
@@ -64,9 +184,13 @@ def _read_phpp_to_DataFrame(
             - [2] (pd.DataFrame): The Room Ventilation DataFrame.
     """
 
-    num_vent_rooms = _find_number_of_vent_rooms(_phpp_file)
+    on_progress = _on_progress or (lambda _stage, _detail: None)
+    check_deadline = _deadline.check if _deadline else (lambda _stage: None)
 
+    check_deadline("reading the 'Variants' worksheet")
     excel_data_df = pd.read_excel(_phpp_file, sheet_name="Variants", header=7, usecols="C:K")
+    on_progress("sheet", "Variants")
+    check_deadline("reading the 'Climate' worksheet")
     excel_data_climate_df = pd.read_excel(
         _phpp_file,
         sheet_name="Climate",
@@ -75,19 +199,22 @@ def _read_phpp_to_DataFrame(
         nrows=10,
         index_col=1,
     )
-    excel_data_room_vent = pd.read_excel(
-        _phpp_file,
-        sheet_name="Addl vent",
-        header=52,
-        usecols="D:V",
-        nrows=num_vent_rooms,
-    )
+    on_progress("sheet", "Climate")
+    check_deadline("reading the 'Addl vent' worksheet")
+    excel_data_room_vent = pd.read_excel(_phpp_file, sheet_name="Addl vent", header=52, usecols="D:V")
+    on_progress("sheet", "Addl vent")
+    excel_data_room_vent = excel_data_room_vent.iloc[: _find_number_of_vent_rooms(excel_data_room_vent)]
     excel_data_df = clean_main_DataFrame(excel_data_df)
 
     return (excel_data_df, excel_data_climate_df, excel_data_room_vent)
 
 
-def load_phpp_data(_phpp_file: BinaryIO) -> PHPPData:
+def load_phpp_data(
+    _phpp_file: BinaryIO,
+    _row_blocks: tuple[tuple[int, int], ...] | None = MAIN_ROW_BLOCKS,
+    _on_progress: Callable[[str, str], None] | None = None,
+    _deadline: Deadline | None = None,
+) -> PHPPData:
     """Reads the designated PHPP Excel file and pulls out the relevant data
     from the Variants worksheet. Returns a PHPPData collection of organized data
     items which can be further processed / parsed as needed.
@@ -95,13 +222,21 @@ def load_phpp_data(_phpp_file: BinaryIO) -> PHPPData:
     Arguments:
     ----------
         * _phpp_file (BinaryIO): The PHPP Excel file to read from.
+        * _row_blocks (tuple[tuple[int, int], ...] | None): The (first, last) rows of the Variants
+            worksheet to keep. Default=MAIN_ROW_BLOCKS, the rows used by the CSV writers. None keeps all rows.
+        * _on_progress (Callable[[str, str], None] | None): Called with ("sheet", <worksheet name>) as each
+            worksheet is read. It may raise to stop the read (ie: when the request is cancelled).
+        * _deadline (Deadline | None): The request's deadline. If it passes before a worksheet is
+            read, DeadlineExceeded is raised (there is nothing useful to return without the data).
 
     Returns:
     --------
         * (PHPPData): The PHPPData object with all the data from the specified PHPP.
     """
 
-    df_main, df_climate, df_vent = _read_phpp_to_DataFrame(_phpp_file)
+    df_main, df_climate, df_vent = _read_phpp_to_DataFrame(_phpp_file, _on_progress, _deadline)
+    if _row_blocks is not None:
+        df_main = get_row_blocks(df_main, _row_blocks)
     df_cert_limits_abs = get_absolute_certification_limits_as_DataFrame(df_main)
     df_tfa = get_tfa_as_DataFrame(df_main)
     variant_names = get_variant_names_as_Series(df_main)
@@ -0,0 +1,196 @@
+# -*- coding: utf-8 -*-
+# -*- Python Version: 3.11 -*-
+
+"""Select rows from the 'Variants' worksheet data by Datatype label, regex or row-range, without custom code."""
+
+from dataclasses import dataclass, field
+import re
+
+import numpy as np
+import pandas as pd
+
+from backend.read_phpp.compact_table import CompactTable, _is_number
+from backend.read_phpp.load_phpp_data import PHPPData
+
+# -- (from-units, to-units): factor
+UNIT_CONVERSIONS = {
+    ("m", "ft"): 3.280839895,
+    ("m2", "ft2"): 10.76391042,
+    ("m3", "ft3"): 35.31466672,
+    ("m3/h", "cfm"): 0.588577779,
+    ("kWh", "kBtu"): 3.412141633,
+    ("kWh/m2", "kBtu/ft2"): 0.316998286,
+    ("W", "Btu/h"): 3.412141633,
+    ("W/m2", "Btu/hr-ft2"): 0.316998286,
+    ("kg", "lb"): 2.204622622,
+    ("kg", "tons"): 0.001,
+}
+
+QUERY_SHAPES = ("wide", "long", "variants")
+
+
+@dataclass
+class RowQuery:
+    """A selection of rows from the 'Variants' worksheet data (df_main).
+
+    Rows matching any of `datatypes` (exact), `pattern` (regex) or `row_ranges` (Excel rows,
+    inclusive) are returned in worksheet order. With none of those given, all rows are returned.
+
+    Only the rows read from the worksheet (by default MAIN_ROW_BLOCKS, the rows the CSV writers
+    use) can be queried: a Datatype or row-range outside of them raises ValueError.
+
+    Attributes:
+    -----------
+        * datatypes (list[str]): Exact Datatype labels, ie: ["TFA", "Vn50"]
+        * pattern (str | None): A regular expression searched for in the Datatype labels.
+        * row_ranges (list[tuple[int, int]]): The (first, last) Excel rows, ie: [(374, 389)]
+        * units (dict[str, str]): Convert rows with these Units, ie: {"m2": "ft2"}
+        * shape (str): "wide" (one column per Variant), "long" (one row per Datatype x Variant)
+            or "variants" (one row per Variant, one column per Datatype).
+        * dropna (bool): Drop rows with no value for any Variant.
+    """
+
+    datatypes: list[str] = field(default_factory=list)
+    pattern: str | None = None
+    row_ranges: list[tuple[int, int]] = field(default_factory=list)
+    units: dict[str, str] = field(default_factory=dict)
+    shape: str = "wide"
+    dropna: bool = True
+
+
+def loaded_row_blocks(_index: pd.Index) -> list[tuple[int, int]]:
+    """Return the (first, last) Excel rows of each block of consecutive rows in the (sorted) index."""
+    rows = _index.to_numpy()
+    if not len(rows):
+        return []
+    breaks = np.flatnonzero(np.diff(rows) != 1)
+    firsts = np.concatenate([rows[:1], rows[breaks + 1]])
+    lasts = np.concatenate([rows[breaks], rows[-1:]])
+    return [(int(first), int(last)) for first, last in zip(firsts, lasts)]
+
+
+def _describe_row_blocks(_blocks: list[tuple[int, int]]) -> str:
+    return ", ".join(str(first) if first == last else f"{first}-{last}" for first, last in _blocks)
+
+
+def select_row_positions(_phpp_data: PHPPData, _query: RowQuery) -> np.ndarray:
+    """Return the (sorted) df_main row positions matched by the query, using the table's Datatype index.
+
+    Arguments:
+    ----------
+        * _phpp_data (PHPPData): The PHPPData object with all the data from the PHPP.
+        * _query (RowQuery): The rows to select.
+
+    Returns:
+    --------
+        * (np.ndarray): The row positions.
+
+    Raises:
+    -------
+        * ValueError: If a Datatype, or any row of a row-range, is not in the rows read from the worksheet.
+    """
+    table = _phpp_data.compact_tables()["df_main"]
+    if not (_query.datatypes or _query.pattern or _query.row_ranges):
+        return np.arange(len(table.index))
+
+    datatype_index = table.label_index("Datatype")
+    if missing := [datatype for datatype in _query.datatypes if datatype not in datatype_index]:
+        raise ValueError(
+            f"Datatype(s) not found: {missing}. Only these rows of the 'Variants' worksheet are read: "
+            f"{_describe_row_blocks(loaded_row_blocks(table.index))}"
+        )
+    positions = [datatype_index[datatype] for datatype in _query.datatypes]
+    if _query.pattern:
+        regex = re.compile(_query.pattern)
+        positions.extend(rows for label, rows in datatype_index.items() if regex.search(str(label)))
+    for first, last in _query.row_ranges:
+        start = np.searchsorted(table.index, first, side="left")
+        stop = np.searchsorted(table.index, last, side="right")
+        if first > last or stop - start != last - first + 1:
+            raise ValueError(
+                f"Rows {first}-{last} are not all read. Only these rows of the 'Variants' worksheet are read: "
+                f"{_describe_row_blocks(loaded_row_blocks(table.index))}"
+            )
+        positions.append(np.arange(start, stop))
+
+    if not positions:
+        return np.array([], dtype=np.intp)
+    return np.unique(np.concatenate(positions))
+
+
+def _has_variant_values(_table: CompactTable, _positions: np.ndarray, _variant_names: pd.Index) -> np.ndarray:
+    """Return a mask of the rows (at the positions) with a value for any Variant, read from the compact arrays."""
+    has_value = np.zeros(len(_positions), dtype=bool)
+    for name in _variant_names:
+        column = _table.columns.get_loc(name)
+        if column in _table.labels:
+            has_value |= _table.labels[column].take(_positions).notna()
+            continue
+        has_value |= ~np.isnan(_table.values[_positions, _table.value_positions.index(column)])
+        if other_rows := _table.other.get(column):
+            has_value |= np.isin(_positions, list(other_rows))
+    return has_value
+
+
+def _convert_units(_df: pd.DataFrame, _variant_names: pd.Index, _units: dict[str, str]) -> pd.DataFrame:
+    """Return a new DataFrame with the numeric Variant values of each row converted, by its Units."""
+    factors = {}
+    for from_units, to_units in _units.items():
+        if (from_units, to_units) not in UNIT_CONVERSIONS:
+            raise ValueError(f"No unit conversion from '{from_units}' to '{to_units}'.")
+        factors[from_units] = UNIT_CONVERSIONS[(from_units, to_units)]
+
+    row_factors = _df["Units"].map(factors)
+    converted = {
+        name: [v * f if _is_number(v) and pd.notna(f) else v for v, f in zip(_df[name], row_factors)]
+        for name in _variant_names
+    }
+    return _df.assign(Units=_df["Units"].replace(_units), **converted)
+
+
+def _variant_column_names(_df: pd.DataFrame) -> list[str]:
+    """Return the 'Datatype (Units)' name of each row, with its Excel row added to any name used more than once."""
+    names = [f"{datatype} ({units})" for datatype, units in zip(_df["Datatype"], _df["Units"])]
+    repeated = {name for name in names if names.count(name) > 1}
+    return [f"{name} [row {row}]" if name in repeated else name for name, row in zip(names, _df.index)]
+
+
+def query_phpp_data(_phpp_data: PHPPData, _query: RowQuery) -> pd.DataFrame:
+    """Return the rows of the 'Variants' worksheet data selected by the query.
+
+    Only the selected rows are rebuilt from the compact data, so the cost depends on the
+    number of rows returned, not the size of the worksheet.
+
+    Arguments:
+    ----------
+        * _phpp_data (PHPPData): The PHPPData object with all the data from the PHPP.
+        * _query (RowQuery): The rows to select, unit conversions and output shape.
+
+    Returns:
+    --------
+        * (pd.DataFrame): The selected data, in the query's shape.
+    """
+    if _query.shape not in QUERY_SHAPES:
+        raise ValueError(f"Unknown query shape: '{_query.shape}'. Use one of: {', '.join(QUERY_SHAPES)}")
+
+    variant_names = _phpp_data.variant_names
+    table = _phpp_data.compact_tables()["df_main"]
+    positions = select_row_positions(_phpp_data, _query)
+    if _query.dropna:
+        positions = positions[_has_variant_values(table, positions, variant_names)]
+
+    df = table.to_DataFrame(positions)
+    columns = ["Datatype", "Units", *variant_names]
+    if df.columns.tolist() != columns:
+        df = df[columns]
+    if _query.units:
+        df = _convert_units(df, variant_names, _query.units)
+
+    if _query.shape == "long":
+        df = df.rename_axis("Row").reset_index()
+        return df.melt(id_vars=["Row", "Datatype", "Units"], var_name="Variant", value_name="Value")
+    if _query.shape == "variants":
+        df_variants = df[variant_names].T
+        df_variants.columns = _variant_column_names(df)
+        return df_variants.rename_axis("Variant").reset_index()
+    return df
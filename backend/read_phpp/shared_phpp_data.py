@@ -0,0 +1,172 @@
+# -*- coding: utf-8 -*-
+# -*- Python Version: 3.11 -*-
+
+"""Share the numeric data of a PHPPData with worker processes through shared memory, without copying."""
+
+from dataclasses import dataclass
+from multiprocessing import shared_memory
+import sys
+from typing import Any
+
+import numpy as np
+import pandas as pd
+
+from backend.read_phpp.compact_table import CompactTable
+from backend.read_phpp.load_phpp_data import PHPPData
+
+# -- Attached blocks which could not be closed after their job (their arrays were still in use, ie: held
+# -- by an exception's traceback). Closing them is retried after the next job.
+_UNCLOSED_BLOCKS: list[shared_memory.SharedMemory] = []
+
+
+@dataclass(frozen=True)
+class SharedTableHandle:
+    """The (small, picklable) label metadata of a CompactTable whose arrays are in a shared-memory block."""
+
+    shm_name: str
+    shape: tuple[int, int]
+    index: pd.Index
+    columns: pd.Index
+    dtypes: list[np.dtype]
+    labels: dict[int, pd.Categorical]
+    value_positions: list[int]
+    other: dict[int, dict[int, Any]]
+
+
+@dataclass(frozen=True)
+class SharedPHPPDataHandle:
+    """A picklable handle to send to worker processes. Use `AttachedPHPPData` to get the PHPPData back."""
+
+    tables: dict[str, SharedTableHandle]
+    variant_names: pd.Index
+
+
+def _block_arrays(_buffer: memoryview, _shape: tuple[int, int]) -> tuple[np.ndarray, np.ndarray]:
+    """Return the (values, is_int) arrays laid out in a shared-memory buffer: float64 values, then the bool flags."""
+    num_values = _shape[0] * _shape[1]
+    values = np.ndarray(_shape, dtype=np.float64, buffer=_buffer, order="F")
+    is_int = np.ndarray(_shape, dtype=bool, buffer=_buffer, offset=num_values * 8, order="F")
+    return values, is_int
+
+
+class SharedPHPPData:
+    """Places the numeric core (values and int-flags) of each PHPPData table into its own shared-memory block.
+
+    Only the owning process should create this. The shared-memory blocks are released on `close()`,
+    or when used as a context manager:
+
+    >>> with SharedPHPPData(phpp_data) as shared:
+    ...     executor.submit(create_csv_files_from_shared_phpp_data, shared.handle, ...)
+    """
+
+    def __init__(self, _phpp_data: PHPPData):
+        self._blocks: list[shared_memory.SharedMemory] = []
+        tables: dict[str, SharedTableHandle] = {}
+        for name, table in _phpp_data.compact_tables().items():
+            shape = table.values.shape
+            block = shared_memory.SharedMemory(create=True, size=max(table.values.nbytes + table.is_int.nbytes, 1))
+            self._blocks.append(block)
+
+            values, is_int = _block_arrays(block.buf, shape)
+            values[:] = table.values
+            is_int[:] = table.is_int
+            del values, is_int  # release the exported buffer, so the block can be closed later
+
+            tables[name] = SharedTableHandle(
+                block.name,
+                shape,
+                table.index,
+                table.columns,
+                table.dtypes,
+                table.labels,
+                table.value_positions,
+                table.other,
+            )
+        self.handle = SharedPHPPDataHandle(tables, _phpp_data.variant_names)
+
+    def close(self) -> None:
+        """Close and unlink (free) all of the shared-memory blocks."""
+        for block in self._blocks:
+            block.close()
+            block.unlink()
+        self._blocks.clear()
+
+    def __enter__(self) -> "SharedPHPPData":
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+
+def _attach_block(_name: str) -> shared_memory.SharedMemory:
+    """Attach to a shared-memory block created by another process."""
+    if sys.version_info >= (3, 13):
+        return shared_memory.SharedMemory(name=_name, track=False)
+
+    # -- Before Python 3.13, attaching also registers the block with the resource-tracker. Worker
+    # -- processes share the owner's tracker, which already holds the block, so this changes nothing:
+    # -- the block is still only unlinked by the owner (or by the tracker, if the owner dies).
+    # -- Un-registering it here would instead drop the owner's registration.
+    return shared_memory.SharedMemory(name=_name)
+
+
+def _close_blocks(_blocks: list[shared_memory.SharedMemory]) -> None:
+    """Close each block, or keep it (to retry later) if its memory is still in use."""
+    for block in _UNCLOSED_BLOCKS + _blocks:
+        try:
+            block.close()
+        except BufferError:
+            if block not in _UNCLOSED_BLOCKS:
+                _UNCLOSED_BLOCKS.append(block)
+        else:
+            if block in _UNCLOSED_BLOCKS:
+                _UNCLOSED_BLOCKS.remove(block)
+
+
+class AttachedPHPPData:
+    """A worker process's view of a SharedPHPPData, for one job. Its numeric arrays are read directly
+    (zero-copy) from the shared-memory blocks, which are detached again on `close()`, or when used
+    as a context manager:
+
+    >>> with AttachedPHPPData(handle) as attached:
+    ...     create_csv_files_from_phpp_data(attached.phpp_data, ...)
+
+    Any PHPPData (or table) from it must not be used after it is closed.
+    """
+
+    def __init__(self, _handle: SharedPHPPDataHandle):
+        self._blocks: list[shared_memory.SharedMemory] = []
+        tables = {}
+        for name, table in _handle.tables.items():
+            block = _attach_block(table.shm_name)
+            self._blocks.append(block)
+            values, is_int = _block_arrays(block.buf, table.shape)
+            tables[name] = CompactTable(
+                table.index,
+                table.columns,
+                table.dtypes,
+                table.labels,
+                values,
+                table.value_positions,
+                is_int,
+                table.other,
+            )
+        self._phpp_data: PHPPData | None = PHPPData.from_compact_tables(tables, _handle.variant_names)
+
+    @property
+    def phpp_data(self) -> PHPPData:
+        if self._phpp_data is None:
+            raise ValueError("The shared PHPP-Data has been detached.")
+        return self._phpp_data
+
+    def close(self) -> None:
+        """Detach this process's view of the shared-memory blocks."""
+        self._phpp_data = None
+        _close_blocks(self._blocks)
+        self._blocks.clear()
+
+    def __enter__(self) -> "AttachedPHPPData":
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
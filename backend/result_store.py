@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+# -*- Python Version: 3.11 -*-
+
+"""A bounded on-disk store of generated .ZIP results, keyed by a content-hash of the upload and its options."""
+
+import hashlib
+import json
+import os
+import pathlib
+import shutil
+import tempfile
+import threading
+from typing import BinaryIO
+
+# -- Bump this whenever the CSV output changes, so that older stored results are no longer used.
+RESULTS_VERSION = "2"
+
+
+def hash_file(_file: BinaryIO, _chunk_size: int = 1024 * 1024) -> str:
+    """Return the SHA-256 (hex) of the file's contents. The file is read in chunks, then rewound to the start."""
+    file_hash = hashlib.sha256()
+    _file.seek(0)
+    while chunk := _file.read(_chunk_size):
+        file_hash.update(chunk)
+    _file.seek(0)
+    return file_hash.hexdigest()
+
+
+def result_key(_file_sha256: str, _options: dict) -> str:
+    """Return the key (and ETag) of the result for an uploaded file with the given options.
+
+    The key is: sha256( "<RESULTS_VERSION>:<file-sha256-hex>:<options as compact, key-sorted JSON>" )
+    so a client can compute it without re-sending the file.
+
+    Arguments:
+    ----------
+        * _file_sha256 (str): The SHA-256 (hex) of the uploaded file.
+        * _options (dict): The options the file is processed with.
+
+    Returns:
+    --------
+        * (str): The result key (hex).
+    """
+    options_json = json.dumps(_options, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(f"{RESULTS_VERSION}:{_file_sha256}:{options_json}".encode("utf-8")).hexdigest()
+
+
+class ResultStore:
+    """Stores result files in a folder, removing the least-recently-used ones once over `max_bytes` in total."""
+
+    def __init__(self, directory: str | pathlib.Path, max_bytes: int):
+        self.directory = pathlib.Path(directory)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+    def path(self, _key: str) -> pathlib.Path:
+        """Return the file path for a key. Keys are hex-only, so cannot point outside the store folder."""
+        if not _key or any(c not in "0123456789abcdef" for c in _key):
+            raise ValueError(f"Invalid result key: '{_key}'")
+        return self.directory / f"{_key}.zip"
+
+    def get(self, _key: str) -> pathlib.Path | None:
+        """Return the path of the stored result (and mark it as recently used), or None if it is not stored."""
+        try:
+            path = self.path(_key)
+            os.utime(path)
+        except (ValueError, FileNotFoundError):
+            return None
+        return path
+
+    def put(self, _key: str, _data: bytes) -> pathlib.Path:
+        """Store the result data, replacing any existing result for the key, then evict old results if needed."""
+        path = self.path(_key)
+        with tempfile.NamedTemporaryFile(dir=self.directory, suffix=".tmp", delete=False) as f:
+            f.write(_data)
+        os.replace(f.name, path)
+        self._evict()
+        return path
+
+    def put_file(self, _key: str, _path: str | pathlib.Path) -> pathlib.Path:
+        """Store a copy of the result file, replacing any existing result for the key, then evict old results."""
+        path = self.path(_key)
+        with tempfile.NamedTemporaryFile(dir=self.directory, suffix=".tmp", delete=False) as f:
+            with open(_path, "rb") as source:
+                shutil.copyfileobj(source, f)
+        os.replace(f.name, path)
+        self._evict()
+        return path
+
+    def _evict(self) -> None:
+        """Remove the least-recently-used results until the store is within its size limit."""
+        with self._lock:
+            entries = []
+            for path in self.directory.glob("*.zip"):
+                try:
+                    stat = path.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+
+            total = sum(size for _, size, _ in entries)
+            for _, size, path in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+                path.unlink(missing_ok=True)
+                total -= size
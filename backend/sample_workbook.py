@@ -0,0 +1,155 @@
+# -*- coding: utf-8 -*-
+# -*- Python Version: 3.11 -*-
+
+"""Build a small synthetic PHPP-shaped workbook (Variants, Climate, Addl vent) for warm-up and benchmarks."""
+
+import io
+import random
+
+# -- The layout read by backend.read_phpp (Excel row / column numbers)
+VARIANTS_HEADER_ROW = 8
+VARIANTS_LAST_ROW = 490
+CLIMATE_HEADER_ROW = 23
+VENT_HEADER_ROW = 53
+
+VARIANT_NAMES = ["Code Minimum", "As-Drawn", "Improve Windows", "Improve ERV", "Improve Insulation"]
+ASSEMBLY_NAMES = [
+    "Exterior_Wall",
+    "Roof",
+    "Floor_Slab",
+    "Party_Wall",
+    "Window_Frame",
+    "Door",
+    "Basement_Wall",
+    "Attic_Floor",
+    "Bay_Wall",
+    "Skylight",
+]
+CLIMATE_ROWS = [
+    "Exterior temperature",
+    "Radiation North",
+    "Radiation East",
+    "Radiation South",
+    "Radiation West",
+    "Horizontal radiation",
+    "Dew point temperature",
+    "Sky temperature",
+    "Ground temperature",
+    "Relative humidity",
+]
+VENT_ROOMS_END_MARKER = "Additional rows: please select full rows above, and copy and insert them multiple times."
+
+
+def _write_variants_sheet(_ws, _rnd: random.Random) -> None:
+    """Fill in the 'Variants' worksheet: C=Datatype, D=Units, E:F=Active Variant, G:K=Variant values."""
+
+    def write_row(_row: int, _datatype: str, _units: str, _values: list) -> None:
+        _ws.cell(_row, 3, _datatype)
+        _ws.cell(_row, 4, _units)
+        _ws.cell(_row, 5, "x")
+        for i, value in enumerate(_values):
+            _ws.cell(_row, 7 + i, value)
+
+    def numbers(_start: float, _step: float = 1.0) -> list[float]:
+        return [_start + _step * i for i in range(len(VARIANT_NAMES))]
+
+    _ws.cell(VARIANTS_HEADER_ROW, 3, "Datatype")
+    _ws.cell(VARIANTS_HEADER_ROW, 4, "Select active variant")
+    for i, name in enumerate(VARIANT_NAMES):
+        _ws.cell(VARIANTS_HEADER_ROW, 7 + i, name)
+    for col in range(3, 12):
+        _ws.cell(VARIANTS_HEADER_ROW + 1, col, col)
+
+    # -- Generic data in every row, then the specific rows the CSV writers expect
+    for row in range(VARIANTS_HEADER_ROW + 2, VARIANTS_LAST_ROW + 1):
+        write_row(row, f"Item {row}", "kWh", [round(_rnd.uniform(0, 500), 3) for _ in VARIANT_NAMES])
+
+    write_row(210, "TFA", "m2", numbers(150.0))
+    write_row(278, "TFA", "m2", numbers(150.0))
+    write_row(280, "Vn50", "m3", numbers(400.0))
+    write_row(281, "Exterior Surface", "m2", numbers(300.0))
+    for i, orientation in enumerate(["North", "East", "South", "West", "Horizontal"]):
+        write_row(282 + i, orientation, "m2", numbers(10.0 + i))
+    for i, assembly in enumerate(ASSEMBLY_NAMES):
+        write_row(289 + i, assembly, "hr-ft2-F/Btu", numbers(20.0 + i))
+    write_row(299, "Air Tightness n50", "ACH", numbers(0.6, 0.1))
+    write_row(300, "Ventilation HR", "%", numbers(0.75, 0.01))
+    write_row(301, "q50", "m3/hm2", numbers(0.5, 0.01))
+    for row in range(304, 313):
+        write_row(row, f"System {row}", "-", [f"Device {i}" for i in range(len(VARIANT_NAMES))])
+    write_row(308, "Cold Air Duct Length", "m", numbers(5.0))
+    write_row(309, "Cold Air Duct Insulation", "mm", numbers(25.0))
+    for i, row in enumerate(range(317, 326)):
+        write_row(row, f"Certification Limit {i}", "kWh/m2", numbers(15.0 + i, 0.0))
+    for row in range(374, 390):
+        write_row(row, f"Site Energy {row}", "kWh", [round(_rnd.uniform(0, 5000), 3) for _ in VARIANT_NAMES])
+    write_row(389, "Solar PV", "kWh", numbers(0.0, 0.0))
+    for i in range(5):
+        groups = [9, 11, 17, 3, 4]
+        values = [f"{groups[i]}-{20 + i + j}" for j in range(len(VARIANT_NAMES))]
+        write_row(446 + i, f"{i:02d}ud_-_{ASSEMBLY_NAMES[i]}", "R", values)
+    for row in range(451, 458):
+        _ws.cell(row, 3, f"Unused Surface {row}")
+        for i in range(len(VARIANT_NAMES)):
+            _ws.cell(row, 7 + i, None)
+    write_row(459, "Certification", "-", ["Phius CORE"] * len(VARIANT_NAMES))
+    for row in range(468, 484):
+        write_row(row, f"CO2e {row}", "kg", [round(_rnd.uniform(0, 5000), 3) for _ in VARIANT_NAMES])
+    write_row(483, "Solar PV", "kg", numbers(0.0, 0.0))
+
+
+def _write_climate_sheet(_ws, _rnd: random.Random) -> None:
+    """Fill in the 'Climate' worksheet: C=Units, D=Name, E:P=Monthly values."""
+    _ws.cell(CLIMATE_HEADER_ROW, 3, "Units")
+    _ws.cell(CLIMATE_HEADER_ROW, 4, "Name")
+    for month in range(12):
+        _ws.cell(CLIMATE_HEADER_ROW, 5 + month, month + 1)
+    for i, name in enumerate(CLIMATE_ROWS):
+        _ws.cell(CLIMATE_HEADER_ROW + 1 + i, 3, "-")
+        _ws.cell(CLIMATE_HEADER_ROW + 1 + i, 4, name)
+        for month in range(12):
+            _ws.cell(CLIMATE_HEADER_ROW + 1 + i, 5 + month, round(_rnd.uniform(-10, 120), 2))
+
+
+def _write_vent_sheet(_ws, _rnd: random.Random, _num_rooms: int) -> None:
+    """Fill in the 'Addl vent' worksheet: D:V=Room ventilation data, followed by the end-of-rooms marker."""
+    _ws.cell(VENT_HEADER_ROW, 4, "Quantity")
+    _ws.cell(VENT_HEADER_ROW, 5, "Room name")
+    for col in range(6, 23):
+        _ws.cell(VENT_HEADER_ROW, col, f"Col {col}")
+
+    for i in range(_num_rooms):
+        area = round(_rnd.uniform(5, 30), 2)
+        row = [1, f"{100 + i}-Room {i}", 1, area, 2.5, area * 2.5, _rnd.choice([0, 20.0, 30.0])]
+        row += [_rnd.choice([0, 10.0]), 0, 0.5, 24, 7, 0, 1.0, 0.4, 0.77, 0.4, 0.4, 0.2]
+        for j, value in enumerate(row):
+            _ws.cell(VENT_HEADER_ROW + 1 + i, 4 + j, value)
+
+    _ws.cell(VENT_HEADER_ROW + 1 + _num_rooms + 2, 4, VENT_ROOMS_END_MARKER)
+
+
+def build_sample_workbook(num_rooms: int = 10, seed: int = 0) -> bytes:
+    """Return the bytes of a synthetic PHPP-shaped .xlsx file which the full pipeline can process.
+
+    Arguments:
+    ----------
+        * num_rooms (int): Default=10. The number of rooms to add to the 'Addl vent' worksheet.
+        * seed (int): Default=0. The random seed for the generated values.
+
+    Returns:
+    --------
+        * (bytes): The .xlsx file data.
+    """
+    from openpyxl import Workbook
+
+    rnd = random.Random(seed)
+    wb = Workbook()
+    ws_variants = wb.active
+    ws_variants.title = "Variants"
+    _write_variants_sheet(ws_variants, rnd)
+    _write_climate_sheet(wb.create_sheet("Climate"), rnd)
+    _write_vent_sheet(wb.create_sheet("Addl vent"), rnd, num_rooms)
+
+    output = io.BytesIO()
+    wb.save(output)
+    return output.getvalue()
@@ -0,0 +1,112 @@
+# -*- coding: utf-8 -*-
+# -*- Python Version: 3.11 -*-
+
+"""Server-side settings, read from environment variables (or a .env file)."""
+
+from dataclasses import dataclass, field
+import os
+import tempfile
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+def _env_float(_name: str, _default: float) -> float:
+    """Return the environment variable as a float."""
+    value = os.environ.get(_name)
+    return _default if value is None else float(value)
+
+
+def _env_int(_name: str, _default: int | None) -> int | None:
+    """Return the environment variable as an int (empty is None)."""
+    value = os.environ.get(_name)
+    if value is None:
+        return _default
+    return int(value) if value.strip() else None
+
+
+def _env_bool(_name: str, _default: bool) -> bool:
+    """Return the environment variable as a bool ('1', 'true', 'yes', 'on' are True)."""
+    value = os.environ.get(_name)
+    if value is None:
+        return _default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
+@dataclass(frozen=True)
+class Settings:
+    """Server settings. Each one can be set with the environment variable named in the comment."""
+
+    # PHPP_TO_CSV_PREWARM: Import and run the pipeline in the background on the first '/server_ready'
+    prewarm_on_server_ready: bool = field(default_factory=lambda: _env_bool("PHPP_TO_CSV_PREWARM", True))
+
+    # PHPP_TO_CSV_RESULT_STORE_DIR: The folder to keep generated .ZIP results in
+    result_store_dir: str = field(
+        default_factory=lambda: os.environ.get(
+            "PHPP_TO_CSV_RESULT_STORE_DIR", os.path.join(tempfile.gettempdir(), "phpp_to_csv_results")
+        )
+    )
+
+    # PHPP_TO_CSV_RESULT_STORE_MB: The max total size of the stored results (0 turns off the result store)
+    result_store_mb: float = field(default_factory=lambda: _env_float("PHPP_TO_CSV_RESULT_STORE_MB", 500.0))
+
+    # PHPP_TO_CSV_PROJECT_TTL_S: Seconds to keep an unused parsed project for '/projects/{id}/render'
+    project_ttl_seconds: float = field(default_factory=lambda: _env_float("PHPP_TO_CSV_PROJECT_TTL_S", 3600.0))
+
+    # PHPP_TO_CSV_PROJECT_STORE_MB: The max total size of the parsed projects kept in memory
+    project_store_mb: float = field(default_factory=lambda: _env_float("PHPP_TO_CSV_PROJECT_STORE_MB", 200.0))
+
+    # PHPP_TO_CSV_ALLOW_PROFILING: Allow uploads to ask for a profile of the pipeline (added to the .ZIP)
+    allow_profiling: bool = field(default_factory=lambda: _env_bool("PHPP_TO_CSV_ALLOW_PROFILING", False))
+
+    # PHPP_TO_CSV_PIPELINE_MEMORY_MB: Per upload, the memory for the PHPPData and the generated CSVs.
+    # Once over, any further CSVs are spilled to temp files (0 = no limit).
+    pipeline_memory_mb: float = field(default_factory=lambda: _env_float("PHPP_TO_CSV_PIPELINE_MEMORY_MB", 256.0))
+
+    # PHPP_TO_CSV_SERVER_MEMORY_MB: The (estimated) memory all concurrent uploads may reserve in total (0 = no limit)
+    server_memory_mb: float = field(default_factory=lambda: _env_float("PHPP_TO_CSV_SERVER_MEMORY_MB", 0.0))
+
+    # PHPP_TO_CSV_MEMORY_QUEUE_S: Seconds an upload waits for memory to be free before being turned away
+    memory_queue_timeout_s: float = field(default_factory=lambda: _env_float("PHPP_TO_CSV_MEMORY_QUEUE_S", 30.0))
+
+    # PHPP_TO_CSV_ANALYTICS_DB: A SQLite file to add every processed project's data to, for portfolio queries
+    # (empty = off). See backend.analytics_store
+    analytics_db: str = field(default_factory=lambda: os.environ.get("PHPP_TO_CSV_ANALYTICS_DB", ""))
+
+    # PHPP_TO_CSV_ANALYTICS_TOKEN: The bearer token `POST /analytics/query` needs, as it reads every project's data
+    # (empty = the endpoint is off: query with the backend.analytics_store CLI)
+    analytics_token: str = field(default_factory=lambda: os.environ.get("PHPP_TO_CSV_ANALYTICS_TOKEN", ""))
+
+    # PHPP_TO_CSV_ZIP_COMPRESSION / PHPP_TO_CSV_ZIP_LEVEL: The .ZIP compression ('stored', 'deflate' or 'zstd')
+    # and level (empty = the method's default). Uploads may ask for another method with the 'compression' field.
+    zip_compression: str = field(default_factory=lambda: os.environ.get("PHPP_TO_CSV_ZIP_COMPRESSION", "deflate"))
+    zip_level: int | None = field(default_factory=lambda: _env_int("PHPP_TO_CSV_ZIP_LEVEL", None))
+
+    # PHPP_TO_CSV_ZIP_THREADS: The threads the .ZIP members are compressed on (shared by all uploads)
+    zip_threads: int = field(default_factory=lambda: _env_int("PHPP_TO_CSV_ZIP_THREADS", min(4, os.cpu_count() or 1)))
+
+    # PHPP_TO_CSV_UPLOAD_SESSION_DIR: The folder resumable (chunked) uploads are received into
+    upload_session_dir: str = field(
+        default_factory=lambda: os.environ.get(
+            "PHPP_TO_CSV_UPLOAD_SESSION_DIR", os.path.join(tempfile.gettempdir(), "phpp_to_csv_uploads")
+        )
+    )
+
+    # PHPP_TO_CSV_UPLOAD_SESSION_TTL_S: Seconds to keep a resumable upload which is not added to
+    upload_session_ttl_s: float = field(default_factory=lambda: _env_float("PHPP_TO_CSV_UPLOAD_SESSION_TTL_S", 86400.0))
+
+    # PHPP_TO_CSV_UPLOAD_MAX_MB / PHPP_TO_CSV_UPLOAD_CHUNK_MB: The max size of a resumable upload, and of each chunk
+    upload_max_mb: float = field(default_factory=lambda: _env_float("PHPP_TO_CSV_UPLOAD_MAX_MB", 200.0))
+    upload_chunk_mb: float = field(default_factory=lambda: _env_float("PHPP_TO_CSV_UPLOAD_CHUNK_MB", 16.0))
+
+    # PHPP_TO_CSV_COALESCE_WAIT_S: The max seconds an upload waits for an identical one (same file and options)
+    # which is already being processed, to share its result (0 = off; needs the result store)
+    coalesce_wait_s: float = field(default_factory=lambda: _env_float("PHPP_TO_CSV_COALESCE_WAIT_S", 120.0))
+
+    # PHPP_TO_CSV_REQUEST_DEADLINE_S: Seconds an upload's pipeline may run (set below the proxy's timeout). The CSV
+    # writers not started by then are skipped, and the .ZIP has the others, with a manifest (0 = no deadline)
+    request_deadline_s: float = field(default_factory=lambda: _env_float("PHPP_TO_CSV_REQUEST_DEADLINE_S", 60.0))
+
+
+settings = Settings()
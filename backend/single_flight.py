@@ -0,0 +1,144 @@
+# -*- coding: utf-8 -*-
+# -*- Python Version: 3.11 -*-
+
+"""Single-flight coalescing of identical concurrent uploads (same file, same options: same result key).
+
+Only the first request for a key (the leader) runs the pipeline. Any identical request which
+arrives while it runs waits for it to finish, then is answered from the result store:
+
+* Within a server process, the waiting requests await the leader's asyncio.Event.
+* Across server processes (ie: 'uvicorn --workers N'), each process's leader takes an exclusive
+  lock on '<key>.lock' in the lock folder (the result store's), so a second process waits for
+  the first's lock to be released. (Not on Windows, which has no 'fcntl': there, requests are only
+  coalesced within each process.)
+
+If the leader fails (or is cancelled), or the wait times out, a waiting request runs the
+pipeline itself, so coalescing never makes a request fail.
+"""
+
+import asyncio
+from contextlib import asynccontextmanager
+from dataclasses import asdict, dataclass
+import os
+import pathlib
+import threading
+import time
+from typing import AsyncIterator
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None  # -- ie: on Windows
+
+
+@dataclass
+class SingleFlightMetrics:
+    """The counts of requests by how they were coalesced (in this server process)."""
+
+    leaders: int = 0  # Ran without waiting
+    coalesced_in_process: int = 0  # Waited for an identical request in this process
+    coalesced_across_processes: int = 0  # Waited for an identical request in another process
+    answered_by_leader: int = 0  # Waited, then were answered with the leader's result
+    timeouts: int = 0  # Gave up waiting (and ran the pipeline)
+
+    def to_dict(self) -> dict[str, int]:
+        return asdict(self)
+
+
+class SingleFlight:
+    """Coalesces concurrent requests with the same key. See the module docstring.
+
+    Use as:
+        async with single_flight.flight(key) as waited:
+            if waited and (result := stored_result(key)):
+                return result  # An identical request has just made it
+            return await compute()
+    """
+
+    def __init__(self, lock_dir: str | pathlib.Path | None, wait_timeout_s: float, poll_s: float = 0.05):
+        # -- Without file locks, only the requests within this process are coalesced
+        self.lock_dir = pathlib.Path(lock_dir) if lock_dir and fcntl is not None else None
+        self.wait_timeout_s = wait_timeout_s
+        self.poll_s = poll_s
+        self.metrics = SingleFlightMetrics()
+        self._flights: dict[str, asyncio.Event] = {}
+        self._metrics_lock = threading.Lock()
+
+    def _count(self, _name: str) -> None:
+        with self._metrics_lock:
+            setattr(self.metrics, _name, getattr(self.metrics, _name) + 1)
+
+    def record_answered(self) -> None:
+        """Count a waiting request which was answered with the leader's result."""
+        self._count("answered_by_leader")
+
+    @property
+    def in_flight(self) -> int:
+        """The number of keys being computed in this process."""
+        return len(self._flights)
+
+    def _try_lock(self, _key: str) -> int | None:
+        """Return the (open, exclusively locked) lock file's descriptor, or None if another process holds it."""
+        assert self.lock_dir is not None
+        path = self.lock_dir / f"{_key}.lock"
+        fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            os.close(fd)
+            return None
+        # -- The holder removes the file before it unlocks: if so, this lock is of a stale (unlinked) file
+        try:
+            if os.stat(path).st_ino == os.fstat(fd).st_ino:
+                return fd
+        except FileNotFoundError:
+            pass
+        os.close(fd)
+        return None
+
+    def _unlock(self, _key: str, _fd: int) -> None:
+        assert self.lock_dir is not None
+        (self.lock_dir / f"{_key}.lock").unlink(missing_ok=True)
+        os.close(_fd)  # Releases the lock
+
+    async def _lock(self, _key: str) -> tuple[int | None, bool]:
+        """Return the (lock file descriptor, waited). The descriptor is None if the wait timed out."""
+        deadline = time.monotonic() + self.wait_timeout_s
+        waited = False
+        while (fd := self._try_lock(_key)) is None:
+            if not waited:
+                self._count("coalesced_across_processes")
+                waited = True
+            if time.monotonic() > deadline:
+                self._count("timeouts")
+                return None, True
+            await asyncio.sleep(self.poll_s)
+        return fd, waited
+
+    @asynccontextmanager
+    async def flight(self, _key: str) -> AsyncIterator[bool]:
+        """Lead, or wait for, the key's computation. Yields True if an identical request ran while this one waited."""
+        if (event := self._flights.get(_key)) is not None:
+            self._count("coalesced_in_process")
+            try:
+                await asyncio.wait_for(event.wait(), self.wait_timeout_s)
+            except asyncio.TimeoutError:
+                self._count("timeouts")
+            yield True
+            return
+
+        event = self._flights[_key] = asyncio.Event()
+        fd = None
+        try:
+            if self.lock_dir is None:
+                waited = False
+            else:
+                fd, waited = await self._lock(_key)
+            if not waited:
+                self._count("leaders")
+            yield waited
+        finally:
+            if fd is not None:
+                self._unlock(_key, fd)
+            del self._flights[_key]
+            event.set()
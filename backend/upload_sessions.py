@@ -0,0 +1,205 @@
+# -*- coding: utf-8 -*-
+# -*- Python Version: 3.11 -*-
+
+"""Resumable (chunked) uploads: each session's bytes are appended to a temp file, a chunk at a time.
+
+A session is two files in the sessions folder: '<upload_id>.part' (the bytes received so far, so
+its size is the session's offset) and '<upload_id>.json' (the file name, size and SHA-256 the
+client declared). Nothing is kept in memory, so any server worker can take any chunk.
+"""
+
+from dataclasses import asdict, dataclass
+import json
+import os
+import pathlib
+import re
+import time
+from typing import AsyncIterable, Callable
+import uuid
+
+from backend.result_store import hash_file
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None  # -- ie: on Windows
+
+# -- A chunk is written with an exclusive lock on the session's file (so that two chunks of an upload
+# -- are never written at once). Without file locks (no 'fcntl'), resumable uploads are not available.
+UPLOAD_SESSIONS_SUPPORTED = fcntl is not None
+
+# -- Session ids are made here: 32 hex characters (so they cannot point outside the sessions folder)
+UPLOAD_ID_PATTERN = re.compile(r"[0-9a-f]{32}")
+SHA256_PATTERN = re.compile(r"[0-9a-f]{64}")
+CONTENT_RANGE_PATTERN = re.compile(r"bytes (\d+)-(\d+)/(\d+)")
+
+
+class UploadSessionError(Exception):
+    """A session could not be made, added to, or finished. The code says why (ie: 'offset_mismatch')."""
+
+    def __init__(self, code: str, message: str, offset: int | None = None):
+        super().__init__(message)
+        self.code = code
+        self.message = message
+        self.offset = offset
+
+    def to_dict(self) -> dict:
+        """Return the error as the API's error dict."""
+        error = {"error": f"Sorry, {self.message}", "code": self.code}
+        if self.offset is not None:
+            error["offset"] = self.offset
+        return error
+
+
+@dataclass
+class UploadSession:
+    """A resumable upload: the file the client declared, and the bytes received so far (`offset`)."""
+
+    upload_id: str
+    filename: str
+    size: int
+    sha256: str
+    created: float
+    offset: int = 0
+
+    @property
+    def complete(self) -> bool:
+        return self.offset == self.size
+
+
+def parse_content_range(_header: str | None) -> tuple[int, int, int]:
+    """Return the (first, last, total) bytes of a 'Content-Range: bytes <first>-<last>/<total>' header."""
+    match = CONTENT_RANGE_PATTERN.fullmatch((_header or "").strip())
+    if not match:
+        raise UploadSessionError("invalid_range", f"the Content-Range must be 'bytes <first>-<last>/<size>': {_header}")
+    first, last, total = (int(n) for n in match.groups())
+    if last < first:
+        raise UploadSessionError("invalid_range", f"the Content-Range is empty: {_header}")
+    return first, last, total
+
+
+class UploadSessionStore:
+    """The resumable upload sessions, as files in `directory`. Sessions unused for `ttl_seconds` are removed."""
+
+    def __init__(self, directory: str | pathlib.Path, ttl_seconds: float, max_file_bytes: int, max_chunk_bytes: int):
+        self.directory = pathlib.Path(directory)
+        self.ttl_seconds = ttl_seconds
+        self.max_file_bytes = max_file_bytes
+        self.max_chunk_bytes = max_chunk_bytes
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+    def _paths(self, _upload_id: str) -> tuple[pathlib.Path, pathlib.Path]:
+        if not UPLOAD_ID_PATTERN.fullmatch(_upload_id):
+            raise UploadSessionError("not_found", "no upload session with that id.")
+        return self.directory / f"{_upload_id}.part", self.directory / f"{_upload_id}.json"
+
+    def create(self, _filename: str, _size: int, _sha256: str) -> UploadSession:
+        """Start a session for a file of `_size` bytes, with the (hex) SHA-256 it is checked against when finished."""
+        self._prune()
+        if not _filename.endswith(".xlsx"):
+            raise UploadSessionError("not_xlsx", "only Excel files (xlsx) are allowed.")
+        if not 0 < _size <= self.max_file_bytes:
+            raise UploadSessionError("too_large", f"the file size must be from 1 to {self.max_file_bytes} bytes.")
+        if not SHA256_PATTERN.fullmatch(_sha256.lower()):
+            raise UploadSessionError("invalid_sha256", "the sha256 must be 64 hex characters.")
+
+        session = UploadSession(uuid.uuid4().hex, os.path.basename(_filename), _size, _sha256.lower(), time.time())
+        part_path, meta_path = self._paths(session.upload_id)
+        part_path.touch()
+        meta = asdict(session)
+        del meta["offset"]  # The .part file's size
+        meta_path.write_text(json.dumps(meta))
+        return session
+
+    def get(self, _upload_id: str) -> UploadSession:
+        """Return the session, with its current offset. Raises UploadSessionError('not_found') if there is none."""
+        part_path, meta_path = self._paths(_upload_id)
+        try:
+            meta = json.loads(meta_path.read_text())
+            offset = part_path.stat().st_size
+        except (FileNotFoundError, json.JSONDecodeError):
+            raise UploadSessionError("not_found", "no upload session with that id (or it expired).")
+        return UploadSession(**meta, offset=offset)
+
+    async def write_chunk(
+        self, _upload_id: str, _content_range: str | None, _chunks: AsyncIterable[bytes], _write: Callable
+    ) -> UploadSession:
+        """Append a chunk of the file, streamed (straight to the .part file) from the request body.
+
+        The chunk must start at the session's offset. If the body ends early (ie: the connection
+        dropped), the bytes received are kept, and the client resumes from the new offset.
+
+        Arguments:
+        ----------
+            * _upload_id (str): The session's id.
+            * _content_range (str | None): The 'Content-Range' header: 'bytes <first>-<last>/<size>'.
+            * _chunks (AsyncIterable[bytes]): The request body.
+            * _write (Callable): Runs a (blocking) write of the file, ie: in the threadpool.
+
+        Returns:
+        --------
+            * (UploadSession): The session, with its new offset.
+        """
+        session = self.get(_upload_id)
+        first, last, total = parse_content_range(_content_range)
+        if total != session.size or last >= session.size:
+            raise UploadSessionError("invalid_range", f"the Content-Range is outside the file's {session.size} bytes.")
+        if last - first + 1 > self.max_chunk_bytes:
+            raise UploadSessionError("too_large", f"a chunk may be at most {self.max_chunk_bytes} bytes.")
+
+        part_path, _ = self._paths(_upload_id)
+        with open(part_path, "ab") as part_file:
+            try:
+                fcntl.flock(part_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                raise UploadSessionError("chunk_in_progress", "another chunk of this upload is still being received.")
+            offset = part_file.tell()
+            if first != offset:
+                raise UploadSessionError("offset_mismatch", f"the chunk must start at byte {offset}.", offset)
+
+            remaining = last - first + 1
+            async for data in _chunks:
+                if len(data) > remaining:
+                    await _write(part_file.truncate, first)
+                    raise UploadSessionError("invalid_range", "the chunk is longer than its Content-Range.", first)
+                await _write(part_file.write, data)
+                remaining -= len(data)
+            await _write(part_file.flush)
+            session.offset = part_file.tell()
+        os.utime(part_path)
+        return session
+
+    def finish(self, _upload_id: str) -> tuple[UploadSession, pathlib.Path]:
+        """Check that the session has all of its bytes, with the declared SHA-256, and return it with the file's path.
+
+        A file with the wrong hash is removed (the upload must start again).
+        """
+        session = self.get(_upload_id)
+        if not session.complete:
+            raise UploadSessionError(
+                "incomplete_upload", f"only {session.offset} of {session.size} bytes were received.", session.offset
+            )
+        part_path, _ = self._paths(_upload_id)
+        with open(part_path, "rb") as part_file:
+            file_sha256 = hash_file(part_file)
+        if file_sha256 != session.sha256:
+            self.remove(_upload_id)
+            raise UploadSessionError(
+                "checksum_mismatch", "the uploaded file does not match its sha256. Please upload it again."
+            )
+        return session, part_path
+
+    def remove(self, _upload_id: str) -> None:
+        """Remove the session and its file (if any)."""
+        for path in self._paths(_upload_id):
+            path.unlink(missing_ok=True)
+
+    def _prune(self) -> None:
+        """Remove the sessions not added to for `ttl_seconds`."""
+        cutoff = time.time() - self.ttl_seconds
+        for part_path in self.directory.glob("*.part"):
+            try:
+                if part_path.stat().st_mtime < cutoff:
+                    self.remove(part_path.stem)
+            except (FileNotFoundError, UploadSessionError):
+                continue
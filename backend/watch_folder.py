@@ -0,0 +1,476 @@
+# -*- coding: utf-8 -*-
+# -*- Python Version: 3.11 -*-
+
+"""A long-running local daemon which watches project folders and re-exports each PHPP's CSVs when it is saved.
+
+Excel saves a workbook as a burst of writes (a temp file, renames, the '~$' lock file), so
+events for a workbook are debounced: the export only runs once the file has been quiet for
+`--debounce` seconds and its size and modified-time have stopped changing. Saves which arrive
+while a workbook is being exported are coalesced into one more export, of the latest save.
+
+The CSVs are written next to the workbook, in a '<workbook name>_csv' folder. Each file is
+written to a temp file and moved into place, so a dashboard never reads a half-written CSV.
+The pipeline is imported (and run once on the built-in sample workbook) at start-up, and the
+save --> fresh-CSVs latency of every export is logged (and appended to `--metrics` as JSON lines).
+
+Folders are watched with inotify on Linux, and by polling the files' modified-times elsewhere.
+
+Usage:
+    python -m backend.watch_folder ~/Projects/2301_Smith --debounce 2 --metrics watch_metrics.jsonl
+"""
+
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+import ctypes
+import ctypes.util
+from dataclasses import asdict, dataclass, field
+from datetime import datetime, timezone
+import io
+import json
+import os
+import pathlib
+import select
+import statistics
+import struct
+import sys
+import tempfile
+import threading
+import time
+import traceback
+from typing import Callable, Iterable
+
+from backend.workbook_preflight import WorkbookValidationError, validate_workbook
+
+# -- The folder next to the workbook the CSVs are written to: '<workbook name>_csv'
+OUTPUT_FOLDER_SUFFIX = "_csv"
+# -- A summary of the last export, written (last) into the output folder
+EXPORT_INFO_FILE = "_export.json"
+
+# -- inotify event masks (see: man 7 inotify)
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE_SELF = 0x00000400
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = 0x00000800
+IN_CLOEXEC = 0x00080000
+WATCH_MASK = IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE | IN_MODIFY | IN_DELETE_SELF
+_EVENT_HEADER = struct.Struct("iIII")
+
+
+def is_workbook(_path: pathlib.Path) -> bool:
+    """Return True if the path is a PHPP workbook to watch (not an Excel lock or temp file)."""
+    return _path.suffix.lower() == ".xlsx" and not _path.name.startswith(("~$", "."))
+
+
+def output_folder(_workbook: pathlib.Path) -> pathlib.Path:
+    """Return the folder the workbook's CSVs are written to."""
+    return _workbook.with_name(f"{_workbook.stem}{OUTPUT_FOLDER_SUFFIX}")
+
+
+def _is_watched_folder(_path: pathlib.Path) -> bool:
+    """Return True for the sub-folders to watch: not hidden, and not one of our own output folders."""
+    return not _path.name.startswith(".") and not _path.name.endswith(OUTPUT_FOLDER_SUFFIX)
+
+
+def _walk_folders(_root: pathlib.Path) -> Iterable[pathlib.Path]:
+    """Yield the folder and all its watched sub-folders."""
+    yield _root
+    for dir_path, dir_names, _ in os.walk(_root):
+        dir_names[:] = [name for name in dir_names if _is_watched_folder(pathlib.Path(name))]
+        for name in dir_names:
+            yield pathlib.Path(dir_path, name)
+
+
+# -----------------------------------------------------------------------------
+# -- File-change sources
+
+
+class InotifyWatcher:
+    """Reports changed workbook files under the folders (recursively), using Linux's inotify."""
+
+    def __init__(self, folders: list[pathlib.Path]):
+        libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        self._add_watch = libc.inotify_add_watch
+        self._add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        self._fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self._folders: dict[int, pathlib.Path] = {}
+        for folder in folders:
+            for sub_folder in _walk_folders(folder):
+                self._watch(sub_folder)
+
+    def _watch(self, _folder: pathlib.Path) -> None:
+        wd = self._add_watch(self._fd, os.fsencode(_folder), WATCH_MASK)
+        if wd < 0:
+            print(f"Cannot watch: {_folder} ({os.strerror(ctypes.get_errno())})")
+            return
+        self._folders[wd] = _folder
+
+    def read(self, _timeout: float) -> list[pathlib.Path]:
+        """Wait up to `_timeout` seconds and return the workbooks with any file events."""
+        readable, _, _ = select.select([self._fd], [], [], _timeout)
+        if not readable:
+            return []
+
+        try:
+            data = os.read(self._fd, 64 * 1024)
+        except BlockingIOError:
+            return []
+
+        changed = []
+        offset = 0
+        while offset < len(data):
+            wd, mask, _, name_len = _EVENT_HEADER.unpack_from(data, offset)
+            offset += _EVENT_HEADER.size
+            name = os.fsdecode(data[offset : offset + name_len].rstrip(b"\0"))
+            offset += name_len
+
+            folder = self._folders.get(wd)
+            if folder is None:
+                continue
+            if mask & IN_DELETE_SELF:
+                self._folders.pop(wd)
+                continue
+            path = folder / name
+            if mask & IN_ISDIR:
+                if mask & (IN_CREATE | IN_MOVED_TO) and _is_watched_folder(path):
+                    for sub_folder in _walk_folders(path):
+                        self._watch(sub_folder)
+            elif is_workbook(path):
+                changed.append(path)
+        return changed
+
+    def close(self) -> None:
+        os.close(self._fd)
+
+
+class PollingWatcher:
+    """Reports changed workbook files under the folders (recursively), by comparing their size and modified-time."""
+
+    def __init__(self, folders: list[pathlib.Path], interval: float = 1.0):
+        self.folders = folders
+        self.interval = interval
+        self._stats = self._scan()
+
+    def _scan(self) -> dict[pathlib.Path, tuple[int, int]]:
+        stats = {}
+        for folder in self.folders:
+            for sub_folder in _walk_folders(folder):
+                for path in sub_folder.iterdir():
+                    if is_workbook(path):
+                        try:
+                            stat = path.stat()
+                        except FileNotFoundError:
+                            continue
+                        stats[path] = (stat.st_size, stat.st_mtime_ns)
+        return stats
+
+    def read(self, _timeout: float) -> list[pathlib.Path]:
+        """Wait up to `_timeout` seconds (at most one poll interval) and return the changed workbooks."""
+        time.sleep(min(_timeout, self.interval))
+        stats = self._scan()
+        changed = [path for path, stat in stats.items() if self._stats.get(path) != stat]
+        self._stats = stats
+        return changed
+
+    def close(self) -> None:
+        pass
+
+
+def create_watcher(_folders: list[pathlib.Path], _polling: bool = False) -> InotifyWatcher | PollingWatcher:
+    """Return an inotify watcher where available (Linux), otherwise a polling one."""
+    if not _polling and sys.platform.startswith("linux"):
+        try:
+            return InotifyWatcher(_folders)
+        except (OSError, AttributeError) as e:
+            print(f"inotify is not available ({e}). Polling instead.")
+    return PollingWatcher(_folders)
+
+
+# -----------------------------------------------------------------------------
+# -- Writing the outputs
+
+
+def write_outputs_atomic(_folder: pathlib.Path, _csv_files: Iterable[tuple[str, str]], _info: dict) -> list[str]:
+    """Write each CSV into the folder via a temp file and a rename, then remove any CSVs left from older exports.
+
+    The export info file is written last, so its presence (and time) means all the CSVs are fresh.
+
+    Arguments:
+    ----------
+        * _folder (pathlib.Path): The output folder (created if needed).
+        * _csv_files (Iterable[tuple[str, str]]): The (filename, csv_string) outputs.
+        * _info (dict): The export details, written to the EXPORT_INFO_FILE.
+
+    Returns:
+    --------
+        * (list[str]): The file names written.
+    """
+
+    def _replace(_name: str, _data: bytes) -> None:
+        fd, temp_path = tempfile.mkstemp(prefix=f".{_name}.", suffix=".tmp", dir=_folder)
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(_data)
+            os.replace(temp_path, _folder / _name)
+        except BaseException:
+            os.unlink(temp_path)
+            raise
+
+    _folder.mkdir(exist_ok=True)
+    written = []
+    for file_name, csv_string in _csv_files:
+        _replace(f"{file_name}.csv", csv_string.encode("utf-8"))
+        written.append(f"{file_name}.csv")
+
+    for old_file in _folder.glob("*.csv"):
+        if old_file.name not in written:
+            old_file.unlink()
+
+    _replace(EXPORT_INFO_FILE, json.dumps({**_info, "files": written}, indent=2).encode("utf-8"))
+    return written
+
+
+# -----------------------------------------------------------------------------
+# -- The export pipeline
+
+
+@dataclass
+class ExportResult:
+    """The outcome (and timings) of one export of a saved workbook."""
+
+    workbook: str
+    events: int
+    latency_s: float = 0.0
+    export_s: float = 0.0
+    num_files: int = 0
+    error: str | None = None
+    finished_at: str = field(default_factory=lambda: datetime.now(timezone.utc).isoformat())
+
+
+class Exporter:
+    """Runs the (pre-imported, warmed) pipeline on a workbook and writes its CSVs next to it."""
+
+    def __init__(self, co2e_limit_tons_yr: float, omitted_assemblies: list[str]):
+        from backend.read_phpp import load_phpp_data
+        from backend.write_csv import iter_csv_files_from_phpp_data
+
+        self.co2e_limit_tons_yr = co2e_limit_tons_yr
+        self.omitted_assemblies = omitted_assemblies
+        self._load_phpp_data = load_phpp_data
+        self._iter_csv_files = iter_csv_files_from_phpp_data
+
+    def warm_up(self) -> None:
+        """Run the pipeline once on the built-in sample workbook, so the first real export hits warm code."""
+        from backend.sample_workbook import build_sample_workbook
+
+        phpp_data = self._load_phpp_data(io.BytesIO(build_sample_workbook()))
+        for _ in self._iter_csv_files(phpp_data, self.co2e_limit_tons_yr, self.omitted_assemblies):
+            pass
+
+    def export(self, _workbook: pathlib.Path) -> int:
+        """Export the workbook's CSVs to its output folder. Returns the number of CSV files written."""
+        # -- Read from a copy in memory, so Excel is free to save again while the pipeline runs
+        with open(_workbook, "rb") as f:
+            phpp_file = io.BytesIO(f.read())
+
+        validate_workbook(phpp_file)
+        phpp_data = self._load_phpp_data(phpp_file)
+        csv_files = self._iter_csv_files(phpp_data, self.co2e_limit_tons_yr, self.omitted_assemblies)
+        info = {
+            "workbook": _workbook.name,
+            "workbook_mtime": datetime.fromtimestamp(_workbook.stat().st_mtime, timezone.utc).isoformat(),
+            "exported_at": datetime.now(timezone.utc).isoformat(),
+            "co2e_limit_tons_yr": self.co2e_limit_tons_yr,
+            "omitted_assemblies": self.omitted_assemblies,
+        }
+        return len(write_outputs_atomic(output_folder(_workbook), csv_files, info))
+
+
+@dataclass
+class _PendingWorkbook:
+    """The debounce / coalesce state of one workbook."""
+
+    last_event: float
+    stat: tuple[int, int] | None
+    events: int = 1
+    running: bool = False
+
+
+class WatchFolderDaemon:
+    """Debounces the workbooks' file events, and runs one export per settled save (coalescing any during an export).
+
+    Arguments:
+    ----------
+        * watcher: The file-change source (InotifyWatcher or PollingWatcher).
+        * export (Callable[[pathlib.Path], int]): Exports a workbook, returning the number of files written.
+        * debounce_s (float): Seconds a workbook must be quiet (and its size / modified-time unchanged) before export.
+        * workers (int): The number of workbooks exported at the same time.
+        * on_result (Callable[[ExportResult], None] | None): Called with the result of each export.
+    """
+
+    def __init__(
+        self,
+        watcher: InotifyWatcher | PollingWatcher,
+        export: Callable[[pathlib.Path], int],
+        debounce_s: float = 2.0,
+        workers: int = 1,
+        on_result: Callable[[ExportResult], None] | None = None,
+    ):
+        self.watcher = watcher
+        self.export = export
+        self.debounce_s = debounce_s
+        self.on_result = on_result
+        self.results: list[ExportResult] = []
+        self._pending: dict[pathlib.Path, _PendingWorkbook] = {}
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="phpp_export")
+        self._stop = threading.Event()
+
+    def _on_events(self, _paths: Iterable[pathlib.Path], _now: float) -> None:
+        with self._lock:
+            for path in _paths:
+                pending = self._pending.get(path)
+                if pending is None:
+                    self._pending[path] = _PendingWorkbook(_now, self._file_stat(path))
+                else:
+                    pending.last_event = _now
+                    pending.stat = self._file_stat(path)
+                    pending.events += 1
+
+    def _file_stat(self, _path: pathlib.Path) -> tuple[int, int] | None:
+        try:
+            stat = _path.stat()
+        except FileNotFoundError:
+            return None
+        return (stat.st_size, stat.st_mtime_ns)
+
+    def _start_settled(self, _now: float) -> float:
+        """Start the export of each settled workbook. Returns the seconds until the next one may settle."""
+        next_check = self.debounce_s
+        with self._lock:
+            for path, pending in list(self._pending.items()):
+                if pending.running:
+                    continue
+                wait = pending.last_event + self.debounce_s - _now
+                if wait > 0:
+                    next_check = min(next_check, wait)
+                    continue
+
+                # -- Quiet long enough: the file must also be unchanged since its last event
+                stat = self._file_stat(path)
+                if stat is None:
+                    del self._pending[path]  # Renamed or deleted (ie: Excel's temp file swap)
+                    continue
+                if stat != pending.stat:
+                    pending.stat = stat
+                    pending.last_event = _now  # Still being written, without events: wait again
+                    next_check = min(next_check, self.debounce_s)
+                    continue
+
+                pending.running = True
+                self._executor.submit(self._run_export, path, pending.last_event, pending.events)
+                pending.events = 0
+        return max(next_check, 0.01)
+
+    def _run_export(self, _path: pathlib.Path, _saved_at: float, _events: int) -> None:
+        result = ExportResult(workbook=str(_path), events=_events)
+        start = time.monotonic()
+        try:
+            result.num_files = self.export(_path)
+        except WorkbookValidationError as e:
+            result.error = f"{e.code}: {e.message}"
+        except Exception as e:
+            result.error = str(e)
+            print(f"Error: {traceback.format_exc()}")
+        end = time.monotonic()
+        result.export_s = end - start
+        result.latency_s = end - _saved_at
+        result.finished_at = datetime.now(timezone.utc).isoformat()
+
+        with self._lock:
+            pending = self._pending[_path]
+            pending.running = False
+            if pending.events == 0:
+                del self._pending[_path]  # No more saves came in during the export
+            self.results.append(result)
+        if self.on_result:
+            self.on_result(result)
+
+    def run(self) -> None:
+        """Watch (and export) until `stop()` is called."""
+        timeout = self.debounce_s
+        try:
+            while not self._stop.is_set():
+                changed = self.watcher.read(timeout)
+                now = time.monotonic()
+                if changed:
+                    self._on_events(changed, now)
+                timeout = self._start_settled(now)
+        finally:
+            self._executor.shutdown(wait=True)
+            self.watcher.close()
+
+    def stop(self) -> None:
+        """Stop watching (within one debounce period). Any running exports are finished first."""
+        self._stop.set()
+
+
+def summarize_latency(_results: list[ExportResult]) -> dict[str, float]:
+    """Return the count, median and max save --> fresh-CSVs latency (seconds) of the successful exports."""
+    latencies = [r.latency_s for r in _results if r.error is None]
+    if not latencies:
+        return {"exports": 0}
+    return {"exports": len(latencies), "median_s": statistics.median(latencies), "max_s": max(latencies)}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("folders", nargs="+", type=pathlib.Path, help="The project folders to watch (recursively).")
+    parser.add_argument("--debounce", type=float, default=2.0, help="Seconds a workbook must be quiet before export.")
+    parser.add_argument("--workers", type=int, default=1, help="The number of workbooks exported at the same time.")
+    parser.add_argument("--co2e-limit", type=float, default=5.0, help="The CO2e limit (tons/yr) for the reports.")
+    parser.add_argument("--omit", action="append", default=[], help="An assembly to leave out of the reports.")
+    parser.add_argument("--metrics", help="Append each export's result (and latency) as one JSON line to this file.")
+    parser.add_argument("--polling", action="store_true", help="Poll the files' modified-times instead of inotify.")
+    args = parser.parse_args()
+
+    folders = [folder.expanduser().resolve() for folder in args.folders]
+    missing = [str(folder) for folder in folders if not folder.is_dir()]
+    if missing:
+        parser.error(f"Not a folder: {', '.join(missing)}")
+
+    start = time.perf_counter()
+    exporter = Exporter(args.co2e_limit, args.omit)
+    exporter.warm_up()
+    print(f"Pipeline ready in {time.perf_counter() - start:.1f} s. Watching: {', '.join(map(str, folders))}")
+
+    def _on_result(_result: ExportResult) -> None:
+        name = pathlib.Path(_result.workbook).name
+        if _result.error:
+            print(f"  {name}: FAILED ({_result.error})")
+        else:
+            print(
+                f"  {name}: {_result.num_files} CSVs in {_result.export_s:.2f} s"
+                f" (save --> CSVs: {_result.latency_s:.2f} s, {_result.events} file events)"
+            )
+        if args.metrics:
+            with open(args.metrics, "a") as f:
+                f.write(json.dumps(asdict(_result)) + "\n")
+
+    daemon = WatchFolderDaemon(
+        create_watcher(folders, args.polling), exporter.export, args.debounce, args.workers, _on_result
+    )
+    try:
+        daemon.run()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        print(f"Save --> CSVs latency: {summarize_latency(daemon.results)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,234 @@
+# -*- coding: utf-8 -*-
+# -*- Python Version: 3.11 -*-
+
+"""A cheap pre-flight check of an uploaded PHPP .xlsx file, before the (slow) full parse.
+
+Only the zip directory, 'xl/workbook.xml' and a handful of sentinel cells are read. The
+worksheet XML is streamed and reading stops as soon as the last sentinel row is passed,
+so an invalid upload is rejected in milliseconds, without importing pandas.
+"""
+
+from dataclasses import dataclass, field
+import posixpath
+import re
+from typing import BinaryIO
+from xml.etree import ElementTree
+import zipfile
+
+NS_MAIN = "{http://schemas.openxmlformats.org/spreadsheetml/2006/main}"
+NS_REL = "{http://schemas.openxmlformats.org/officeDocument/2006/relationships}"
+NS_PKG_REL = "{http://schemas.openxmlformats.org/package/2006/relationships}"
+
+# -- The worksheets read by backend.read_phpp.load_phpp_data
+REQUIRED_SHEETS = ("Variants", "Climate", "Addl vent")
+
+# -- Cells on the 'Variants' worksheet which must hold these values for the CSV writers' row numbers to be right.
+VARIANTS_SENTINELS = {
+    "C278": ("TFA",),
+    "D278": ("m2", "ft2"),
+    "C280": ("Vn50",),
+}
+# -- The first Variant's name (must not be empty)
+VARIANTS_FIRST_NAME_CELL = "G8"
+
+# -- The PHPP version is looked for in the top rows of the 'Verification' worksheet (if there is one).
+VERSION_SHEET = "Verification"
+VERSION_SEARCH_ROWS = 10
+VERSION_PATTERN = re.compile(r"PHPP\s*(?:Version\s*)?(\d+(?:\.\d+)*)", re.IGNORECASE)
+
+_CELL_REF = re.compile(r"([A-Z]+)(\d+)")
+
+
+class WorkbookValidationError(Exception):
+    """The uploaded file is not a PHPP workbook this tool can read."""
+
+    def __init__(self, code: str, message: str, details: dict | None = None):
+        super().__init__(message)
+        self.code = code
+        self.message = message
+        self.details = details or {}
+
+    def to_dict(self) -> dict:
+        """Return the error as a JSON-able dict, in the same "error" form as the other upload errors."""
+        return {"error": self.message, "code": self.code, "details": self.details}
+
+
+@dataclass
+class WorkbookInfo:
+    """The results of a successful pre-flight check."""
+
+    sheet_names: list[str]
+    phpp_version: str | None = None
+    units: str | None = None
+    first_variant_name: str | None = None
+    sentinels: dict[str, str | None] = field(default_factory=dict)
+
+
+def _split_cell_ref(_ref: str) -> tuple[str, int]:
+    """Return the ('C', 278) column and row for a cell reference like 'C278'."""
+    match = _CELL_REF.fullmatch(_ref)
+    if not match:
+        raise ValueError(f"Invalid cell reference: '{_ref}'")
+    return match.group(1), int(match.group(2))
+
+
+def _read_sheet_paths(_zip: zipfile.ZipFile) -> dict[str, str]:
+    """Return the zip path of each worksheet, by worksheet name, from 'xl/workbook.xml' and its relationships."""
+    workbook = ElementTree.fromstring(_zip.read("xl/workbook.xml"))
+    rels = ElementTree.fromstring(_zip.read("xl/_rels/workbook.xml.rels"))
+    targets = {rel.get("Id"): rel.get("Target", "") for rel in rels.iter(f"{NS_PKG_REL}Relationship")}
+
+    sheet_paths = {}
+    for sheet in workbook.iter(f"{NS_MAIN}sheet"):
+        target = targets.get(sheet.get(f"{NS_REL}id"), "")
+        if target.startswith("/"):
+            sheet_paths[sheet.get("name")] = target.lstrip("/")
+        else:
+            sheet_paths[sheet.get("name")] = posixpath.normpath(posixpath.join("xl", target))
+    return sheet_paths
+
+
+def _read_cells(_zip: zipfile.ZipFile, _sheet_path: str, _refs: set[str], _max_row: int) -> dict[str, tuple]:
+    """Stream the worksheet XML and return the raw (type, value) of each of the requested cells.
+
+    Shared-string cells are returned as ('s', index) and resolved afterwards. Reading stops
+    once past `_max_row`, so only the top of a large worksheet is ever decompressed.
+    """
+    cells: dict[str, tuple] = {}
+    with _zip.open(_sheet_path) as f:
+        for _, element in ElementTree.iterparse(f):
+            if element.tag == f"{NS_MAIN}row":
+                if int(element.get("r", 0)) >= _max_row:
+                    break
+                element.clear()
+            elif element.tag == f"{NS_MAIN}c" and element.get("r") in _refs:
+                cell_type = element.get("t", "n")
+                if cell_type == "inlineStr":
+                    value = "".join(t.text or "" for t in element.iter(f"{NS_MAIN}t"))
+                else:
+                    value = element.findtext(f"{NS_MAIN}v")
+                cells[element.get("r")] = (cell_type, value)
+    return cells
+
+
+def _read_shared_strings(_zip: zipfile.ZipFile, _indexes: set[int]) -> dict[int, str]:
+    """Return the requested entries of the shared-strings table, reading only up to the last one needed."""
+    if not _indexes or "xl/sharedStrings.xml" not in _zip.namelist():
+        return {}
+
+    strings: dict[int, str] = {}
+    last_index = max(_indexes)
+    index = 0
+    with _zip.open("xl/sharedStrings.xml") as f:
+        for _, element in ElementTree.iterparse(f):
+            if element.tag != f"{NS_MAIN}si":
+                continue
+            if index in _indexes:
+                strings[index] = "".join(t.text or "" for t in element.iter(f"{NS_MAIN}t"))
+            element.clear()
+            if index >= last_index:
+                break
+            index += 1
+    return strings
+
+
+def _read_cell_text(_zip: zipfile.ZipFile, _sheet_path: str, _refs: list[str]) -> dict[str, str | None]:
+    """Return the text (stripped) of each of the cells on the worksheet. Empty cells are None."""
+    max_row = max(_split_cell_ref(ref)[1] for ref in _refs)
+    raw_cells = _read_cells(_zip, _sheet_path, set(_refs), max_row + 1)
+    shared = _read_shared_strings(_zip, {int(v) for t, v in raw_cells.values() if t == "s" and v is not None})
+
+    text: dict[str, str | None] = {}
+    for ref in _refs:
+        cell_type, value = raw_cells.get(ref, (None, None))
+        if cell_type == "s" and value is not None:
+            value = shared.get(int(value))
+        text[ref] = value.strip() if value and value.strip() else None
+    return text
+
+
+def _find_phpp_version(_zip: zipfile.ZipFile, _sheet_paths: dict[str, str]) -> str | None:
+    """Return the PHPP version number (ie: '10.4') if one is found at the top of the 'Verification' worksheet."""
+    if VERSION_SHEET not in _sheet_paths:
+        return None
+    refs = [f"{col}{row}" for row in range(1, VERSION_SEARCH_ROWS + 1) for col in "ABCDEFGHIJKLMNOPQRST"]
+    for value in _read_cell_text(_zip, _sheet_paths[VERSION_SHEET], refs).values():
+        if value and (match := VERSION_PATTERN.search(value)):
+            return match.group(1)
+    return None
+
+
+def validate_workbook(_phpp_file: BinaryIO) -> WorkbookInfo:
+    """Check that the file is a PHPP workbook with the worksheets and 'Variants' layout the CSV writers expect.
+
+    The file is rewound to the start afterwards.
+
+    Arguments:
+    ----------
+        * _phpp_file (BinaryIO): The uploaded .xlsx file.
+
+    Returns:
+    --------
+        * (WorkbookInfo): The worksheet names, PHPP version (if found), units and first Variant name.
+
+    Raises:
+    -------
+        * WorkbookValidationError: If the file is not a valid .xlsx, is missing a worksheet,
+            or the 'Variants' worksheet layout does not match.
+    """
+    try:
+        _phpp_file.seek(0)
+        with zipfile.ZipFile(_phpp_file) as zf:
+            try:
+                sheet_paths = _read_sheet_paths(zf)
+            except (KeyError, ElementTree.ParseError):
+                raise WorkbookValidationError(
+                    "not_xlsx", "Sorry, the file does not look like a valid Excel (xlsx) file."
+                )
+
+            missing = [name for name in REQUIRED_SHEETS if name not in sheet_paths]
+            if missing:
+                raise WorkbookValidationError(
+                    "missing_sheets",
+                    f"Sorry, the file does not look like a PHPP. It is missing the worksheet(s): {', '.join(missing)}",
+                    {"missing_sheets": missing, "sheet_names": list(sheet_paths)},
+                )
+
+            try:
+                refs = [*VARIANTS_SENTINELS, VARIANTS_FIRST_NAME_CELL]
+                cells = _read_cell_text(zf, sheet_paths["Variants"], refs)
+                phpp_version = _find_phpp_version(zf, sheet_paths)
+            except (KeyError, ValueError, ElementTree.ParseError):
+                raise WorkbookValidationError(
+                    "not_xlsx", "Sorry, the file does not look like a valid Excel (xlsx) file."
+                )
+    except zipfile.BadZipFile:
+        raise WorkbookValidationError("not_xlsx", "Sorry, the file does not look like a valid Excel (xlsx) file.")
+    finally:
+        _phpp_file.seek(0)
+
+    mismatched = {ref: cells[ref] for ref, allowed in VARIANTS_SENTINELS.items() if cells[ref] not in allowed}
+    if mismatched:
+        raise WorkbookValidationError(
+            "unsupported_layout",
+            "Sorry, the PHPP 'Variants' worksheet layout is not supported. Please check the PHPP version.",
+            {
+                "phpp_version": phpp_version,
+                "expected": {ref: list(VARIANTS_SENTINELS[ref]) for ref in mismatched},
+                "found": mismatched,
+            },
+        )
+    if not cells[VARIANTS_FIRST_NAME_CELL]:
+        raise WorkbookValidationError(
+            "no_variants",
+            "Sorry, no Variants were found on the PHPP 'Variants' worksheet.",
+            {"phpp_version": phpp_version},
+        )
+
+    return WorkbookInfo(
+        sheet_names=list(sheet_paths),
+        phpp_version=phpp_version,
+        units=cells["D278"],
+        first_variant_name=cells[VARIANTS_FIRST_NAME_CELL],
+        sentinels=cells,
+    )
@@ -1 +1,10 @@
-from backend.write_csv.generate_csv_files import create_csv_files_from_phpp_data
+from backend.write_csv.generate_csv_files import (
+    create_csv_files_for_report_options,
+    create_csv_files_from_phpp_data,
+    create_csv_files_from_shared_phpp_data,
+    iter_csv_files_from_phpp_data,
+    iter_tables_from_phpp_data,
+)
+from backend.write_csv.output_manifest import OutputManifest
+from backend.write_csv.report_specs import ReportSpec, compile_reports, run_report_plan
+from backend.write_csv.xlsx_report import write_xlsx_report
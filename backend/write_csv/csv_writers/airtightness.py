@@ -3,9 +3,13 @@
 
 """Export Airtightness CSV data from the Main PHPP DataFrame"""
 
-
 import pandas as pd
 
+from backend.write_csv.report_specs import ReportSpec, compile_reports, run_report_plan
+
+AIRTIGHTNESS = ReportSpec("envelope_airflow", ((436, 442),))
+AIRTIGHTNESS_PLAN = compile_reports([AIRTIGHTNESS])
+
 
 def create_csv_airtightness(_df_main: pd.DataFrame) -> tuple[str, str]:
     """Creates the Airtightness (HR%, Vv, Vn50, etc.) CSV file based on the PHPP DataFrame.
@@ -18,6 +22,4 @@ def create_csv_airtightness(_df_main: pd.DataFrame) -> tuple[str, str]:
     --------
         * tuple[str, str]: A Tuple with the filename and the CSV file as a string.
     """
-
-    airflow_df = _df_main.loc[436:442]
-    return ("envelope_airflow", airflow_df.to_csv(index=False))
+    return run_report_plan(AIRTIGHTNESS_PLAN, _df_main)[0]
@@ -5,11 +5,9 @@
 
 import pandas as pd
 
-pd.options.mode.chained_assignment = None  # default='warn'
 
-
-def create_csv_bldg_basic_data_table(_df_main: pd.DataFrame) -> tuple[str, str]:
-    """Creates the Building Data Table CSV file based on the PHPP DataFrame.
+def create_df_bldg_basic_data_table(_df_main: pd.DataFrame) -> tuple[str, pd.DataFrame]:
+    """Creates the Building Data Table based on the PHPP DataFrame.
 
     Arguments:
     ----------
@@ -17,7 +15,7 @@ def create_csv_bldg_basic_data_table(_df_main: pd.DataFrame) -> tuple[str, str]:
 
     Returns:
     --------
-        * Tuple[str, str]: A Tuple with the filename and the CSV file as a string.
+        * Tuple[str, pd.DataFrame]: A Tuple with the filename and the table.
     """
 
     # Building Data Basics from Main PHPP DataFrame
@@ -120,6 +118,15 @@ def create_csv_bldg_basic_data_table(_df_main: pd.DataFrame) -> tuple[str, str]:
     demand_results_df2 = pd.concat([demand_results_df1.T, windowAeas_df2])
     demand_results_df3 = demand_results_df2.reset_index(drop=True)
 
-    # --------------------------------------------------------------------------
-    # Export to csv
-    return ("bldg_data", demand_results_df3.to_csv(index=False))
+    return ("bldg_data", demand_results_df3)
+
+
+def create_csv_bldg_basic_data_table(_df_main: pd.DataFrame) -> tuple[str, str]:
+    """Creates the Building Data Table CSV file based on the PHPP DataFrame.
+
+    Returns:
+    --------
+        * Tuple[str, str]: A Tuple with the filename and the CSV file as a string.
+    """
+    file_name, df = create_df_bldg_basic_data_table(_df_main)
+    return (file_name, df.to_csv(index=False))
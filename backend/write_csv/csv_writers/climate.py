@@ -6,41 +6,49 @@
 
 import pandas as pd
 
+CLIMATE_MONTH_NAMES = [
+    "Jan",
+    "Feb",
+    "Mar",
+    "Apr",
+    "May",
+    "June",
+    "July",
+    "Aug",
+    "Sept",
+    "Oct",
+    "Nov",
+    "Dec",
+]
+
+
+def get_climate_with_month_columns(_df_climate: pd.DataFrame) -> pd.DataFrame:
+    """Return a view of the Climate DataFrame with the columns named ['Units', 'Jan', 'Feb', ...].
+
+    The input DataFrame is not modified, and the data is not copied.
+    """
+    return _df_climate.set_axis(["Units"] + CLIMATE_MONTH_NAMES, axis=1, copy=False)
 
-def create_csv_radiation(_df_climate: pd.DataFrame) -> tuple[str, str]:
-    """Creates the Radiation data CSV file based on the PHPP Climate DataFrame.
+
+def create_df_radiation(_df_climate: pd.DataFrame) -> tuple[str, pd.DataFrame]:
+    """Creates the monthly Radiation table based on the PHPP Climate DataFrame.
 
     Arguments:
     ----------
-        * _df_climate (pd.DataFrame): The Main PHPP DataFrame to get the data from.
-        * _output_path (pathlib.Path): The full output file path for the CSV.
+        * _df_climate (pd.DataFrame): The PHPP Climate DataFrame to get the data from.
 
     Returns:
     --------
-        * tuple[str, str]: A Tuple with the filename and the CSV file as a string.
+        * tuple[str, pd.DataFrame]: A Tuple with the filename and the table.
     """
 
     # --------------------------------------------------------------------------
     # Climate: Radiation
-    climateColNames = [
-        "Jan",
-        "Feb",
-        "Mar",
-        "Apr",
-        "May",
-        "June",
-        "July",
-        "Aug",
-        "Sept",
-        "Oct",
-        "Nov",
-        "Dec",
-    ]
-    _df_climate.columns = ["Units"] + climateColNames
+    df_climate = get_climate_with_month_columns(_df_climate)
 
     # --------------------------------------------------------------------------
     # Pull out the Radiation Data
-    rad_df1 = _df_climate.loc[
+    rad_df1 = df_climate.loc[
         [
             "Radiation North",
             "Radiation East",
@@ -61,46 +69,41 @@ def create_csv_radiation(_df_climate: pd.DataFrame) -> tuple[str, str]:
 
     rad_df4 = pd.DataFrame(rad_serisConverted).T
     rad_df4.columns = ["North", "East", "South", "West", "Horizontal"]
-    rad_df4.insert(loc=0, column="Month", value=climateColNames)
+    rad_df4.insert(loc=0, column="Month", value=CLIMATE_MONTH_NAMES)
 
-    # --------------------------------------------------------------------------
-    # Export to csv
-    return ("climate_radiation", rad_df4.to_csv(index=False))
+    return ("climate_radiation", rad_df4)
 
 
-def create_csv_temperatures(_df_climate: pd.DataFrame) -> tuple[str, str]:
-    """Creates the Temperature data CSV file based on the PHPP Climate DataFrame.
+def create_csv_radiation(_df_climate: pd.DataFrame) -> tuple[str, str]:
+    """Creates the Radiation data CSV file based on the PHPP Climate DataFrame.
+
+    Returns:
+    --------
+        * tuple[str, str]: A Tuple with the filename and the CSV file as a string.
+    """
+    file_name, df = create_df_radiation(_df_climate)
+    return (file_name, df.to_csv(index=False))
+
+
+def create_df_temperatures(_df_climate: pd.DataFrame) -> tuple[str, pd.DataFrame]:
+    """Creates the monthly Temperature table based on the PHPP Climate DataFrame.
 
     Arguments:
     ----------
-        * _df_climate (pd.DataFrame): The Main PHPP DataFrame to get the data from.
-        * _output_path (pathlib.Path): The full output file path for the CSV.
+        * _df_climate (pd.DataFrame): The PHPP Climate DataFrame to get the data from.
 
     Returns:
     --------
-        * tuple[str, str]: A Tuple with the filename and the CSV file as a string.
+        * tuple[str, pd.DataFrame]: A Tuple with the filename and the table.
     """
 
     # --------------------------------------------------------------------------
     # Climate: Temps
-    climateColNames = [
-        "Jan",
-        "Feb",
-        "Mar",
-        "Apr",
-        "May",
-        "June",
-        "July",
-        "Aug",
-        "Sept",
-        "Oct",
-        "Nov",
-        "Dec",
-    ]
+    df_climate = get_climate_with_month_columns(_df_climate)
 
     # --------------------------------------------------------------------------
     # Pull out the Temperature Data
-    temps_df1 = _df_climate.loc[["Exterior temperature", "Dew point temperature", "Sky temperature"]]
+    temps_df1 = df_climate.loc[["Exterior temperature", "Dew point temperature", "Sky temperature"]]
     temps_df2 = temps_df1.T
     temps_df2
 
@@ -114,8 +117,17 @@ def create_csv_temperatures(_df_climate: pd.DataFrame) -> tuple[str, str]:
 
     temps_df4 = pd.DataFrame(temps_serisConverted).T
     temps_df4.columns = temps_df3.columns
-    temps_df4.insert(loc=0, column="Month", value=climateColNames)
+    temps_df4.insert(loc=0, column="Month", value=CLIMATE_MONTH_NAMES)
 
-    # --------------------------------------------------------------------------
-    # Export to csv
-    return ("climate_temps", temps_df4.to_csv(index=False))
+    return ("climate_temps", temps_df4)
+
+
+def create_csv_temperatures(_df_climate: pd.DataFrame) -> tuple[str, str]:
+    """Creates the Temperature data CSV file based on the PHPP Climate DataFrame.
+
+    Returns:
+    --------
+        * tuple[str, str]: A Tuple with the filename and the CSV file as a string.
+    """
+    file_name, df = create_df_temperatures(_df_climate)
+    return (file_name, df.to_csv(index=False))
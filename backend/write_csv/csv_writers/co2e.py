@@ -4,51 +4,48 @@
 """Export CO2e Data CSV files from the PHPP Main DataFrame"""
 
 import pandas as pd
+
 from backend.read_phpp.load_phpp_data import PHPPData
+from backend.write_csv.report_specs import ReportSpec, build_report_tables, compile_reports, run_report_plan
 
+# -- Without the "Solar PV" row, and converted from kg/CO2-->tons/CO2
+CO2E = ReportSpec("energy_TonsCO2", ((468, 483),), dropna=True, exclude_datatypes=("Solar PV",), scale=0.001)
+CO2E_PLAN = compile_reports([CO2E])
 
-def get_kg_co2_emissions_as_df(_df_main: pd.DataFrame) -> pd.DataFrame:
-    """Return the building's CO2e emissions (kgCO2) consumption data in a DataFrame
-                            Datatype	            Units	Code Minimum	As-Drawn	Improve Windows	Improve ERV	Improve Insulation
-    Datatype
-    Heating	                Heating	                kWh	18894.013298	11304.857062	7352.375323	6497.584214	3725.545278
-    Cooling	                Cooling	                kWh	413.618352	454.330187	807.137649	608.668385	690.842606
-    DHW	                    DHW	                    kWh	3114.843722	3059.251984	2986.819659	2974.217884	2941.724216
-    Dishwashing	            Dishwashing	            kWh	178.75	178.75	178.75	178.75	178.75
-    Clothes Washing	        Clothes Washing	        kWh	47.025	47.025	47.025	47.025	47.025
-    Clothes Drying	        Clothes Drying	        kWh	972.5625	972.5625	972.5625	972.5625	972.5625
-    Refrigerator	        Refrigerator	        kWh	445.3	445.3	445.3	445.3	445.3
-    Cooking	                Cooking	                kWh	625	625	625	625	625
-    PHI Lighting	        PHI Lighting	        kWh	0	0	0	0	0
-    PHI Consumer Elec.	    PHI Consumer Elec.	    kWh	0	0	0	0	0
-    PHI Small Appliances	PHI Small Appliances	kWh	0	0	0	0	0
-    Phius Int. Lighting	    Phius Int. Lighting	    kWh	6991.1	6991.1	6991.1	6991.1	6991.1
-    Phius Ext. Lighting	    Phius Ext. Lighting	    kWh	2417.5	2417.5	2417.5	2417.5	2417.5
-    Phius MEL	            Phius MEL	            kWh	130.8	130.8	130.8	130.8	130.8
-    Aux Elec	            Aux Elec	            kWh	0	0	0	0	0
-    Solar PV                Solar PV                kWh 0   0   0   0   0
-    """
-    df1 = _df_main.loc[468:483]
-    df2 = df1.dropna(axis=0, how="all")
-    df3 = df2.set_index("Datatype", drop=False)
 
-    return df3
+def add_co2e_limit_row(_df: pd.DataFrame, _co2e_limit_tons_yr: float) -> pd.DataFrame:
+    """Return a new DataFrame with the CO2e limit (tons/yr) of every Variant as its last row, as the other
+    reports end with their Certification Limit.
 
+    Arguments:
+    ----------
+        * _df (pd.DataFrame): The CO2e report (Datatype, Units, then one column per Variant).
+        * _co2e_limit_tons_yr (float): The CO2e limit in tons/year.
 
-def create_csv_CO2E(phpp_data: PHPPData, co2e_limit_tons_yr: float) -> tuple[str, str]:
+    Returns:
+    --------
+        * (pd.DataFrame): The report, with the 'Limit' row added.
+    """
+    limit_row = pd.DataFrame(
+        [["Limit", "tons", *[_co2e_limit_tons_yr] * (len(_df.columns) - 2)]], columns=_df.columns, index=[None]
+    )
+    return pd.concat([_df, limit_row])
 
-    # -- Get the Data
-    df_site_energy = get_kg_co2_emissions_as_df(phpp_data.df_main)
 
-    # -- Try and delete tow "Solar PV" from the DataFrame
-    try:
-        df_site_energy.drop("Solar PV", inplace=True)
-    except KeyError:
-        pass
+def create_csv_CO2E(phpp_data: PHPPData, co2e_limit_tons_yr: float, limit_row: bool = False) -> tuple[str, str]:
+    """Creates the CO2e emissions (tons/yr) CSV file, without the 'Solar PV' row.
 
-    # -- Convert from kg/CO2-->tons/CO2 by multiplying everything by 0.001
-    for variant_name in phpp_data.variant_names:
-        df_site_energy[variant_name] = df_site_energy[variant_name] * 0.001
+    Arguments:
+    ----------
+        * phpp_data (PHPPData): A PHPPData object with all the data pulled from the Excel file.
+        * co2e_limit_tons_yr (float): The CO2e limit in tons/year.
+        * limit_row (bool): Default=False. Set True to add the CO2e limit as the last ('Limit') row.
 
-    # -- Export to csv
-    return ("energy_TonsCO2", df_site_energy.to_csv(index=False))
+    Returns:
+    --------
+        * Tuple[str, str]: A Tuple with the filename and the CSV file as a string.
+    """
+    if not limit_row:
+        return run_report_plan(CO2E_PLAN, phpp_data.df_main)[0]
+    file_name, df = build_report_tables(CO2E_PLAN, phpp_data.df_main)[0]
+    return (file_name, add_co2e_limit_row(df, co2e_limit_tons_yr).to_csv(index=False))
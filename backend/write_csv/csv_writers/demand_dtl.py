@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+# -*- Python Version: 3.11 -*-
+
+"""Shared builder for the detailed (Losses / Gains) Energy Demand tables of every Variant."""
+
+import numpy as np
+import pandas as pd
+
+
+def clean_file_name(_filename: str) -> str:
+    """Clean an input file name and remove disallowed characters ("/", etc..)"""
+    return str(_filename).replace("/", "_").replace("\\", "_")
+
+
+def build_detailed_demand_array(
+    _df_main: pd.DataFrame,
+    _losses_rows: tuple[int, int],
+    _gains_rows: tuple[int, int],
+    _limits: pd.Series,
+    _limit_name: str,
+) -> tuple[pd.DataFrame, np.ndarray]:
+    """Build the Losses / Gains / Limit table for all of the Variants at once.
+
+    Arguments:
+    ----------
+        * _df_main (pd.DataFrame): The Main PHPP DataFrame to get the data from.
+        * _losses_rows (tuple[int, int]): The first and last row of the 'Losses' block.
+        * _gains_rows (tuple[int, int]): The first and last row of the 'Gains' block.
+        * _limits (pd.Series): The absolute demand limit of each Variant.
+        * _limit_name (str): The Datatype name to use for the limit row.
+
+    Returns:
+    --------
+        * (tuple)
+            - [0] (pd.DataFrame): The 'Datatype' and 'Units' label columns for every row.
+            - [1] (np.ndarray): A (variants, rows, [Losses, Gains]) array with the values.
+    """
+
+    losses_df = _df_main.loc[_losses_rows[0] : _losses_rows[1]]
+    gains_df = _df_main.loc[_gains_rows[0] : _gains_rows[1]]
+    variants = losses_df.columns[2:]
+    num_losses, num_gains = len(losses_df), len(gains_df)
+
+    # -- Losses only fill the top rows, Gains the bottom rows, and the limit applies to both.
+    values = np.zeros((len(variants), num_losses + num_gains + 1, 2), dtype=object)
+    values[:, :num_losses, 0] = losses_df[variants].to_numpy(dtype=object).T
+    values[:, num_losses:-1, 1] = gains_df[variants].to_numpy(dtype=object).T
+    values[:, -1, :] = _limits[variants].to_numpy(dtype=object)[:, np.newaxis]
+    values[pd.isna(values)] = 0
+
+    labels = pd.concat([losses_df[["Datatype", "Units"]], gains_df[["Datatype", "Units"]]], ignore_index=True)
+    labels.loc[len(labels)] = [_limit_name, "kWh"]
+
+    return labels.fillna(0), values
+
+
+def _table_as_DataFrame(_labels: pd.DataFrame, _values: np.ndarray) -> pd.DataFrame:
+    """Return a single Variant's (rows, 2) values as an output DataFrame, with numeric columns where possible."""
+    values_df = pd.DataFrame(_values, columns=["Losses", "Gains"]).infer_objects()
+    return pd.concat([_labels.reset_index(drop=True), values_df], axis=1)
+
+
+def create_df_detailed_demand(
+    _df_main: pd.DataFrame,
+    _losses_rows: tuple[int, int],
+    _gains_rows: tuple[int, int],
+    _limits: pd.Series,
+    _limit_name: str,
+    _file_name: str,
+    _combined: bool = False,
+) -> list[tuple[str, pd.DataFrame]]:
+    """Create the detailed Demand table for each Variant (and optionally one table with all of them).
+
+    Arguments:
+    ----------
+        * _df_main (pd.DataFrame): The Main PHPP DataFrame to get the data from.
+        * _losses_rows (tuple[int, int]): The first and last row of the 'Losses' block.
+        * _gains_rows (tuple[int, int]): The first and last row of the 'Gains' block.
+        * _limits (pd.Series): The absolute demand limit of each Variant.
+        * _limit_name (str): The Datatype name to use for the limit row.
+        * _file_name (str): The base file name. The Variant name is appended to this.
+        * _combined (bool): Default=False. Set True to also output a single file with all the Variants.
+
+    Returns:
+    --------
+        * List[Tuple[str, pd.DataFrame]]: A list of Tuples with the filename and the table.
+    """
+
+    labels, values = build_detailed_demand_array(_df_main, _losses_rows, _gains_rows, _limits, _limit_name)
+    variants = _df_main.columns[2:]
+
+    # -- Only split the stacked array into the individual Variants when writing out
+    output_tuples_: list[tuple[str, pd.DataFrame]] = []
+    for variant_name, variant_values in zip(variants, values):
+        new_filename = clean_file_name(f"{_file_name}_{variant_name}")
+        output_tuples_.append((new_filename, _table_as_DataFrame(labels, variant_values)))
+
+    if _combined:
+        combined_df = _table_as_DataFrame(pd.concat([labels] * len(variants)), values.reshape(-1, 2))
+        combined_df.insert(0, "Variant", np.repeat(variants.to_numpy(), len(labels)))
+        output_tuples_.append((f"{_file_name}_all_variants", combined_df))
+
+    return output_tuples_
@@ -0,0 +1,223 @@
+# -*- coding: utf-8 -*-
+# -*- Python Version: 3.11 -*-
+
+"""Compute Source-Energy and CO2e for every Variant under many fuel-factor scenarios, from the Site Energy."""
+
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+from backend.read_phpp.load_phpp_data import PHPPData
+from backend.write_csv.csv_writers.site_energy import get_site_energy_as_df
+
+# -- The Site Energy row with the (on-site) PV generation, which is credited against the electricity use
+SOLAR_PV_DATATYPE = "Solar PV"
+DEFAULT_FUEL = "ELECTRIC"
+
+# -- Site--to--Source Factors by Fuel Type
+# -- https://portfoliomanager.energystar.gov/pdf/reference/Source%20Energy.pdf
+SOURCE_FACTORS = {
+    "ELECTRIC": 2.8,
+    "NATURAL_GAS": 1.1,
+    "FUEL_OIL_NO2": 1.01,
+    "FUEL_OIL_NO4": 1.01,
+}
+
+# -- CO2e Factors (kg/kWh of site energy) by Fuel Type. Electric: the US average (eGRID2021, 852 lb/MWh).
+# -- Fuels: 53.11, 74.21 and 75.29 kg/MMBtu (at 293.07 kWh/MMBtu).
+# -- https://portfoliomanager.energystar.gov/pdf/reference/Emissions.pdf
+CO2E_FACTORS = {
+    "ELECTRIC": 0.387,
+    "NATURAL_GAS": 0.181,
+    "FUEL_OIL_NO2": 0.253,
+    "FUEL_OIL_NO4": 0.257,
+}
+
+
+@dataclass
+class EnergyScenarios:
+    """The Site-->Source and CO2e (kg/kWh) factor matrices of a set of scenarios.
+
+    Each is a DataFrame with one row per scenario (the index is the scenario names) and one
+    column per fuel type, ie: for grid-decarbonization years:
+
+                ELECTRIC  NATURAL_GAS
+        2025       0.387        0.181
+        2030       0.290        0.181
+    """
+
+    source_factors: pd.DataFrame
+    co2e_factors: pd.DataFrame
+
+    def __post_init__(self):
+        if not self.source_factors.index.is_unique:
+            raise ValueError("Each scenario (row) must have a unique name.")
+        if not self.source_factors.index.equals(self.co2e_factors.index):
+            raise ValueError("The Source and CO2e factors must have the same scenarios (rows), in the same order.")
+
+    @classmethod
+    def single(
+        cls, _name: str, _source_factors: dict[str, float], _co2e_factors: dict[str, float]
+    ) -> "EnergyScenarios":
+        """Return a single scenario from its {fuel: factor} Source and CO2e factors."""
+        return cls(pd.DataFrame([_source_factors], index=[_name]), pd.DataFrame([_co2e_factors], index=[_name]))
+
+    @classmethod
+    def from_columns(
+        cls, _names: list[str], _source_factors: dict[str, list[float]], _co2e_factors: dict[str, list[float]]
+    ) -> "EnergyScenarios":
+        """Return the scenarios from the factors of each fuel: {fuel: [factor in each scenario, ...]}, in `_names` order."""
+        for fuel, factors in [*_source_factors.items(), *_co2e_factors.items()]:
+            if len(factors) != len(_names):
+                raise ValueError(
+                    f"The '{fuel}' factors need one value per scenario ({len(_names)}), not {len(factors)}."
+                )
+        return cls(pd.DataFrame(_source_factors, index=_names), pd.DataFrame(_co2e_factors, index=_names))
+
+    @property
+    def names(self) -> pd.Index:
+        return self.source_factors.index
+
+    def factor_arrays(self, _fuels: list[str]) -> tuple[np.ndarray, np.ndarray]:
+        """Return the (scenarios, fuels) Source and CO2e factor arrays, for the fuels in column order.
+
+        Arguments:
+        ----------
+            * _fuels (list[str]): The fuel types, in column order.
+
+        Returns:
+        --------
+            * (tuple)
+                - [0] (np.ndarray): The (scenarios, fuels) Site-->Source factors.
+                - [1] (np.ndarray): The (scenarios, fuels) CO2e factors (kg/kWh).
+        """
+        arrays = []
+        for factors in (self.source_factors, self.co2e_factors):
+            array = factors.reindex(columns=_fuels).to_numpy(dtype=float)
+            if np.isnan(array).any():
+                rows, columns = np.nonzero(np.isnan(array))
+                raise ValueError(
+                    f"Scenario '{factors.index[rows[0]]}' is missing the factors for: {_fuels[columns[0]]}"
+                )
+            arrays.append(array)
+        return arrays[0], arrays[1]
+
+
+def calc_scenario_totals(
+    _site_energy: np.ndarray,
+    _fuel_map: np.ndarray,
+    _source_factors: np.ndarray,
+    _co2e_factors: np.ndarray,
+) -> tuple[np.ndarray, np.ndarray]:
+    """Return the total Source Energy and CO2e of every Variant, under every scenario.
+
+    The site energy (end-uses, variants) is first summed by fuel, then multiplied by every
+    scenario's factors at once: (scenarios, fuels) @ (fuels, variants) --> (scenarios, variants)
+
+    Arguments:
+    ----------
+        * _site_energy (np.ndarray): The (end-uses, variants) site energy (kWh). PV generation is negative.
+        * _fuel_map (np.ndarray): The (fuels, end-uses) 0/1 array of each end-use's fuel type.
+        * _source_factors (np.ndarray): The (scenarios, fuels) Site-->Source factors.
+        * _co2e_factors (np.ndarray): The (scenarios, fuels) CO2e factors (kg/kWh).
+
+    Returns:
+    --------
+        * (tuple)
+            - [0] (np.ndarray): The (scenarios, variants) Source Energy (kWh).
+            - [1] (np.ndarray): The (scenarios, variants) CO2e (kg).
+    """
+    site_energy_by_fuel = _fuel_map @ _site_energy
+    return _source_factors @ site_energy_by_fuel, _co2e_factors @ site_energy_by_fuel
+
+
+def get_site_energy_by_end_use(_df_main: pd.DataFrame, _variant_names: pd.Index) -> tuple[list[str], np.ndarray]:
+    """Return the Site Energy end-use names and their (end-uses, variants) values (kWh). PV generation is negative.
+
+    Arguments:
+    ----------
+        * _df_main (pd.DataFrame): The Main PHPP DataFrame with all the Data.
+        * _variant_names (pd.Index): The Variant names.
+
+    Returns:
+    --------
+        * (tuple)
+            - [0] (list[str]): The end-use (Datatype) names.
+            - [1] (np.ndarray): The (end-uses, variants) site energy (kWh).
+    """
+    df_site_energy = get_site_energy_as_df(_df_main)
+    end_uses = df_site_energy["Datatype"].tolist()
+    site_energy = df_site_energy[_variant_names].apply(pd.to_numeric, errors="coerce").fillna(0).to_numpy(dtype=float)
+
+    is_pv = np.array([end_use == SOLAR_PV_DATATYPE for end_use in end_uses])
+    site_energy[is_pv] = -np.abs(site_energy[is_pv])
+    return end_uses, site_energy
+
+
+def calc_energy_scenarios(
+    _phpp_data: PHPPData,
+    _scenarios: EnergyScenarios,
+    _end_use_fuels: dict[str, str] | None = None,
+) -> pd.DataFrame:
+    """Return a table of the Site, Source Energy and CO2e of every Variant under every scenario.
+
+    Arguments:
+    ----------
+        * _phpp_data (PHPPData): The PHPPData object with all the data from the PHPP.
+        * _scenarios (EnergyScenarios): The fuel-factor scenarios to compute.
+        * _end_use_fuels (dict[str, str] | None): The fuel type of each end-use (ie: {"Heating": "NATURAL_GAS"}).
+            Any end-use not listed (and the Solar PV) is 'ELECTRIC'.
+
+    Returns:
+    --------
+        * (pd.DataFrame): One row per scenario x Variant, with the columns:
+            Scenario, Variant, Site Energy (kWh), Source Energy (kWh), CO2e (tons)
+    """
+    variant_names = _phpp_data.variant_names
+    end_uses, site_energy = get_site_energy_by_end_use(_phpp_data.df_main, variant_names)
+
+    end_use_fuels = _end_use_fuels or {}
+    fuel_of_end_use = np.array(
+        [
+            DEFAULT_FUEL if end_use == SOLAR_PV_DATATYPE else end_use_fuels.get(end_use, DEFAULT_FUEL)
+            for end_use in end_uses
+        ]
+    )
+    fuels = sorted(set(fuel_of_end_use.tolist()))
+    fuel_map = (np.array(fuels)[:, None] == fuel_of_end_use[None, :]).astype(float)
+
+    source_factors, co2e_factors = _scenarios.factor_arrays(fuels)
+    source_energy, co2e_kg = calc_scenario_totals(site_energy, fuel_map, source_factors, co2e_factors)
+
+    num_scenarios, num_variants = source_energy.shape
+    return pd.DataFrame(
+        {
+            "Scenario": pd.Categorical.from_codes(np.repeat(np.arange(num_scenarios), num_variants), _scenarios.names),
+            "Variant": pd.Categorical.from_codes(np.tile(np.arange(num_variants), num_scenarios), variant_names),
+            "Site Energy (kWh)": np.tile(site_energy.sum(axis=0), num_scenarios),
+            "Source Energy (kWh)": source_energy.ravel(),
+            "CO2e (tons)": co2e_kg.ravel() * 0.001,
+        }
+    )
+
+
+def create_csv_energy_scenarios(
+    _phpp_data: PHPPData,
+    _scenarios: EnergyScenarios,
+    _end_use_fuels: dict[str, str] | None = None,
+) -> tuple[str, str]:
+    """Create the Source-Energy and CO2e scenarios CSV data file.
+
+    Arguments:
+    ----------
+        * _phpp_data (PHPPData): The PHPPData object with all the data from the PHPP.
+        * _scenarios (EnergyScenarios): The fuel-factor scenarios to compute.
+        * _end_use_fuels (dict[str, str] | None): The fuel type of each end-use. Default is all 'ELECTRIC'.
+
+    Returns:
+    --------
+        * Tuple[str, str]: A Tuple with the filename and the CSV file as a string.
+    """
+    df_scenarios = calc_energy_scenarios(_phpp_data, _scenarios, _end_use_fuels)
+    return ("energy_scenarios", df_scenarios.to_csv(index=False))
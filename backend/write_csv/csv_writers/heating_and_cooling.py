@@ -5,22 +5,41 @@
 
 import pandas as pd
 
+from backend.write_csv.report_specs import ReportSpec, compile_reports, run_report_plan
+
+# -- The Demand / Load results (kWh/m2, W/m2) are converted to totals (x TFA), followed by their Certification Limit
+HEATING_AND_COOLING_DEMAND = ReportSpec("demand_HeatAndCool", (426, 428), per_tfa=True, limit_row=317)
+HEATING_DEMAND = ReportSpec("demand_Phius_heating", (425,), per_tfa=True, limit_row=317)
+COOLING_DEMAND = ReportSpec("demand_Phius_cooling", (428,), per_tfa=True, limit_row=320)
+HEATING_LOAD = ReportSpec("load_Phius_heating", (429,), per_tfa=True, limit_row=321)
+COOLING_LOAD = ReportSpec("load_Phius_cooling", (430,), per_tfa=True, limit_row=322)
+
+# -- Each report on its own (the CSV writers build them all together, see REPORT_PLAN)
+HEATING_AND_COOLING_DEMAND_PLAN = compile_reports([HEATING_AND_COOLING_DEMAND])
+HEATING_DEMAND_PLAN = compile_reports([HEATING_DEMAND])
+COOLING_DEMAND_PLAN = compile_reports([COOLING_DEMAND])
+HEATING_LOAD_PLAN = compile_reports([HEATING_LOAD])
+COOLING_LOAD_PLAN = compile_reports([COOLING_LOAD])
+
 
 def create_csv_heating_and_cooling_demand(
     _df_main: pd.DataFrame,
     _tfa_df: pd.DataFrame,
     _cert_limits_abs: pd.DataFrame,
 ) -> tuple[str, str]:
-    # ---------------------------------------------------------------------------
-    # Get the Cooling Demand results
-    cooling_dem_df = _df_main.loc[428]
-    cooling_dem_limit_df = _cert_limits_abs.loc[320]
+    """Creates the Heating and Cooling Demand (totals, kWh) CSV file, with the Heating Demand Limit as the last row.
 
-    # Get the Heating Demand results
-    heating_dem_df = _df_main.loc[426]
-    heating_dem_limit_df = _cert_limits_abs.loc[317]
+    Arguments:
+    ----------
+        * _df_main (pd.DataFrame): The Main PHPP DataFrame with all the Data.
+        * _tfa_df (pd.DataFrame): The TFA of each Variant.
+        * _cert_limits_abs (pd.DataFrame): The PHPP Certification Limits DataFrame.
 
-    return ("demand_HeatAndCool", output_csv([heating_dem_df, cooling_dem_df], _tfa_df, heating_dem_limit_df))
+    Returns:
+    --------
+        * Tuple[str, str]: A Tuple with the filename and the CSV file as a string.
+    """
+    return run_report_plan(HEATING_AND_COOLING_DEMAND_PLAN, _df_main, _tfa_df, _cert_limits_abs)[0]
 
 
 def create_csv_heating_demand(
@@ -28,11 +47,19 @@ def create_csv_heating_demand(
     _tfa_df: pd.DataFrame,
     _cert_limits_abs: pd.DataFrame,
 ) -> tuple[str, str]:
-    # Get the Heating Demand results
-    heating_dem_df = _df_main.loc[425]
-    heating_dem_limit_df = _cert_limits_abs.loc[317]
+    """Creates the Phius Heating Demand (total, kWh) CSV file, with the Heating Demand Limit as the last row.
+
+    Arguments:
+    ----------
+        * _df_main (pd.DataFrame): The Main PHPP DataFrame with all the Data.
+        * _tfa_df (pd.DataFrame): The TFA of each Variant.
+        * _cert_limits_abs (pd.DataFrame): The PHPP Certification Limits DataFrame.
 
-    return ("demand_Phius_heating", output_csv([heating_dem_df], _tfa_df, heating_dem_limit_df))
+    Returns:
+    --------
+        * Tuple[str, str]: A Tuple with the filename and the CSV file as a string.
+    """
+    return run_report_plan(HEATING_DEMAND_PLAN, _df_main, _tfa_df, _cert_limits_abs)[0]
 
 
 def create_csv_cooling_demand(
@@ -40,11 +67,19 @@ def create_csv_cooling_demand(
     _tfa_df: pd.DataFrame,
     _cert_limits_abs: pd.DataFrame,
 ) -> tuple[str, str]:
-    # Get the Cooling Demand results
-    cooling_dem_df = _df_main.loc[428]
-    cooling_dem_limit_df = _cert_limits_abs.loc[320]
+    """Creates the Phius Cooling Demand (total, kWh) CSV file, with the Cooling Demand Limit as the last row.
 
-    return ("demand_Phius_cooling", output_csv([cooling_dem_df], _tfa_df, cooling_dem_limit_df))
+    Arguments:
+    ----------
+        * _df_main (pd.DataFrame): The Main PHPP DataFrame with all the Data.
+        * _tfa_df (pd.DataFrame): The TFA of each Variant.
+        * _cert_limits_abs (pd.DataFrame): The PHPP Certification Limits DataFrame.
+
+    Returns:
+    --------
+        * Tuple[str, str]: A Tuple with the filename and the CSV file as a string.
+    """
+    return run_report_plan(COOLING_DEMAND_PLAN, _df_main, _tfa_df, _cert_limits_abs)[0]
 
 
 def create_csv_heating_load(
@@ -52,11 +87,19 @@ def create_csv_heating_load(
     _tfa_df: pd.DataFrame,
     _cert_limits_abs: pd.DataFrame,
 ) -> tuple[str, str]:
-    # Get the  Heating Load results
-    heating_load_df = _df_main.loc[429]
-    heating_load_limit_df = _cert_limits_abs.loc[321]
+    """Creates the Phius Heating Load (total, W) CSV file, with the Heating Load Limit as the last row.
+
+    Arguments:
+    ----------
+        * _df_main (pd.DataFrame): The Main PHPP DataFrame with all the Data.
+        * _tfa_df (pd.DataFrame): The TFA of each Variant.
+        * _cert_limits_abs (pd.DataFrame): The PHPP Certification Limits DataFrame.
 
-    return ("load_Phius_heating", output_csv([heating_load_df], _tfa_df, heating_load_limit_df))
+    Returns:
+    --------
+        * Tuple[str, str]: A Tuple with the filename and the CSV file as a string.
+    """
+    return run_report_plan(HEATING_LOAD_PLAN, _df_main, _tfa_df, _cert_limits_abs)[0]
 
 
 def create_csv_cooling_load(
@@ -64,38 +107,16 @@ def create_csv_cooling_load(
     _tfa_df: pd.DataFrame,
     _cert_limits_abs: pd.DataFrame,
 ) -> tuple[str, str]:
-    # Get the Cooling Load results
-    cooling_load_df = _df_main.loc[430]
-    cooling_load_limit_df = _cert_limits_abs.loc[322]
-
-    return ("load_Phius_cooling", output_csv([cooling_load_df], _tfa_df, cooling_load_limit_df))
-
-
-def output_csv(
-    _data: list[pd.Series],
-    _tfa_df: pd.DataFrame,
-    _limit_df: pd.Series,
-) -> str:
-    """Builds the CSV file based on the Heating/Cooling data given."""
-
-    # ---------------------------------------------------------------------------
-    # Construct a DataFrame from the input Series
-    data_df = pd.concat(_data, axis=1).T
-
-    # ---------------------------------------------------------------------------
-    # --- Create the Header DF, join the data+header into a new DataFrame
-    header_df = pd.DataFrame()
-
-    for variant in data_df.columns[:2]:
-        header_df[variant] = data_df[variant]
-
-    header_df["Units"] = header_df["Units"].str.replace("/m2", "")  # 'm2' strings
-
-    for variant in data_df.columns[2:]:
-        # Convert to total kWh instead of kWh/m2
-        header_df[variant] = data_df[variant].mul(_tfa_df[variant])
-
-    # ---------------------------------------------------------------------------
-    # ---- Output final data to CSV
-    output_df = header_df._append(_limit_df)
-    return output_df.to_csv(index=False)
+    """Creates the Phius Cooling Load (total, W) CSV file, with the Cooling Load Limit as the last row.
+
+    Arguments:
+    ----------
+        * _df_main (pd.DataFrame): The Main PHPP DataFrame with all the Data.
+        * _tfa_df (pd.DataFrame): The TFA of each Variant.
+        * _cert_limits_abs (pd.DataFrame): The PHPP Certification Limits DataFrame.
+
+    Returns:
+    --------
+        * Tuple[str, str]: A Tuple with the filename and the CSV file as a string.
+    """
+    return run_report_plan(COOLING_LOAD_PLAN, _df_main, _tfa_df, _cert_limits_abs)[0]
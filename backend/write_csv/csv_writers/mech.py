@@ -7,107 +7,114 @@
 import numpy as np
 import pandas as pd
 
+# -- The PHPP 'Addl vent' columns (D:V), in worksheet order
+VENT_COLUMN_NAMES = [
+    "Amount",
+    "Room name",
+    "Allocation to Vent Unit",
+    "Area",
+    "Clear height",
+    "Room Vol.",
+    "V_Supply",
+    "V_Extract",
+    "V_Transmission",
+    "Room ACH",
+    "Utilisation h/d",
+    "Utiliztion d/wk",
+    "Holidays d/yr",
+    "Reduction Factor 1",
+    "Operation Factor 1",
+    "Reduction Factor 2",
+    "Operation Factor 2",
+    "Reduction Factor 3",
+    "Operation Factor 3",
+]
+
+# -- Flow types x operating modes, in the order they are output
+FLOW_TYPES = {"Sup": "V_Supply", "Eta": "V_Extract", "Trans": "V_Transmission"}
+FLOW_MODES = {"High": "Reduction Factor 1", "Med": "Reduction Factor 2", "Low": "Reduction Factor 3"}
+
+UNIT_FACTOR_FLOW = 0.588577779  # m3/h---> cfm
+UNIT_FACTOR_VOL = 35.31466672  # m3 --> ft3
+UNIT_FACTOR_AREA = 10.76391042  # m2 --> ft2
+UNIT_FACTOR_LENGTH = 3.280839895  # m --> ft
+
+
+def calc_room_airflows(_flow_rates: np.ndarray, _reduction_factors: np.ndarray) -> np.ndarray:
+    """Return the airflow (cfm) for every room, in every operating mode, for every flow type.
+
+    All the modes are computed in a single broadcast: (rooms, modes, 1) x (rooms, 1, types)
+
+    Arguments:
+    ----------
+        * _flow_rates (np.ndarray): A (rooms, flow-types) array of the design flow rates (m3/h).
+        * _reduction_factors (np.ndarray): A (rooms, modes) array of the reduction factors.
+
+    Returns:
+    --------
+        * (np.ndarray): A (rooms, modes * flow-types) array, ordered mode-by-mode:
+            [Sup_High, Eta_High, Trans_High, Sup_Med, ...]
+    """
+    flows = _flow_rates[:, np.newaxis, :] * _reduction_factors[:, :, np.newaxis] * UNIT_FACTOR_FLOW
+    return flows.reshape(len(flows), -1)
 
-def create_csv_fresh_air_flowrates(_df_vent: pd.DataFrame) -> tuple[str, str]:
-    """Create the Room-by-Room Fresh air flow-rate CSV data file.
+
+def create_df_fresh_air_flowrates(_df_vent: pd.DataFrame) -> tuple[str, pd.DataFrame]:
+    """Create the Room-by-Room Fresh air flow-rate table, with a 'Totals' row at the end (with no height).
 
     Arguments:
     ----------
         * _df_vent (pd.DataFrame): The PHPP Ventilation DataFrame.
-        * _output_path (pathlib.Path): The CSV output file path.
 
     Returns:
     --------
-        * Tuple[str, str]: A Tuple with the filename and the CSV file as a string.
+        * Tuple[str, pd.DataFrame]: A Tuple with the filename and the (all numeric) table.
     """
 
-    # the right column headings
-    colNames = [
-        "Amount",
-        "Room name",
-        "Allocation to Vent Unit",
-        "Area",
-        "Clear height",
-        "Room Vol.",
-        "V_Supply",
-        "V_Extract",
-        "V_Transmission",
-        "Room ACH",
-        "Utilisation h/d",
-        "Utiliztion d/wk",
-        "Holidays d/yr",
-        "Reduction Factor 1",
-        "Operation Factor 1",
-        "Reduction Factor 2",
-        "Operation Factor 2",
-        "Reduction Factor 3",
-        "Operation Factor 3",
-    ]
-
-    rm_vent_df1 = _df_vent.dropna(axis=0, subset=["Room name"])
-    rm_vent_df1.columns = colNames
-    rm_vent_df2 = rm_vent_df1.reset_index(drop=True)
-
-    # Calc the flow rates for high, med and low for each room
-    unitFactor_flow = 0.588577779  # m3/h---> cfm
-    unitFactor_vol = 35.31466672  # m3 --> ft3
-    unitFactor_area = 10.76391042  # m3 --> ft3
-    unitFactor_length = 3.280839895  # m --> ft
-
-    flowRate_Sup_High = rm_vent_df1["V_Supply"].values * rm_vent_df1["Reduction Factor 1"].values * unitFactor_flow
-    flowRate_Eta_High = rm_vent_df1["V_Extract"].values * rm_vent_df1["Reduction Factor 1"].values * unitFactor_flow
-    flowRate_Trans_High = (
-        rm_vent_df1["V_Transmission"].values * rm_vent_df1["Reduction Factor 1"].values * unitFactor_flow
-    )
-    cols = ["V_Sup_High", "V_Eta_High", "V_Trans_High"]
-    flows_high_df = pd.DataFrame([flowRate_Sup_High, flowRate_Eta_High, flowRate_Trans_High], index=cols).T
+    rooms_df = _df_vent.dropna(axis=0, subset=["Room name"]).set_axis(VENT_COLUMN_NAMES, axis=1)
 
-    flowRate_Sup_Med = rm_vent_df1["V_Supply"].values * rm_vent_df1["Reduction Factor 2"].values * unitFactor_flow
-    flowRate_Eta_Med = rm_vent_df1["V_Extract"].values * rm_vent_df1["Reduction Factor 2"].values * unitFactor_flow
-    flowRate_Trans_Med = (
-        rm_vent_df1["V_Transmission"].values * rm_vent_df1["Reduction Factor 2"].values * unitFactor_flow
+    # -- Keep everything numeric in one (rooms, columns) array until it is written out
+    airflows = calc_room_airflows(
+        rooms_df[list(FLOW_TYPES.values())].to_numpy(dtype=float),
+        rooms_df[list(FLOW_MODES.values())].to_numpy(dtype=float),
     )
-    cols = ["V_Sup_Med", "V_Eta_Med", "V_Trans_Med"]
-    flows_med_df = pd.DataFrame([flowRate_Sup_Med, flowRate_Eta_Med, flowRate_Trans_Med], index=cols).T
+    geometry = rooms_df[["Room Vol.", "Area", "Clear height"]].to_numpy(dtype=float)
+    geometry = geometry * np.array([UNIT_FACTOR_VOL, UNIT_FACTOR_AREA, UNIT_FACTOR_LENGTH])
 
-    flowRate_Sup_Low = rm_vent_df1["V_Supply"].values * rm_vent_df1["Reduction Factor 3"].values * unitFactor_flow
-    flowRate_Eta_Low = rm_vent_df1["V_Extract"].values * rm_vent_df1["Reduction Factor 3"].values * unitFactor_flow
-    flowRate_Trans_Low = (
-        rm_vent_df1["V_Transmission"].values * rm_vent_df1["Reduction Factor 3"].values * unitFactor_flow
-    )
-    cols = ["V_Sup_Low", "V_Eta_Low", "V_Trans_Low"]
-    flows_low_df = pd.DataFrame([flowRate_Sup_Low, flowRate_Eta_Low, flowRate_Trans_Low], index=cols).T
-
-    # Create the air flows DF
-    roomAirFlows = pd.concat([flows_high_df, flows_med_df, flows_low_df], axis=1, sort=False)
-
-    # Convert the units for vol, areas...
-    roomNames = pd.DataFrame(rm_vent_df1["Room name"].values, columns=["Room Name"])
-    roomVol = pd.DataFrame(rm_vent_df1["Room Vol."].values * unitFactor_vol, columns=["Room Vol. (ft3)"])
-    roomArea = pd.DataFrame(rm_vent_df1["Area"].values * unitFactor_area, columns=["Room Area (ft2)"])
-    roomHeight = pd.DataFrame(
-        rm_vent_df1["Clear height"].values * unitFactor_length,
-        columns=["Room Height (ft)"],
-    )
-
-    rm_vent_df5 = pd.concat([roomNames, roomVol, roomArea, roomHeight, roomAirFlows], axis=1, sort=True)
-    rm_vent_df6 = rm_vent_df5.replace(to_replace=0, value="-")
+    airflow_col_names = [f"V_{flow}_{mode}" for mode in FLOW_MODES for flow in FLOW_TYPES]
+    data_col_names = ["Room Vol. (ft3)", "Room Area (ft2)", "Room Height (ft)"] + airflow_col_names
+    rm_vent_df = pd.DataFrame(np.hstack([geometry, airflows]), columns=data_col_names)
+    rm_vent_df.insert(0, "Room Name", rooms_df["Room name"].to_numpy())
 
     # Sort by Room Number and Name
-    rm_vent_df7 = rm_vent_df6.sort_values(by=["Room Name"])
+    rm_vent_df = rm_vent_df.sort_values(by=["Room Name"])
 
     # Calc the Totals for each column
-    rm_vent_df8 = rm_vent_df7.replace("-", np.nan)
-    columnNames = list(rm_vent_df8.columns.values)
-
-    totals = rm_vent_df8[columnNames].sum()
+    totals = rm_vent_df[data_col_names].sum()
     totals["Room Name"] = "Totals"
-    totals["Room Height (ft)"] = " "
-    newSeries = pd.Series(totals)
-    newSeries.name = "Totals"
+    totals["Room Height (ft)"] = np.nan
+    totals_df = pd.DataFrame([totals[rm_vent_df.columns]])
+
+    return ("room_airflows", pd.concat([rm_vent_df, totals_df], ignore_index=True))
+
 
-    # Add in the totals to the main DF
-    rm_vent_df9 = rm_vent_df7._append(newSeries)
+def format_room_airflows(_df: pd.DataFrame) -> pd.DataFrame:
+    """Return the Room-by-Room table as written to the CSV: zero values shown as '-', and a blank Totals height."""
+    rooms_df, totals_df = _df.iloc[:-1], _df.iloc[-1:].astype(object)
+    data_col_names = _df.columns[1:]
 
-    # Export to csv
-    return ("room_airflows", rm_vent_df9.to_csv(index=False))
+    output_df = rooms_df.astype(object)
+    output_df[data_col_names] = output_df[data_col_names].where(rooms_df[data_col_names] != 0, "-")
+    totals_df["Room Height (ft)"] = " "
+    return pd.concat([output_df, totals_df])
+
+
+def create_csv_fresh_air_flowrates(_df_vent: pd.DataFrame) -> tuple[str, str]:
+    """Create the Room-by-Room Fresh air flow-rate CSV data file.
+
+    Returns:
+    --------
+        * Tuple[str, str]: A Tuple with the filename and the CSV file as a string.
+    """
+    file_name, df = create_df_fresh_air_flowrates(_df_vent)
+    return (file_name, format_room_airflows(df).to_csv(index=False))
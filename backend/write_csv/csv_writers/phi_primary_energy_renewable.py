@@ -5,6 +5,12 @@
 
 import pandas as pd
 
+from backend.write_csv.report_specs import ReportSpec, compile_reports, run_report_plan
+
+# -- The PER results, followed by the PER Certification Limit
+PHI_PRIMARY_ENERGY_RENEWABLE = ReportSpec("energy_PER", ((408, 423),), dropna=True, limit_row=324)
+PHI_PRIMARY_ENERGY_RENEWABLE_PLAN = compile_reports([PHI_PRIMARY_ENERGY_RENEWABLE])
+
 
 def create_csv_Phi_primary_energy_renewable(_df_main: pd.DataFrame, _cert_limits_abs: pd.DataFrame) -> tuple[str, str]:
     """Outputs a formatted .CSV with the Net-Primary-Energy information as per Phius.
@@ -18,12 +24,4 @@ def create_csv_Phi_primary_energy_renewable(_df_main: pd.DataFrame, _cert_limits
     --------
         * Tuple[str, str]: A Tuple with the filename and the CSV file as a string.
     """
-
-    # Create the PER data csv
-    PE_df1 = _df_main.loc[408:423]
-
-    # -- Little bit of cleanup
-    PE_df2 = PE_df1.dropna(axis=0, how="all")
-    PE_df3 = PE_df2._append(_cert_limits_abs.loc[324])
-
-    return ("energy_PER", PE_df3.to_csv(index=False))
+    return run_report_plan(PHI_PRIMARY_ENERGY_RENEWABLE_PLAN, _df_main, _cert_limits_abs=_cert_limits_abs)[0]
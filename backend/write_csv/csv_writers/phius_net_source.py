@@ -3,11 +3,18 @@
 
 """Export Mechanical System Data CSV files from the Main PHPP DataFrame"""
 
+import numpy as np
 import pandas as pd
 
+# -- The 'Variants' worksheet row with the Solar PV (site) generation, and its Site-->Source factor
+SOLAR_PV_ROW = 406
+PV_SOURCE_FACTOR = 1.8
 
-def create_csv_Phius_net_source_energy(_df_main: pd.DataFrame, _cert_limits_abs: pd.DataFrame) -> tuple[str, str]:
-    """Outputs a formatted .CSV with the Net-Primary-Energy information as per Phius.
+
+def create_df_Phius_net_source_energy(
+    _df_main: pd.DataFrame, _cert_limits_abs: pd.DataFrame
+) -> tuple[str, pd.DataFrame]:
+    """Creates the table of the Net-Primary-Energy information as per Phius.
 
     Arguments:
     ----------
@@ -16,7 +23,7 @@ def create_csv_Phius_net_source_energy(_df_main: pd.DataFrame, _cert_limits_abs:
 
     Returns:
     --------
-        * Tuple[str, str]: A Tuple with the filename and the CSV file as a string.
+        * Tuple[str, pd.DataFrame]: A Tuple with the filename and the table.
     """
 
     # Create the PE data csv
@@ -28,52 +35,47 @@ def create_csv_Phius_net_source_energy(_df_main: pd.DataFrame, _cert_limits_abs:
     PE_df3 = PE_df2.dropna(axis=0, how="all")
     PE_df4 = PE_df3._append(_cert_limits_abs.loc[325])
 
-    return ("Phius_net_source_energy", PE_df4.to_csv(index=False))
-
+    return ("Phius_net_source_energy", PE_df4)
 
-def reduce_energy_by_solar(_df_main: pd.DataFrame, _pe_df: pd.DataFrame) -> pd.DataFrame:
-    """Reduces Energy consumption by %, based on Variant's Solar PV
 
-    Arguments:
-    ----------
-        * _df_main (pd.DataFrame): The Main PHPP DataFrame with all the Data.
-        * _pe_df (pd.DataFrame): The 'PE' dataframe.
+def create_csv_Phius_net_source_energy(_df_main: pd.DataFrame, _cert_limits_abs: pd.DataFrame) -> tuple[str, str]:
+    """Outputs a formatted .CSV with the Net-Primary-Energy information as per Phius.
 
     Returns:
     --------
-        * (pd.DataFrame) A new DF with all the consumption values reduced by some
-            amount, based on the Solar PV.
-
+        * Tuple[str, str]: A Tuple with the filename and the CSV file as a string.
     """
+    file_name, df = create_df_Phius_net_source_energy(_df_main, _cert_limits_abs)
+    return (file_name, df.to_csv(index=False))
 
-    PE_solar_df = _df_main.loc[406:406]
-    PE_solar_data_df = PE_solar_df.iloc[:, -5:]
-    PE_solar_data_df = PE_solar_data_df.apply(pd.to_numeric)
-    PE_solar_data_df = PE_solar_data_df * 1.8
 
-    # --- Add 'totals' row to each colum
-    totals = _pe_df.sum(axis=0, numeric_only=False)
-    totals["Datatype"] = "Totals"
-    totals["Units"] = None
-    PE_df2 = _pe_df._append(totals, ignore_index=True)
+def reduce_energy_by_solar(_df_main: pd.DataFrame, _pe_df: pd.DataFrame, _subtract: bool = False) -> pd.DataFrame:
+    """Return the 'PE' DataFrame with numeric values, optionally reduced by each end-use's share of the Solar PV.
 
-    # --- Separate out the 'data' columns and the 'datatype' columns
-    PE_datatype_cols_df = PE_df2.iloc[:, :2]
-    PE_df_data = PE_df2.iloc[:, -5:]
-    PE_df_data = PE_df_data.apply(pd.to_numeric).fillna(0)
+    The Solar PV (site) generation is converted to source energy (x PV_SOURCE_FACTOR), and split between
+    the end-uses by their share of each Variant's total, in one broadcast over the (end-uses, variants) array.
+    The Phius net source energy CSV does not subtract it (yet), so `_subtract` is off by default.
 
-    totals_data = PE_df_data.iloc[-1]
+    Arguments:
+    ----------
+        * _df_main (pd.DataFrame): The Main PHPP DataFrame with all the Data.
+        * _pe_df (pd.DataFrame): The 'PE' dataframe.
+        * _subtract (bool): Default=False. Set True to subtract the Solar PV reduction from the values.
 
-    # -- Compute the % of total for each of the consumption areass
-    pe_percentage_values_df = pd.DataFrame(PE_df_data.values / totals_data.values)
-    pe_percentage_values_df.columns = PE_df_data.columns
+    Returns:
+    --------
+        * (pd.DataFrame) A new DF with all the consumption values as numbers (missing values are 0),
+            reduced by some amount, based on the Solar PV, if `_subtract` is True.
+    """
+    variant_names = _pe_df.columns[2:]
+    PE_df_data = _pe_df[variant_names].apply(pd.to_numeric).fillna(0)
 
-    # -- Compute a reduction from solar for each of the consumption areas based on %
-    reduction_from_solar_df = pe_percentage_values_df.mul(PE_solar_data_df.iloc[-1]).fillna(0)
-    PE_NET_data_df = PE_df_data  # - reduction_from_solar_df
+    if _subtract:
+        pe_values = PE_df_data.to_numpy(dtype=float)
+        totals = pe_values.sum(axis=0)
+        pe_percentage = np.divide(pe_values, totals, out=np.zeros_like(pe_values), where=totals != 0)
+        pv_source_energy = pd.to_numeric(_df_main.loc[SOLAR_PV_ROW, variant_names]).fillna(0).to_numpy(dtype=float)
+        PE_df_data = PE_df_data - pe_percentage * (pv_source_energy * PV_SOURCE_FACTOR)
 
     # -- Recombine the final DF
-    PE_NET_df = pd.concat([PE_datatype_cols_df, PE_NET_data_df], axis=1)
-    PE_NET_df.drop(PE_NET_df.tail(1).index, inplace=True)
-
-    return PE_NET_df
+    return pd.concat([_pe_df.iloc[:, :2], PE_df_data], axis=1).reset_index(drop=True)
@@ -94,28 +94,24 @@ def part_b(_part_a_df: pd.DataFrame) -> pd.DataFrame:
         else:
             newNamesList.append(each)
 
-    srfcValues_df4 = _part_a_df
-    srfcValues_df4["Datatype"] = newNamesList
+    # -- Return a new DataFrame, leave the input as-is
+    return _part_a_df.assign(Datatype=newNamesList)
 
-    return srfcValues_df4
 
-
-def create_csv_rValues(
+def create_df_rValues(
     _df_main: pd.DataFrame,
     variant_names: pd.Series,
-) -> list[tuple[str, str]]:
-    """Creates the Envelope R-Values and Surface Data CSV files.
+) -> list[tuple[str, pd.DataFrame]]:
+    """Creates the Envelope R-Values and Surface Data tables.
 
     Arguments:
     ----------
         * _df_main (pd.DataFrame): The Main PHPP DataFrame.
         * variant_names (pd.Series): A Series with the Variant Names.
-        * _output_path_1 (pathlib.Path): The CSV output file path for the Surface Data CSV.
-        * _output_path_2 (pathlib.Path): The CSV output file path for the R-Values CSV.
 
     Returns:
     --------
-        * List[Tuple[str, str]]: A list of Tuples with the filename and the CSV file as a string.
+        * List[Tuple[str, pd.DataFrame]]: A list of Tuples with the filename and the table.
     """
 
     srfc_values = get_surface_values(_df_main)
@@ -151,8 +147,20 @@ def create_csv_rValues(
     # Filter out any surfaces that aren't actually used in the model
     rValues_df5 = rValues_df4.drop(columns=[col for col in rValues_df4 if col not in surfaceNamesInTheModel])
 
-    # Export to csv
     return [
-        ("envelope_rValues", sfc_values_output_df.to_csv(index=False)),
-        ("envelope_srfcValues", rValues_df5.to_csv(index=False)),
+        ("envelope_rValues", sfc_values_output_df),
+        ("envelope_srfcValues", rValues_df5),
     ]
+
+
+def create_csv_rValues(
+    _df_main: pd.DataFrame,
+    variant_names: pd.Series,
+) -> list[tuple[str, str]]:
+    """Creates the Envelope R-Values and Surface Data CSV files.
+
+    Returns:
+    --------
+        * List[Tuple[str, str]]: A list of Tuples with the filename and the CSV file as a string.
+    """
+    return [(file_name, df.to_csv(index=False)) for file_name, df in create_df_rValues(_df_main, variant_names)]
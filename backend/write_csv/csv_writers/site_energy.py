@@ -5,6 +5,10 @@
 
 import pandas as pd
 from backend.read_phpp.load_phpp_data import PHPPData
+from backend.write_csv.report_specs import ReportSpec, compile_reports, run_report_plan
+
+SITE_ENERGY = ReportSpec("energy_Site", ((374, 389),), dropna=True)
+SITE_ENERGY_PLAN = compile_reports([SITE_ENERGY])
 
 
 def get_site_energy_as_df(_df_main: pd.DataFrame) -> pd.DataFrame:
@@ -38,7 +42,14 @@ def get_site_energy_as_df(_df_main: pd.DataFrame) -> pd.DataFrame:
 def create_csv_SiteEnergy(
     phpp_data: PHPPData,
 ) -> tuple[str, str]:
-    df_site_energy = get_site_energy_as_df(phpp_data.df_main)
+    """Creates the Site Energy (kWh/yr) CSV file.
+
+    Arguments:
+    ----------
+        * phpp_data (PHPPData): A PHPPData object with all the data pulled from the Excel file.
 
-    # -- Export to csv
-    return ("energy_Site", df_site_energy.to_csv(index=False))
+    Returns:
+    --------
+        * Tuple[str, str]: A Tuple with the filename and the CSV file as a string.
+    """
+    return run_report_plan(SITE_ENERGY_PLAN, phpp_data.df_main)[0]
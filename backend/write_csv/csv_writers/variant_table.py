@@ -6,14 +6,30 @@
 import numpy as np
 import pandas as pd
 
-pd.options.mode.chained_assignment = None  # default='warn'
 
+def replace_row(_df: pd.DataFrame, _row: int, _new_row: pd.Series) -> pd.DataFrame:
+    """Return a new DataFrame with the values of a single row replaced. The input DataFrame is not modified.
 
-def create_csv_variant_table(
+    Arguments:
+    ----------
+        * _df (pd.DataFrame): The DataFrame to read the rows from.
+        * _row (int): The index of the row to replace.
+        * _new_row (pd.Series): The new values for the row.
+
+    Returns:
+    --------
+        * (pd.DataFrame): A new DataFrame with the row replaced.
+    """
+    values = _df.to_numpy(dtype=object, copy=True)
+    values[_df.index.get_loc(_row)] = _new_row[_df.columns].to_numpy(dtype=object)
+    return pd.DataFrame(values, index=_df.index, columns=_df.columns)
+
+
+def create_df_variant_table(
     _df_main: pd.DataFrame,
     _variant_names: pd.Series,
     _omitted_assemblies: list[str],
-) -> tuple[str, str]:
+) -> tuple[str, pd.DataFrame]:
     """Create the comprehensive Variant Data Table with bits from all over the place.
 
     Arguments:
@@ -24,7 +40,7 @@ def create_csv_variant_table(
 
     Returns:
     --------
-        * Tuple[str, str]: A Tuple with the filename and the CSV file as a string.
+        * Tuple[str, pd.DataFrame]: A Tuple with the filename and the table (empty cells are NaN).
     """
     #  START = 202 # PHPP-9
     START = 270  # PHPP-10
@@ -78,9 +94,8 @@ def create_csv_variant_table(
     # Envelope R-Values and Airtightness
     # --------------------------------------------------------------------------
     env_df1 = _df_main.loc[19 + START : 31 + START]
-    env_df1a = pd.DataFrame(env_df1)
     new_datatype_column = env_df1["Datatype"].str.replace("_", " ").str.replace("Generic ", "")
-    env_df1a["Datatype"] = new_datatype_column
+    env_df1a = env_df1.assign(Datatype=new_datatype_column)
 
     def is_unused_assembly(_in):
         if _in in _omitted_assemblies:
@@ -95,8 +110,8 @@ def create_csv_variant_table(
     q50_ip1 = env_df2.loc[START + 31][_variant_names] * 0.054680665
     q50_ip2 = pd.Series(["Envelope Air Leakage Rate (q50)", "cfm/ft2"], index=["Datatype", "Units"])
     q50_ip3 = q50_ip2._append(q50_ip1)
-    env_df2.loc[START + 31] = q50_ip3
-    env_results_df2 = env_df2.dropna(how="any")
+    env_df3 = replace_row(env_df2, START + 31, q50_ip3)
+    env_results_df2 = env_df3.dropna(how="any")
 
     # Systems
     # --------------------------------------------------------------------------
@@ -108,16 +123,14 @@ def create_csv_variant_table(
     ductLen_s2 = pd.Series(["Cold Air Duct Length (ea)", "ft"], index=["Datatype", "Units"])
     ductLen_s3 = ductLen_s2._append(ductLen_s1)
 
-    sys_df2 = sys_df1.copy(deep=True)
-    sys_df2.loc[START + 38] = ductLen_s3
+    sys_df2 = replace_row(sys_df1, START + 38, ductLen_s3)
 
     # Insulation
     ductInsul_s1 = sys_df2.loc[START + 39][_variant_names] * 0.039370079
     ductInsul_s2 = pd.Series(["Cold Air Duct Insulation Thickness", "inches"], index=["Datatype", "Units"])
     ductInsul_s3 = ductInsul_s2._append(ductInsul_s1)
 
-    sys_df3 = sys_df2.copy(deep=True)
-    sys_df3.loc[START + 39] = ductInsul_s3
+    sys_df3 = replace_row(sys_df2, START + 39, ductInsul_s3)
     sys_df4 = sys_df3.reset_index(drop=True)
 
     # Add the breaks
@@ -133,8 +146,20 @@ def create_csv_variant_table(
     # --------------------------------------------------------------------------
     # -- Build the final df in the right order
     variantsData_df = pd.concat([brk_env, env_results_df2, brk_sys, sys_df4, brk_results, key_results_df])
-    variantsData_df2 = variantsData_df.fillna("")
 
-    # --------------------------------------------------------------------------
-    # Export to csv
-    return ("variant_inputs", variantsData_df2.to_csv(index=False))
+    return ("variant_inputs", variantsData_df)
+
+
+def create_csv_variant_table(
+    _df_main: pd.DataFrame,
+    _variant_names: pd.Series,
+    _omitted_assemblies: list[str],
+) -> tuple[str, str]:
+    """Create the comprehensive Variant Data Table CSV file.
+
+    Returns:
+    --------
+        * Tuple[str, str]: A Tuple with the filename and the CSV file as a string.
+    """
+    file_name, df = create_df_variant_table(_df_main, _variant_names, _omitted_assemblies)
+    return (file_name, df.to_csv(index=False))
@@ -2,75 +2,372 @@
 # -*- Python Version: 3.11 -*-
 
 
-"""Wrapper functions to create all the CSV files from the PHPP Data."""
+"""Wrapper functions to create all the CSV files (or their tables, as DataFrames) from the PHPP Data."""
 
+from functools import partial
+import time
+import traceback
+from typing import Any, Callable, Collection, Iterator
 
+import pandas as pd
+
+from backend.deadline import Deadline
 from backend.read_phpp import PHPPData
-from backend.write_csv.csv_writers.airtightness import create_csv_airtightness
-from backend.write_csv.csv_writers.bldg_data_basics import create_csv_bldg_basic_data_table
-from backend.write_csv.csv_writers.climate import create_csv_radiation, create_csv_temperatures
-from backend.write_csv.csv_writers.co2e import create_csv_CO2E
-from backend.write_csv.csv_writers.demand_cooling_dtl import create_csv_detailed_cooling_demand
-from backend.write_csv.csv_writers.demand_heating_dtl import create_csv_detailed_heating_demand
+from backend.read_phpp.shared_phpp_data import AttachedPHPPData, SharedPHPPDataHandle
+from backend.write_csv.csv_writers.airtightness import AIRTIGHTNESS
+from backend.write_csv.csv_writers.bldg_data_basics import create_df_bldg_basic_data_table
+from backend.write_csv.csv_writers.climate import create_df_radiation, create_df_temperatures
+from backend.write_csv.csv_writers.co2e import CO2E, create_csv_CO2E
+from backend.write_csv.csv_writers.demand_cooling_dtl import create_df_detailed_cooling_demand
+from backend.write_csv.csv_writers.demand_heating_dtl import create_df_detailed_heating_demand
 from backend.write_csv.csv_writers.heating_and_cooling import (
-    create_csv_cooling_demand,
-    create_csv_cooling_load,
-    create_csv_heating_and_cooling_demand,
-    create_csv_heating_demand,
-    create_csv_heating_load,
+    COOLING_DEMAND,
+    COOLING_LOAD,
+    HEATING_AND_COOLING_DEMAND,
+    HEATING_DEMAND,
+    HEATING_LOAD,
 )
-from backend.write_csv.csv_writers.mech import create_csv_fresh_air_flowrates
-from backend.write_csv.csv_writers.phi_primary_energy_renewable import create_csv_Phi_primary_energy_renewable
-from backend.write_csv.csv_writers.phius_net_source import create_csv_Phius_net_source_energy
-from backend.write_csv.csv_writers.r_value import create_csv_rValues
-from backend.write_csv.csv_writers.site_energy import create_csv_SiteEnergy
-from backend.write_csv.csv_writers.variant_table import create_csv_variant_table
+from backend.write_csv.csv_writers.mech import create_df_fresh_air_flowrates, format_room_airflows
+from backend.write_csv.csv_writers.phi_primary_energy_renewable import PHI_PRIMARY_ENERGY_RENEWABLE
+from backend.write_csv.csv_writers.phius_net_source import create_df_Phius_net_source_energy
+from backend.write_csv.csv_writers.r_value import create_df_rValues
+from backend.write_csv.csv_writers.site_energy import SITE_ENERGY
+from backend.write_csv.csv_writers.variant_table import create_csv_variant_table, create_df_variant_table
+from backend.write_csv.output_manifest import OutputManifest
+from backend.write_csv.report_specs import ReportPlan, ReportSpec, build_report_tables, compile_reports
 
+# -- The reports defined as ReportSpecs, built together from a single extraction of their rows
+REPORT_PLAN = compile_reports(
+    [
+        HEATING_AND_COOLING_DEMAND,
+        HEATING_DEMAND,
+        COOLING_DEMAND,
+        HEATING_LOAD,
+        COOLING_LOAD,
+        SITE_ENERGY,
+        PHI_PRIMARY_ENERGY_RENEWABLE,
+        CO2E,
+        AIRTIGHTNESS,
+    ]
+)
+
+# -- Each ReportSpec report on its own, by file name, for when the combined plan fails
+SPEC_PLANS = {spec.name: compile_reports([spec]) for spec in REPORT_PLAN.specs}
 
-def create_csv_files_from_phpp_data(
-    phpp_data: PHPPData, co2e_limit_tons_yr: float, omitted_assemblies: list[str]
-) -> list[tuple[str, str]]:
-    """Generate all the .CSV files based on the input PHPPData object.
+
+# -- A writer's outputs: [(filename, table), ...]
+Tables = list[tuple[str, pd.DataFrame]]
+
+# -- The writers whose CSV shows their table differently (ie: zeros as '-'), by writer name
+CSV_FORMATTERS: dict[str, Callable[[pd.DataFrame], pd.DataFrame]] = {
+    "room_airflows": format_room_airflows,
+}
+
+
+def get_table_writers(
+    phpp_data: PHPPData,
+    co2e_limit_tons_yr: float,
+    omitted_assemblies: list[str],
+    combined_demand_detail: bool = False,
+    outputs: Collection[str] | None = None,
+) -> list[tuple[str, Callable[[], Tables]]]:
+    """Return the writers, in output order: (name, function returning its [(filename, DataFrame), ...] tables).
+
+    Nothing is built until a writer is called. The (wanted) ReportSpec reports are all built together, in
+    one fused plan, by the first of their writers to be called. If that fails, each of their writers
+    builds its report on its own instead, so that one bad report only fails its own writer, with its own error.
 
     Arguments:
     ----------
         * phpp_data (PHPPData): A PHPPData object with all the data pulled from the Excel file.
         * co2e_limit_tons_yr (float): The CO2e limit in tons/year.
-        * co2e_factors (dict[str, float]): The CO2e factors for each energy source.
         * omitted_assemblies (list[str]): A list of the omitted assemblies.
+        * combined_demand_detail (bool): Default=False. Set True to also output the detailed
+            heating / cooling demand of all Variants as a single table each.
+        * outputs (Collection[str] | None): Default=None (all). The names of the writers to keep,
+            ie: ['climate_temps', 'heating_demand']. Raises ValueError for an unknown name.
 
     Returns:
     --------
-        *  list[Tuple[str, str]]: A list of Tuples with: [(filename, csv_string), ...]
+        * list[tuple[str, Callable[[], Tables]]]: The (name, writer) of each writer.
     """
 
-    # format: [ (filename, csv_string), ... ]
-    csv_file_names_and_data = [
+    # -- Held for the whole run, so each of the PHPPData DataFrames is only rebuilt once
+    df_main = phpp_data.df_main
+    df_tfa = phpp_data.df_tfa
+    df_cert_limits = phpp_data.df_cert_limits
+    df_climate = phpp_data.df_climate
+
+    # -- The ReportSpec reports, by file name, all built together (by the fused plan) by the first one called
+    reports: dict[str, pd.DataFrame] = {}
+    fused_plan: ReportPlan | None = None
+
+    def report(_spec: ReportSpec) -> Tables:
+        nonlocal fused_plan
+        if fused_plan is not None:
+            plan, fused_plan = fused_plan, None
+            try:
+                reports.update(build_report_tables(plan, df_main, df_tfa, df_cert_limits))
+            except Exception:
+                # -- Each report's writer then builds it on its own, and fails (or not) with its own error
+                print(f"Error: {traceback.format_exc()}")
+        if _spec.name not in reports:
+            reports.update(build_report_tables(SPEC_PLANS[_spec.name], df_main, df_tfa, df_cert_limits))
+        return [(_spec.name, reports.pop(_spec.name))]
+
+    writers: list[tuple[str, Callable[[], Tables]]] = [
         # -- Basic energy consumption
-        create_csv_heating_and_cooling_demand(phpp_data.df_main, phpp_data.df_tfa, phpp_data.df_cert_limits),
-        create_csv_heating_demand(phpp_data.df_main, phpp_data.df_tfa, phpp_data.df_cert_limits),
-        create_csv_cooling_demand(phpp_data.df_main, phpp_data.df_tfa, phpp_data.df_cert_limits),
-        create_csv_heating_load(phpp_data.df_main, phpp_data.df_tfa, phpp_data.df_cert_limits),
-        create_csv_cooling_load(phpp_data.df_main, phpp_data.df_tfa, phpp_data.df_cert_limits),
-        create_csv_Phius_net_source_energy(phpp_data.df_main, phpp_data.df_cert_limits),
-        create_csv_SiteEnergy(phpp_data),
-        create_csv_Phi_primary_energy_renewable(phpp_data.df_main, phpp_data.df_cert_limits),
+        (HEATING_AND_COOLING_DEMAND.name, partial(report, HEATING_AND_COOLING_DEMAND)),
+        (HEATING_DEMAND.name, partial(report, HEATING_DEMAND)),
+        (COOLING_DEMAND.name, partial(report, COOLING_DEMAND)),
+        (HEATING_LOAD.name, partial(report, HEATING_LOAD)),
+        (COOLING_LOAD.name, partial(report, COOLING_LOAD)),
+        ("Phius_net_source_energy", lambda: [create_df_Phius_net_source_energy(df_main, df_cert_limits)]),
+        (SITE_ENERGY.name, partial(report, SITE_ENERGY)),
+        (PHI_PRIMARY_ENERGY_RENEWABLE.name, partial(report, PHI_PRIMARY_ENERGY_RENEWABLE)),
         # --- CO2 Emissions
-        create_csv_CO2E(phpp_data, co2e_limit_tons_yr),
+        (CO2E.name, partial(report, CO2E)),
         # --- Get the Model Variants info
-        create_csv_variant_table(phpp_data.df_main, phpp_data.variant_names, omitted_assemblies),
-        create_csv_bldg_basic_data_table(phpp_data.df_main),
+        ("variant_inputs", lambda: [create_df_variant_table(df_main, phpp_data.variant_names, omitted_assemblies)]),
+        ("bldg_data", lambda: [create_df_bldg_basic_data_table(df_main)]),
         # --- Create Detailed Heating, Cooling Demand
-        *create_csv_detailed_heating_demand(phpp_data.df_main, phpp_data.df_cert_limits),
-        *create_csv_detailed_cooling_demand(phpp_data.df_main, phpp_data.df_cert_limits),
+        ("heating_demand", lambda: create_df_detailed_heating_demand(df_main, df_cert_limits, combined_demand_detail)),
+        ("cooling_demand", lambda: create_df_detailed_cooling_demand(df_main, df_cert_limits, combined_demand_detail)),
         # --- Airtightness
-        create_csv_airtightness(phpp_data.df_main),
-        *create_csv_rValues(phpp_data.df_main, phpp_data.variant_names),
+        (AIRTIGHTNESS.name, partial(report, AIRTIGHTNESS)),
+        ("envelope_rValues", lambda: create_df_rValues(df_main, phpp_data.variant_names)),
         # --- Climate
-        create_csv_radiation(phpp_data.df_climate),
-        create_csv_temperatures(phpp_data.df_climate),
+        ("climate_radiation", lambda: [create_df_radiation(df_climate)]),
+        ("climate_temps", lambda: [create_df_temperatures(df_climate)]),
         # --- Mechanical
-        create_csv_fresh_air_flowrates(phpp_data.df_vent),
+        ("room_airflows", lambda: [create_df_fresh_air_flowrates(phpp_data.df_vent)]),
     ]
 
-    return csv_file_names_and_data
+    if outputs is not None:
+        names = [name for name, _ in writers]
+        if unknown := sorted(set(outputs) - set(names)):
+            raise ValueError(f"Unknown output(s): {unknown}. Use any of: {names}")
+        writers = [(name, writer) for name, writer in writers if name in outputs]
+
+    # -- Only build the reports which are wanted (the full plan is compiled once, at import)
+    specs = [spec for spec in REPORT_PLAN.specs if any(name == spec.name for name, _ in writers)]
+    if specs:
+        fused_plan = REPORT_PLAN if len(specs) == len(REPORT_PLAN.specs) else compile_reports(specs)
+    return writers
+
+
+def run_writers(
+    _writers: list[tuple[str, Callable[[], Tables]]],
+    _render: Callable[[str, Tables], list[tuple[str, Any]]],
+    _deadline: Deadline | None = None,
+    _manifest: OutputManifest | None = None,
+) -> Iterator[tuple[str, Any]]:
+    """Run each writer in turn, and yield its rendered (filename, output) outputs.
+
+    With a manifest, each writer runs on its own: one which raises is recorded as 'failed' (and
+    its outputs left out), and the others still run. Without one, any error stops the run.
+
+    Arguments:
+    ----------
+        * _writers (list[tuple[str, Callable[[], Tables]]]): The (name, writer) of each writer, ie: from
+            get_table_writers.
+        * _render (Callable[[str, Tables], list[tuple[str, Any]]]): Called with the writer's name and
+            tables, it returns the outputs to yield (ie: as CSV strings).
+        * _deadline (Deadline | None): Default=None. Checked before each writer starts. Once it has
+            passed, the remaining writers are recorded as 'skipped' (or, without a manifest,
+            DeadlineExceeded is raised).
+        * _manifest (OutputManifest | None): Default=None. Each writer's outcome, files and time are added to it.
+
+    Yields:
+    -------
+        *  Tuple[str, Any]: (filename, output)
+    """
+    for name, writer in _writers:
+        if _deadline is not None and _deadline.expired:
+            if _manifest is None:
+                _deadline.check(f"the '{name}' writer")
+            _manifest.add(name, "skipped", [], 0.0, f"The {_deadline.seconds:g} s deadline had passed.")
+            continue
+
+        if _manifest is None:
+            yield from _render(name, writer())
+            continue
+
+        start = time.perf_counter()
+        try:
+            outputs = _render(name, writer())
+        except Exception as e:
+            _manifest.add(name, "failed", [], time.perf_counter() - start, f"{type(e).__name__}: {e}")
+            continue
+        _manifest.add(name, "ok", [file_name for file_name, _ in outputs], time.perf_counter() - start)
+        yield from outputs
+
+
+def render_csv(_writer: str, _tables: Tables) -> list[tuple[str, str]]:
+    """Return the writer's tables as (filename, csv_string) outputs, formatted as the writer's CSV (if it has one)."""
+    formatter = CSV_FORMATTERS.get(_writer)
+    return [(file_name, (formatter(df) if formatter else df).to_csv(index=False)) for file_name, df in _tables]
+
+
+def typed_table(_df: pd.DataFrame) -> pd.DataFrame:
+    """Return a copy of the writer's table with a plain (0..n) index, and each column of numbers as a numeric dtype.
+
+    A column is numeric if all of its (non-empty) values are numbers, or text of numbers (ie: as
+    `pd.read_csv` would read it). Columns with any other text (ie: 'Datatype', or a '-') are left as objects.
+    """
+    df = _df.reset_index(drop=True)
+    if isinstance(df.columns, pd.MultiIndex) and df.columns.nlevels == 1:
+        df.columns = df.columns.get_level_values(0)
+    df = df.infer_objects()
+    for i, dtype in enumerate(df.dtypes):
+        if dtype != object:
+            continue
+        try:
+            df.isetitem(i, pd.to_numeric(df.iloc[:, i]))
+        except (ValueError, TypeError):
+            continue
+    return df
+
+
+def iter_csv_files_from_phpp_data(
+    phpp_data: PHPPData,
+    co2e_limit_tons_yr: float,
+    omitted_assemblies: list[str],
+    combined_demand_detail: bool = False,
+    deadline: Deadline | None = None,
+    manifest: OutputManifest | None = None,
+) -> Iterator[tuple[str, str]]:
+    """Generate the .CSV files based on the input PHPPData object, one at a time.
+
+    Each file is only created when the next one is asked for, so the caller can write out (or
+    spill to disk) each one before the next is built.
+
+    With a manifest, each writer runs on its own: one which raises is recorded as 'failed' (and
+    its files left out), and the others still run. Without one, any error stops the run.
+
+    Arguments:
+    ----------
+        * phpp_data (PHPPData): A PHPPData object with all the data pulled from the Excel file.
+        * co2e_limit_tons_yr (float): The CO2e limit in tons/year.
+        * omitted_assemblies (list[str]): A list of the omitted assemblies.
+        * combined_demand_detail (bool): Default=False. Set True to also output the detailed
+            heating / cooling demand of all Variants as a single file each.
+        * deadline (Deadline | None): Default=None. Checked before each writer starts. Once it has
+            passed, the remaining writers are recorded as 'skipped' (or, without a manifest,
+            DeadlineExceeded is raised).
+        * manifest (OutputManifest | None): Default=None. Each writer's outcome, files and time are added to it.
+
+    Yields:
+    -------
+        *  Tuple[str, str]: (filename, csv_string)
+    """
+    writers = get_table_writers(phpp_data, co2e_limit_tons_yr, omitted_assemblies, combined_demand_detail)
+    yield from run_writers(writers, render_csv, deadline, manifest)
+
+
+def iter_tables_from_phpp_data(
+    phpp_data: PHPPData,
+    co2e_limit_tons_yr: float,
+    omitted_assemblies: list[str],
+    combined_demand_detail: bool = False,
+    outputs: Collection[str] | None = None,
+    deadline: Deadline | None = None,
+    manifest: OutputManifest | None = None,
+) -> Iterator[tuple[str, pd.DataFrame]]:
+    """Generate the tables of the .CSV files as DataFrames (before any CSV formatting), one at a time.
+
+    With a manifest, each writer runs on its own, as in iter_csv_files_from_phpp_data.
+
+    Arguments:
+    ----------
+        * phpp_data (PHPPData): A PHPPData object with all the data pulled from the Excel file.
+        * co2e_limit_tons_yr (float): The CO2e limit in tons/year.
+        * omitted_assemblies (list[str]): A list of the omitted assemblies.
+        * combined_demand_detail (bool): Default=False. Set True to also output the detailed
+            heating / cooling demand of all Variants as a single table each.
+        * outputs (Collection[str] | None): Default=None (all). The names of the writers to run. See get_table_writers.
+        * deadline (Deadline | None): Default=None. Checked before each writer starts. See iter_csv_files_from_phpp_data.
+        * manifest (OutputManifest | None): Default=None. Each writer's outcome, files and time are added to it.
+
+    Yields:
+    -------
+        *  Tuple[str, pd.DataFrame]: (filename, table)
+    """
+    writers = get_table_writers(phpp_data, co2e_limit_tons_yr, omitted_assemblies, combined_demand_detail, outputs)
+    yield from run_writers(writers, lambda _writer, _tables: _tables, deadline, manifest)
+
+
+def create_csv_files_from_phpp_data(
+    phpp_data: PHPPData,
+    co2e_limit_tons_yr: float,
+    omitted_assemblies: list[str],
+    combined_demand_detail: bool = False,
+) -> list[tuple[str, str]]:
+    """Generate all the .CSV files based on the input PHPPData object.
+
+    Arguments:
+    ----------
+        * phpp_data (PHPPData): A PHPPData object with all the data pulled from the Excel file.
+        * co2e_limit_tons_yr (float): The CO2e limit in tons/year.
+        * omitted_assemblies (list[str]): A list of the omitted assemblies.
+        * combined_demand_detail (bool): Default=False. Set True to also output the detailed
+            heating / cooling demand of all Variants as a single file each.
+
+    Returns:
+    --------
+        *  list[Tuple[str, str]]: A list of Tuples with: [(filename, csv_string), ...]
+    """
+    return list(
+        iter_csv_files_from_phpp_data(phpp_data, co2e_limit_tons_yr, omitted_assemblies, combined_demand_detail)
+    )
+
+
+def create_csv_files_for_report_options(
+    phpp_data: PHPPData, co2e_limit_tons_yr: float, omitted_assemblies: list[str], co2e_limit_row: bool = False
+) -> list[tuple[str, str]]:
+    """Generate only the .CSV files which depend on the user's report options (CO2e limit, omitted assemblies).
+
+    Arguments:
+    ----------
+        * phpp_data (PHPPData): A PHPPData object with all the data pulled from the Excel file.
+        * co2e_limit_tons_yr (float): The CO2e limit in tons/year.
+        * omitted_assemblies (list[str]): A list of the omitted assemblies.
+        * co2e_limit_row (bool): Default=False. Set True to add the CO2e limit as the CO2e table's last row.
+
+    Returns:
+    --------
+        *  list[Tuple[str, str]]: A list of Tuples with: [(filename, csv_string), ...]
+    """
+    df_main = phpp_data.df_main  # -- Held, so that both writers get the same (already rebuilt) DataFrame
+    return [
+        create_csv_CO2E(phpp_data, co2e_limit_tons_yr, co2e_limit_row),
+        create_csv_variant_table(df_main, phpp_data.variant_names, omitted_assemblies),
+    ]
+
+
+def create_csv_files_from_shared_phpp_data(
+    shared_phpp_data: SharedPHPPDataHandle,
+    co2e_limit_tons_yr: float,
+    omitted_assemblies: list[str],
+    combined_demand_detail: bool = False,
+) -> list[tuple[str, str]]:
+    """Generate all the .CSV files in a worker process, reading the PHPP-Data from shared memory.
+
+    The shared memory is attached for this job only, and detached again once the CSV files are made.
+
+    Arguments:
+    ----------
+        * shared_phpp_data (SharedPHPPDataHandle): The handle of a SharedPHPPData in the parent process.
+        * co2e_limit_tons_yr (float): The CO2e limit in tons/year.
+        * omitted_assemblies (list[str]): A list of the omitted assemblies.
+        * combined_demand_detail (bool): Default=False. Set True to also output the detailed
+            heating / cooling demand of all Variants as a single file each.
+
+    Returns:
+    --------
+        *  list[Tuple[str, str]]: A list of Tuples with: [(filename, csv_string), ...]
+    """
+    with AttachedPHPPData(shared_phpp_data) as attached:
+        return create_csv_files_from_phpp_data(
+            attached.phpp_data, co2e_limit_tons_yr, omitted_assemblies, combined_demand_detail
+        )
@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+# -*- Python Version: 3.11 -*-
+
+"""The manifest of a pipeline run: each CSV writer's outcome ('ok', 'failed' or 'skipped'), files and time."""
+
+import csv
+from dataclasses import asdict, dataclass, field
+import io
+import json
+from typing import Iterator
+
+import pandas as pd
+
+# -- The columns of the manifest's table: one row per writer
+MANIFEST_COLUMNS = ["Writer", "Status", "Seconds", "Files", "Error"]
+
+# -- The outcomes of a writer
+WRITER_STATUSES = ("ok", "failed", "skipped")
+
+
+@dataclass
+class OutputRecord:
+    """One writer's outcome. `files` are the outputs it made (none, unless 'ok')."""
+
+    writer: str
+    status: str
+    files: list[str]
+    seconds: float
+    error: str | None = None
+
+
+@dataclass
+class OutputManifest:
+    """The outcome of each writer of a run, in order. A run is complete if every writer was 'ok'."""
+
+    deadline_s: float | None = None
+    records: list[OutputRecord] = field(default_factory=list)
+
+    def add(self, _writer: str, _status: str, _files: list[str], _seconds: float, _error: str | None = None) -> None:
+        if _status not in WRITER_STATUSES:
+            raise ValueError(f"Unknown writer status: '{_status}'")
+        self.records.append(OutputRecord(_writer, _status, _files, round(_seconds, 4), _error))
+
+    @property
+    def complete(self) -> bool:
+        return all(record.status == "ok" for record in self.records)
+
+    @property
+    def num_files(self) -> int:
+        return sum(len(record.files) for record in self.records)
+
+    def incomplete(self) -> list[OutputRecord]:
+        """Return the writers which failed, or were skipped."""
+        return [record for record in self.records if record.status != "ok"]
+
+    def to_json(self) -> str:
+        """Return the manifest as JSON (ie: 'manifest.json' in the .ZIP)."""
+        manifest = {
+            "complete": self.complete,
+            "deadline_s": self.deadline_s,
+            "total_seconds": round(sum(record.seconds for record in self.records), 4),
+            "incomplete": [record.writer for record in self.incomplete()],
+            "writers": [asdict(record) for record in self.records],
+        }
+        return json.dumps(manifest, indent=2)
+
+    def _rows(self) -> list[list]:
+        return [
+            [record.writer, record.status, record.seconds, " ".join(record.files), record.error or ""]
+            for record in self.records
+        ]
+
+    def to_csv(self) -> str:
+        """Return the manifest as a CSV table: one row per writer."""
+        output = io.StringIO()
+        writer = csv.writer(output, lineterminator="\n")
+        writer.writerow(MANIFEST_COLUMNS)
+        writer.writerows(self._rows())
+        return output.getvalue()
+
+    def to_df(self) -> pd.DataFrame:
+        """Return the manifest as a table: one row per writer."""
+        return pd.DataFrame(self._rows(), columns=MANIFEST_COLUMNS)
+
+    def iter_csv_output(self, _name: str = "manifest") -> Iterator[tuple[str, str]]:
+        """Yield the manifest as a (filename, csv_string) output. It is only made when asked for, so it can
+        follow (ie: be chained after) the outputs it describes.
+        """
+        yield (_name, self.to_csv())
+
+    def iter_table_output(self, _name: str = "manifest") -> Iterator[tuple[str, pd.DataFrame]]:
+        """Yield the manifest as a (filename, table) output, only made when asked for (as `iter_csv_output`)."""
+        yield (_name, self.to_df())
@@ -3,43 +3,39 @@
 
 """Process configuration class with cross-OS folder and file path handler methods."""
 
-from dataclasses import dataclass, field
+from dataclasses import dataclass
 import os
 import pathlib
 from typing import Callable
 
+from backend.write_csv.csv_writers.energy_scenarios import CO2E_FACTORS, SOURCE_FACTORS, EnergyScenarios
+
 
 @dataclass
 class ProcessConfigWriteCSV:
     """App configuration settings and paths (Mac/PC OS)"""
 
-    # Site--to--Source Factors by Fuel Type
-    # https://portfoliomanager.energystar.gov/pdf/reference/Source%20Energy.pdf
-    fuel_source_factors = {
-        "ELECTRIC": 2.8,
-        "NATURAL_GAS": 1.1,
-        "FUEL_OIL_NO2": 1.01,
-        "FUEL_OIL_NO4": 1.01,
-    }
+    # Site--to--Source Factors by Fuel Type (see energy_scenarios.SOURCE_FACTORS)
+    fuel_source_factors = dict(SOURCE_FACTORS)
 
     def __init__(
         self,
         phpp_file_name: str = "",
         csv_save_path: str = "",
         num_variants: int = 5,
-        co2e_factors: dict = field(default_factory=dict),
+        co2e_factors: dict | None = None,
         co2e_limit_tons_yr: float = 1,
-        omitted_assemblies: list[str] = field(default_factory=list),
+        omitted_assemblies: list[str] | None = None,
         message: Callable = print,
     ):
 
         self._phpp_file_path = phpp_file_name
         self._csv_save_path = csv_save_path
         self.num_variants = num_variants
-        self.co2e_factors = co2e_factors
+        self.co2e_factors = co2e_factors or dict(CO2E_FACTORS)
         self.co2e_limit_tons_yr = co2e_limit_tons_yr
 
-        self.omitted_assemblies = omitted_assemblies
+        self.omitted_assemblies = omitted_assemblies or []
 
         self.message = message
         self.check_paths()
@@ -55,6 +51,10 @@ class ProcessConfigWriteCSV:
     def csv_file_path(self, filename: str = "") -> pathlib.Path:
         return pathlib.Path(self._csv_save_path, filename).resolve()
 
+    def energy_scenario(self, name: str = "Base") -> EnergyScenarios:
+        """Return the fuel Source and CO2e factors as a single scenario, for create_csv_energy_scenarios."""
+        return EnergyScenarios.single(name, self.fuel_source_factors, self.co2e_factors)
+
     def check_paths(self) -> None:
         """Check if the PHPP-file and the CSV save folder exist.
         If the CSV folder does not exist, creates it.
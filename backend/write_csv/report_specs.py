@@ -0,0 +1,195 @@
+# -*- coding: utf-8 -*-
+# -*- Python Version: 3.11 -*-
+
+"""Declarative report definitions, compiled into a single plan which extracts each row of the Main DataFrame once.
+
+Only the simple reports (a selection of rows, scaled, per-TFA, totalled or with a limit row) are
+ReportSpecs: the Demand / Load, Site Energy, PER, CO2e and Airtightness CSVs. The writers which
+transform their rows further (Variant table, Building data, R-Values, detailed Heating / Cooling
+demand, Phius net source energy), or read another worksheet (Climate, Room airflows), still take
+their own rows from the PHPP-Data.
+"""
+
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+# -- A single Excel row, or a (first, last) range of rows (inclusive)
+RowSelector = int | tuple[int, int]
+
+
+@dataclass(frozen=True)
+class ReportSpec:
+    """The definition of a simple report: some rows of the Main DataFrame, transformed and written as a CSV.
+
+    Attributes:
+    -----------
+        * name (str): The CSV file name (without the '.csv').
+        * rows (tuple[RowSelector, ...]): The Excel rows, in output order. ie: (426, 428) or ((374, 389),)
+        * per_tfa (bool): Multiply the Variant values by the TFA (and remove '/m2' from the Units).
+        * scale (float | None): Multiply the Variant values by this factor (ie: 0.001 for kg --> tons).
+        * exclude_datatypes (tuple[str, ...]): Leave out any rows with these Datatypes.
+        * dropna (bool): Leave out rows without any values.
+        * totals (bool): Add a 'Totals' row with the sum of each Variant.
+        * limit_row (int | None): Add this (absolute) Certification Limit row at the end.
+    """
+
+    name: str
+    rows: tuple[RowSelector, ...]
+    per_tfa: bool = False
+    scale: float | None = None
+    exclude_datatypes: tuple[str, ...] = ()
+    dropna: bool = False
+    totals: bool = False
+    limit_row: int | None = None
+
+
+@dataclass(frozen=True)
+class ReportPlan:
+    """The compiled reports: every Main DataFrame row any of them needs, and which of those are per-TFA."""
+
+    specs: tuple[ReportSpec, ...]
+    ranges: tuple[tuple[int, int], ...]
+    per_tfa_ranges: tuple[tuple[int, int], ...]
+
+
+def _as_range(_selector: RowSelector) -> tuple[int, int]:
+    return (_selector, _selector) if isinstance(_selector, int) else _selector
+
+
+def _merge_ranges(_ranges: list[tuple[int, int]]) -> tuple[tuple[int, int], ...]:
+    """Return the ranges sorted, with any overlapping or adjacent ranges merged."""
+    merged: list[tuple[int, int]] = []
+    for first, last in sorted(_ranges):
+        if merged and first <= merged[-1][1] + 1:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], last))
+        else:
+            merged.append((first, last))
+    return tuple(merged)
+
+
+def compile_reports(_specs: list[ReportSpec]) -> ReportPlan:
+    """Merge the reports' row selections into one plan, so that each row block is only extracted once.
+
+    Arguments:
+    ----------
+        * _specs (list[ReportSpec]): The report definitions.
+
+    Returns:
+    --------
+        * (ReportPlan): The compiled plan, to run with `run_report_plan`.
+    """
+    ranges = [_as_range(row) for spec in _specs for row in spec.rows]
+    per_tfa_ranges = [_as_range(row) for spec in _specs if spec.per_tfa for row in spec.rows]
+    return ReportPlan(tuple(_specs), _merge_ranges(ranges), _merge_ranges(per_tfa_ranges))
+
+
+def _in_ranges(_index: pd.Index, _ranges: tuple[tuple[int, int], ...]) -> np.ndarray:
+    """Return a mask of the index values inside any of the (first, last) ranges."""
+    mask = np.zeros(len(_index), dtype=bool)
+    for first, last in _ranges:
+        mask |= (_index >= first) & (_index <= last)
+    return mask
+
+
+def get_values_per_tfa(_df: pd.DataFrame, _tfa: pd.Series) -> pd.DataFrame:
+    """Return a new DataFrame with each Variant's values multiplied by its TFA, and '/m2' removed from the Units."""
+    per_tfa = pd.DataFrame()
+    for variant in _df.columns[:2]:
+        per_tfa[variant] = _df[variant]
+
+    per_tfa["Units"] = per_tfa["Units"].str.replace("/m2", "")  # 'm2' strings
+    for variant in _df.columns[2:]:
+        # Convert to total kWh instead of kWh/m2
+        per_tfa[variant] = _df[variant].mul(_tfa[variant])
+    return per_tfa
+
+
+def _append_row(_df: pd.DataFrame, _row: pd.Series, _ignore_index: bool = False) -> pd.DataFrame:
+    """Return a new DataFrame with the Series added as its last row."""
+    row = _row.reindex(_df.columns).to_frame().T.infer_objects()
+    return pd.concat([_df, row], ignore_index=_ignore_index)
+
+
+def _select_rows(_block: pd.DataFrame, _rows: tuple[RowSelector, ...]) -> pd.DataFrame:
+    """Return the rows of the extracted block, in the order given."""
+    if all(isinstance(row, int) for row in _rows):
+        return _block.loc[list(_rows)]
+    return pd.concat([_block.loc[first:last] for first, last in map(_as_range, _rows)])
+
+
+def _build_report(
+    _spec: ReportSpec,
+    _block: pd.DataFrame,
+    _block_per_tfa: pd.DataFrame | None,
+    _variant_names: pd.Index,
+    _cert_limits_abs: pd.DataFrame | None,
+) -> pd.DataFrame:
+    """Return the report's DataFrame, sliced from the already extracted (and transformed) row blocks."""
+    df = _select_rows(_block_per_tfa if _spec.per_tfa else _block, _spec.rows)
+
+    if _spec.dropna:
+        df = df.dropna(axis=0, how="all")
+    if _spec.exclude_datatypes:
+        df = df[~df["Datatype"].isin(_spec.exclude_datatypes)]
+    if _spec.scale is not None:
+        df = df.assign(**{name: df[name] * _spec.scale for name in _variant_names})
+    if _spec.totals:
+        totals = df[_variant_names].apply(pd.to_numeric, errors="coerce").sum(axis=0)
+        totals["Datatype"] = "Totals"
+        totals["Units"] = None
+        df = _append_row(df, totals, _ignore_index=True)
+    if _spec.limit_row is not None:
+        df = _append_row(df, _cert_limits_abs.loc[_spec.limit_row])
+    return df
+
+
+def build_report_tables(
+    _plan: ReportPlan,
+    _df_main: pd.DataFrame,
+    _tfa: pd.Series | None = None,
+    _cert_limits_abs: pd.DataFrame | None = None,
+) -> list[tuple[str, pd.DataFrame]]:
+    """Build all the plan's reports as DataFrames, from a single extraction of the rows they need.
+
+    The rows used by any report are taken from the Main DataFrame once, and the per-TFA
+    values are computed once for every row any per-TFA report uses. Each report is then
+    only a slice of those shared blocks.
+
+    Arguments:
+    ----------
+        * _plan (ReportPlan): The compiled reports.
+        * _df_main (pd.DataFrame): The Main PHPP DataFrame with all the Data.
+        * _tfa (pd.Series | None): The TFA of each Variant. Only needed if a report is per-TFA.
+        * _cert_limits_abs (pd.DataFrame | None): The PHPP Certification Limits DataFrame.
+            Only needed if a report has a limit row.
+
+    Returns:
+    --------
+        * list[tuple[str, pd.DataFrame]]: The reports, in the order of the plan's specs: [(filename, DataFrame), ...]
+    """
+    block = _df_main.loc[_in_ranges(_df_main.index, _plan.ranges)]
+    block_per_tfa = None
+    if _plan.per_tfa_ranges:
+        block_per_tfa = get_values_per_tfa(block.loc[_in_ranges(block.index, _plan.per_tfa_ranges)], _tfa)
+    variant_names = _df_main.columns[2:]
+
+    return [
+        (spec.name, _build_report(spec, block, block_per_tfa, variant_names, _cert_limits_abs)) for spec in _plan.specs
+    ]
+
+
+def run_report_plan(
+    _plan: ReportPlan,
+    _df_main: pd.DataFrame,
+    _tfa: pd.Series | None = None,
+    _cert_limits_abs: pd.DataFrame | None = None,
+) -> list[tuple[str, str]]:
+    """Build all the plan's reports as CSV strings. See `build_report_tables`.
+
+    Returns:
+    --------
+        * list[tuple[str, str]]: The reports, in the order of the plan's specs: [(filename, csv_string), ...]
+    """
+    return [(name, df.to_csv(index=False)) for name, df in build_report_tables(_plan, _df_main, _tfa, _cert_limits_abs)]
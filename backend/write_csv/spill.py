@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*-
+# -*- Python Version: 3.11 -*-
+
+"""A collection of the generated CSV files which spills them to temp files once over a memory budget."""
+
+import pathlib
+import tempfile
+from typing import BinaryIO, Iterable, Iterator
+
+from backend.zip_archive import PARALLEL_MIN_BYTES, ZipCompression, build_zip, get_executor
+
+
+class SpillingOutputs:
+    """Holds the generated (filename, csv_string) outputs, in order.
+
+    While the total in memory (plus `reserved_bytes`, ie: the PHPPData) is within `max_bytes`,
+    each output is kept as a string. Any output which would go over the budget is written to
+    a temp file instead, and the string released. Call `close()` to remove the temp files.
+    """
+
+    def __init__(self, max_bytes: int | None, reserved_bytes: int = 0, directory: str | None = None):
+        self.max_bytes = max_bytes
+        self.reserved_bytes = reserved_bytes
+        self.directory = directory
+        self.memory_bytes = 0
+        self.spilled_bytes = 0
+        self._outputs: list[tuple[str, str | pathlib.Path]] = []
+        self._temp_dir: tempfile.TemporaryDirectory | None = None
+
+    def __enter__(self) -> "SpillingOutputs":
+        return self
+
+    def __exit__(self, *_) -> None:
+        self.close()
+
+    def __len__(self) -> int:
+        return len(self._outputs)
+
+    @property
+    def num_spilled(self) -> int:
+        """The number of outputs written to temp files."""
+        return sum(isinstance(data, pathlib.Path) for _, data in self._outputs)
+
+    def _spill_path(self, _index: int) -> pathlib.Path:
+        if self._temp_dir is None:
+            self._temp_dir = tempfile.TemporaryDirectory(prefix="phpp_to_csv_", dir=self.directory)
+        return pathlib.Path(self._temp_dir.name, f"{_index:03d}.csv")
+
+    def append(self, _output: tuple[str, str]) -> None:
+        """Add an output, spilling it to a temp file if it does not fit within the memory budget."""
+        file_name, csv_string = _output
+        data = csv_string.encode("utf-8")
+        if self.max_bytes is None or self.reserved_bytes + self.memory_bytes + len(data) <= self.max_bytes:
+            self.memory_bytes += len(data)
+            self._outputs.append((file_name, csv_string))
+            return
+
+        path = self._spill_path(len(self._outputs))
+        path.write_bytes(data)
+        self.spilled_bytes += len(data)
+        self._outputs.append((file_name, path))
+
+    def extend(self, _outputs: Iterable[tuple[str, str]]) -> None:
+        """Add each output in turn (so a generator's outputs are spilled one at a time)."""
+        for output in _outputs:
+            self.append(output)
+
+    def __iter__(self) -> Iterator[tuple[str, str | pathlib.Path]]:
+        """Yield the (filename, csv_string or temp-file path) of each output."""
+        return iter(self._outputs)
+
+    def write_zip(
+        self,
+        _fileobj: BinaryIO,
+        _extra_files: dict[str, bytes | str] | None = None,
+        _compression: ZipCompression = ZipCompression(),
+        _threads: int | None = None,
+    ) -> None:
+        """Write a .zip file of all the outputs (as '<filename>.csv'), then any extra files.
+
+        While nothing is spilled (and there is enough to be worth it), the members are compressed in
+        parallel, on `_threads` (see zip_archive.build_zip).
+        Spilled outputs are read from disk and compressed one at a time, so they are never all in memory.
+        """
+        entries = [(f"{file_name}.csv", data) for file_name, data in self._outputs]
+        entries.extend((_extra_files or {}).items())
+        parallel = not self.num_spilled and self.memory_bytes >= PARALLEL_MIN_BYTES
+        build_zip(_fileobj, entries, _compression, get_executor(_threads) if parallel else None)
+
+    def close(self) -> None:
+        """Remove any temp files."""
+        if self._temp_dir is not None:
+            self._temp_dir.cleanup()
+            self._temp_dir = None
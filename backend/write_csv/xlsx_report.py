@@ -0,0 +1,165 @@
+# -*- coding: utf-8 -*-
+# -*- Python Version: 3.11 -*-
+
+"""Write the generated tables as a single formatted Excel (.xlsx) report: one worksheet per table.
+
+The workbook is written in openpyxl's write-only mode, so each row is streamed out to the
+worksheet's (temp) file as it is added, and only one table is held at a time. Memory stays
+flat however many Variants, rooms or tables there are.
+
+The writers' tables are written as they are (not via their CSV): numbers as numbers, with a number
+format which shows the row's units (from the table's 'Units' column) after the value, ie: '1,234.5 kWh',
+and text as text. Only in the columns of numbers (see `typed_table`) is any text of a number written as
+the number.
+"""
+
+import math
+import re
+from typing import Any, BinaryIO, Iterable
+
+import numpy as np
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Font, PatternFill
+from openpyxl.utils import get_column_letter
+from openpyxl.worksheet._write_only import WriteOnlyWorksheet
+import pandas as pd
+
+from backend.write_csv.generate_csv_files import typed_table
+
+# -- Excel worksheet names: at most 31 characters, none of: \ / ? * [ ] :
+SHEET_NAME_MAX_LENGTH = 31
+_INVALID_SHEET_NAME_CHARS = re.compile(r"[\\/?*\[\]:]")
+
+# -- The number formats of whole, and decimal, numbers (the units are added to these)
+INTEGER_FORMAT = "#,##0"
+DECIMAL_FORMAT = "#,##0.0##"
+
+# -- The name of the units column, in tables which have one
+UNITS_COLUMN = "Units"
+
+_HEADER_FONT = Font(bold=True, color="FFFFFF")
+_HEADER_FILL = PatternFill("solid", fgColor="1976D2")
+
+
+def sheet_name(_name: str, _used: set[str]) -> str:
+    """Return a valid (and, within the workbook, unique) worksheet name for the table name."""
+    name = _INVALID_SHEET_NAME_CHARS.sub("_", _name).strip("'") or "Sheet"
+    candidate = name[:SHEET_NAME_MAX_LENGTH]
+    n = 1
+    while candidate.lower() in _used:
+        n += 1
+        suffix = f" ({n})"
+        candidate = name[: SHEET_NAME_MAX_LENGTH - len(suffix)] + suffix
+    _used.add(candidate.lower())
+    return candidate
+
+
+def cell_value(_value: Any) -> str | int | float | bool | None:
+    """Return the table's value as it is written to a cell: empty (None / NaN) as None, a number which
+    is not finite as its text (as in the CSV, ie: 'inf'), and anything which is not a number as text.
+    """
+    if isinstance(_value, np.generic):
+        _value = _value.item()
+    if _value is None or _value is pd.NA or _value is pd.NaT:
+        return None
+    if isinstance(_value, float):
+        if math.isnan(_value):
+            return None
+        return _value if math.isfinite(_value) else str(_value)
+    if isinstance(_value, (str, bool, int)):
+        return _value
+    return str(_value)
+
+
+def number_format(_value: int | float, _units: str | None) -> str:
+    """Return the Excel number format of the value, with the units (if any) shown after it."""
+    base = INTEGER_FORMAT if isinstance(_value, int) else DECIMAL_FORMAT
+    if not _units:
+        return base
+    units = _units.replace('"', "'")
+    return f'{base}" {units}"'
+
+
+def _header_row(_ws: WriteOnlyWorksheet, _header: list[str]) -> list[WriteOnlyCell]:
+    cells = []
+    for text in _header:
+        cell = WriteOnlyCell(_ws, text)
+        cell.font = _HEADER_FONT
+        cell.fill = _HEADER_FILL
+        cells.append(cell)
+    return cells
+
+
+def write_table_sheet(_ws: WriteOnlyWorksheet, _df: pd.DataFrame) -> int:
+    """Write the (typed) table, with a header row, to the (write-only) worksheet.
+
+    Arguments:
+    ----------
+        * _ws (WriteOnlyWorksheet): The new worksheet. Nothing may have been added to it yet.
+        * _df (pd.DataFrame): The table, as made by the writers (see iter_tables_from_phpp_data).
+
+    Returns:
+    --------
+        * (int): The number of rows written (not counting the header).
+    """
+    df = _df.reset_index(drop=True)
+    header = [str(name[0] if isinstance(name, tuple) and len(name) == 1 else name) for name in df.columns]
+    if not header:
+        return 0
+    numeric_cols = [i for i, dtype in enumerate(typed_table(df).dtypes) if pd.api.types.is_numeric_dtype(dtype)]
+
+    # -- Set before any row is added: write-only worksheets write out their settings first
+    units_col = header.index(UNITS_COLUMN) if UNITS_COLUMN in header else None
+    label_cols = (units_col + 1) if units_col is not None else 1
+    _ws.freeze_panes = f"{get_column_letter(label_cols + 1)}2"
+    for i, text in enumerate(header, start=1):
+        _ws.column_dimensions[get_column_letter(i)].width = max(10, min(len(text) + 4, 40))
+    _ws.append(_header_row(_ws, header))
+
+    num_rows = 0
+    for row in df.itertuples(index=False, name=None):
+        units = row[units_col] if units_col is not None else None
+        if not isinstance(units, str):
+            units = None  # ie: an all-zero (empty) row
+        row = list(row)
+        for i in numeric_cols:
+            if isinstance(row[i], str):
+                row[i] = pd.to_numeric(row[i])  # ie: a number the writer left as text
+        cells = []
+        for value in map(cell_value, row):
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                cell = WriteOnlyCell(_ws, value)
+                cell.number_format = number_format(value, units)
+                cells.append(cell)
+            else:
+                cells.append(value)
+        _ws.append(cells)
+        num_rows += 1
+    return num_rows
+
+
+def write_xlsx_report(_fileobj: BinaryIO | str, _tables: Iterable[tuple[str, pd.DataFrame]]) -> list[str]:
+    """Write the tables as one .xlsx workbook, one worksheet per table, in order.
+
+    Arguments:
+    ----------
+        * _fileobj (BinaryIO | str): The file (or path) to save the workbook to.
+        * _tables (Iterable[tuple[str, pd.DataFrame]]): The (filename, table) tables, ie: from
+            iter_tables_from_phpp_data. Each is only taken (and released) in turn.
+
+    Returns:
+    --------
+        * (list[str]): The worksheet names, in order.
+    """
+    wb = Workbook(write_only=True)
+    used: set[str] = set()
+    names = []
+    for file_name, df in _tables:
+        ws = wb.create_sheet(sheet_name(file_name, used))
+        write_table_sheet(ws, df)
+        names.append(ws.title)
+    if not names:
+        wb.create_sheet("Sheet")  # A workbook needs at least one worksheet
+    wb.save(_fileobj)
+    return names
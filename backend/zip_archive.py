@@ -0,0 +1,201 @@
+# -*- coding: utf-8 -*-
+# -*- Python Version: 3.11 -*-
+
+"""Build the output .zip from members compressed in parallel (zlib and zstd release the GIL while compressing).
+
+The members are compressed on a thread pool, then written, in order, as one zip file (local
+headers, data, central directory). Only the small, fixed-size zip structures are written here;
+files over 4 GB (zip64) are not needed for CSV outputs, and are refused.
+"""
+
+from concurrent.futures import Executor, ThreadPoolExecutor
+from dataclasses import dataclass
+from functools import partial
+import os
+import pathlib
+import struct
+import threading
+import time
+from typing import BinaryIO, Iterable, Iterator
+import zipfile
+import zlib
+
+# -- Zip compression methods (APPNOTE 4.4.5). Zstandard (93) is read by 7-Zip, libarchive and Python 3.14+.
+ZIP_ZSTANDARD = 93
+COMPRESSION_METHODS = {"stored": zipfile.ZIP_STORED, "deflate": zipfile.ZIP_DEFLATED, "zstd": ZIP_ZSTANDARD}
+DEFAULT_LEVELS = {"stored": None, "deflate": 6, "zstd": 3}
+# -- The allowed levels (zstd's 20+ 'ultra' levels need far more memory, so are left out)
+LEVEL_RANGES = {"stored": range(0, 1), "deflate": range(0, 10), "zstd": range(1, 20)}
+# -- The 'version needed to extract' of each method (x10)
+VERSION_NEEDED = {zipfile.ZIP_STORED: 10, zipfile.ZIP_DEFLATED: 20, ZIP_ZSTANDARD: 63}
+
+_LOCAL_HEADER = struct.Struct("<4s5H3L2H")
+_CENTRAL_HEADER = struct.Struct("<4s6H3L5H2L")
+_END_RECORD = struct.Struct("<4s4H2LH")
+_ZIP32_LIMIT = 0xFFFFFFFF
+
+# -- Below this total size, handing the members to the thread pool costs more than it saves
+PARALLEL_MIN_BYTES = 256 * 1024
+
+# -- The entries of an archive: (name in the zip, data). Data may be a string (written as UTF-8),
+# -- bytes, or the path of a (spilled) file to read.
+ZipEntry = tuple[str, str | bytes | pathlib.Path]
+
+
+@dataclass(frozen=True)
+class ZipCompression:
+    """How the .zip members are compressed: the method ('stored', 'deflate' or 'zstd') and its level.
+
+    A level of None uses the method's default (deflate: 6, zstd: 3).
+    """
+
+    method: str = "deflate"
+    level: int | None = None
+
+    def __post_init__(self):
+        if self.method not in COMPRESSION_METHODS:
+            raise ValueError(f"Unknown zip compression: '{self.method}'. Use one of: {', '.join(COMPRESSION_METHODS)}")
+        if self.level is not None and self.level not in LEVEL_RANGES[self.method]:
+            levels = LEVEL_RANGES[self.method]
+            raise ValueError(f"The {self.method} level must be from {levels.start} to {levels.stop - 1}: {self.level}")
+        if self.method == "zstd":
+            try:
+                import zstandard  # noqa: F401
+            except ImportError:
+                raise ValueError("zstd compression needs the 'zstandard' package, which is not installed.")
+
+    @property
+    def compress_type(self) -> int:
+        return COMPRESSION_METHODS[self.method]
+
+    @property
+    def effective_level(self) -> int | None:
+        return DEFAULT_LEVELS[self.method] if self.level is None else self.level
+
+    @property
+    def label(self) -> str:
+        """ie: 'deflate:6' (part of the result key, as the .ZIP differs by compression)."""
+        return self.method if self.effective_level is None else f"{self.method}:{self.effective_level}"
+
+
+@dataclass
+class CompressedMember:
+    """A zip member, already compressed."""
+
+    name: str
+    data: bytes
+    crc: int
+    size: int
+    compress_type: int
+
+
+def _entry_bytes(_data: str | bytes | pathlib.Path) -> bytes:
+    if isinstance(_data, pathlib.Path):
+        return _data.read_bytes()
+    if isinstance(_data, str):
+        return _data.encode("utf-8")
+    return _data
+
+
+def compress_member(_entry: ZipEntry, _compression: ZipCompression) -> CompressedMember:
+    """Return the entry's data compressed as a zip member. Safe to call from any thread."""
+    name, raw = _entry
+    data = _entry_bytes(raw)
+    level = _compression.effective_level
+    if _compression.method == "deflate":
+        compressor = zlib.compressobj(level, zlib.DEFLATED, -15)  # Raw deflate, as in zip files
+        compressed = compressor.compress(data) + compressor.flush()
+    elif _compression.method == "zstd":
+        import zstandard
+
+        compressed = zstandard.ZstdCompressor(level=level).compress(data)
+    else:
+        compressed = data
+    return CompressedMember(name, compressed, zlib.crc32(data), len(data), _compression.compress_type)
+
+
+def _dos_date_time(_timestamp: float) -> tuple[int, int]:
+    """Return the (date, time) of the timestamp, in the MS-DOS format used by zip files."""
+    year, month, day, hour, minute, second = time.localtime(_timestamp)[:6]
+    return (max(year - 1980, 0) << 9) | (month << 5) | day, (hour << 11) | (minute << 5) | (second // 2)
+
+
+def write_members(_fileobj: BinaryIO, _members: Iterable[CompressedMember]) -> None:
+    """Write the (already compressed) members, in order, as a complete .zip file.
+
+    Arguments:
+    ----------
+        * _fileobj (BinaryIO): The file to write to, from its current position.
+        * _members (Iterable[CompressedMember]): The members. Each is written (and can be freed) as it comes.
+    """
+    dos_date, dos_time = _dos_date_time(time.time())
+    offset = _fileobj.tell()
+    central_directory = []
+    for member in _members:
+        if max(member.size, len(member.data), offset) >= _ZIP32_LIMIT or len(central_directory) >= 0xFFFF:
+            raise ValueError("The zip file is too large (zip64 is not supported).")
+        try:
+            name = member.name.encode("ascii")
+            flags = 0
+        except UnicodeEncodeError:
+            name = member.name.encode("utf-8")
+            flags = 0x800  # The name is UTF-8
+        version = VERSION_NEEDED[member.compress_type]
+        fields = (member.compress_type, dos_time, dos_date, member.crc, len(member.data), member.size, len(name))
+
+        _fileobj.write(_LOCAL_HEADER.pack(b"PK\x03\x04", version, flags, *fields, 0))
+        _fileobj.write(name)
+        _fileobj.write(member.data)
+        made_by = (3 << 8) | version  # Unix
+        attributes = 0o600 << 16  # -rw-------, as zipfile.writestr
+        central_directory.append(
+            _CENTRAL_HEADER.pack(b"PK\x01\x02", made_by, version, flags, *fields, 0, 0, 0, 0, attributes, offset) + name
+        )
+        offset += _LOCAL_HEADER.size + len(name) + len(member.data)
+
+    directory = b"".join(central_directory)
+    _fileobj.write(directory)
+    num = len(central_directory)
+    _fileobj.write(_END_RECORD.pack(b"PK\x05\x06", 0, 0, num, num, len(directory), offset, 0))
+
+
+_executor: ThreadPoolExecutor | None = None
+_executor_lock = threading.Lock()
+
+
+def get_executor(_max_workers: int | None = None) -> ThreadPoolExecutor:
+    """Return the (shared) thread pool the members are compressed on. It is made on first use."""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=_max_workers or min(4, os.cpu_count() or 1), thread_name_prefix="zip_compress"
+            )
+        return _executor
+
+
+def build_zip(
+    _fileobj: BinaryIO,
+    _entries: Iterable[ZipEntry],
+    _compression: ZipCompression = ZipCompression(),
+    _executor: Executor | None = None,
+) -> None:
+    """Write a .zip file of the entries, with each member compressed on the executor (in parallel).
+
+    With no executor, each member is compressed in turn, just before it is written, so only one
+    is held in memory at a time (ie: for spilled outputs).
+
+    Arguments:
+    ----------
+        * _fileobj (BinaryIO): The file to write to.
+        * _entries (Iterable[ZipEntry]): The (name, data) entries, in order.
+        * _compression (ZipCompression): The compression method and level.
+        * _executor (Executor | None): The thread pool to compress the members on.
+    """
+    compress = partial(compress_member, _compression=_compression)
+    members: Iterator[CompressedMember]
+    if _executor is None:
+        members = map(compress, _entries)
+    else:
+        members = _executor.map(compress, _entries)
+    write_members(_fileobj, members)
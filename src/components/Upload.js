@@ -1,4 +1,4 @@
-import { useState } from 'react';
+import { useRef, useState } from 'react';
 import axios from 'axios';
 import '../styles/Upload.css';
 import constants from "../data/constants.json";
@@ -7,6 +7,31 @@ import CloudUploadIcon from '@mui/icons-material/CloudUpload';
 import GridLoader from "react-spinners/GridLoader";
 
 
+// -- The message shown for each of the server's progress stages (see: GET /jobs/{request_id}/events)
+const STAGE_MESSAGES = {
+    received: () => 'Checking the file...',
+    validated: () => 'Reading the PHPP...',
+    sheet: (detail) => `Reading worksheet: ${detail}...`,
+    cached: () => 'Found an earlier result...',
+    coalesced: () => 'Found an identical upload...',
+    parsed: () => 'Writing the CSV files...',
+    csv: (detail) => `Wrote: ${detail}.csv`,
+    partial: (detail) => `Out of time, or failed (see manifest.json): ${detail}`,
+    zipped: () => 'Zipping...',
+};
+
+// -- Files over this size are sent as a resumable upload, in chunks (see: POST /uploads/)
+const CHUNKED_UPLOAD_MIN_BYTES = 8 * 1024 * 1024;
+// -- The times a failed chunk is retried (with a growing wait) before the upload gives up
+const CHUNK_RETRIES = 6;
+
+const sleep = (ms) => new Promise((resolve) => setTimeout(resolve, ms));
+
+const fileSha256 = async (file) => {
+    const digest = await window.crypto.subtle.digest('SHA-256', await file.arrayBuffer());
+    return Array.from(new Uint8Array(digest)).map((b) => b.toString(16).padStart(2, '0')).join('');
+};
+
 const UploadComponent = () => {
     const API_BASE_URL = process.env.REACT_APP_API_URL || constants.RENDER_API_BASE_URL;
     const ROUTE = API_BASE_URL + 'upload';
@@ -16,20 +41,52 @@ const UploadComponent = () => {
     const [uploadProgress, setUploadProgress] = useState(0);
     const [processing, setProcessing] = useState(false);
     const [uploadButtonIsDisabled, setUploadButtonIsDisabled] = useState(true);
+    const [stageMessage, setStageMessage] = useState('');
+    const jobRef = useRef(null);
 
-    const handleUpload = async () => {
-        if (!selectedFile) {
-            alert('Please select a PHPP file to upload.');
+    const followProgress = (requestId) => {
+        // Subscribe before sending the file, so no stage is missed
+        const events = new EventSource(`${API_BASE_URL}jobs/${requestId}/events`);
+        events.addEventListener('progress', (e) => {
+            const event = JSON.parse(e.data);
+            const message = STAGE_MESSAGES[event.stage];
+            if (message) {
+                setStageMessage(`${message(event.detail)} (${event.elapsed_s.toFixed(1)} s)`);
+            } else {
+                // 'done', 'error' or 'cancelled': the stream is over
+                events.close();
+            }
+        });
+        events.onerror = () => events.close();
+        return events;
+    };
+
+    const handleCancel = () => {
+        if (!jobRef.current) {
             return;
         }
+        const { requestId, controller } = jobRef.current;
+        if (requestId) {
+            axios.post(`${API_BASE_URL}jobs/${requestId}/cancel`).catch(() => { });
+        }
+        controller.abort();
+    };
 
-        setProcessing(true);
-        setUploadButtonIsDisabled(true);
-
-        const formData = new FormData();
-        formData.append('file', selectedFile);
+    const finishJob = () => {
+        if (jobRef.current) {
+            if (jobRef.current.events) {
+                jobRef.current.events.close();
+            }
+            jobRef.current = null;
+        }
+        setStageMessage('');
+    };
 
-        axios.post(ROUTE, formData, {
+    // Send the whole file in one request, then process it
+    const uploadWhole = (file, formData, signal) => {
+        formData.append('file', file);
+        return axios.post(ROUTE, formData, {
+            signal,
             responseType: 'blob',
             headers: {
                 'Content-Type': 'multipart/form-data'
@@ -38,8 +95,88 @@ const UploadComponent = () => {
                 const percentCompleted = Math.round((progressEvent.loaded * 100) / progressEvent.total);
                 setUploadProgress(percentCompleted);
             }
-        })
+        });
+    };
+
+    // Send the file in chunks, resuming from the server's offset after any failure, then process it
+    const uploadInChunks = async (file, formData, signal) => {
+        const { data: session } = await axios.post(`${API_BASE_URL}uploads/`, {
+            filename: file.name,
+            size: file.size,
+            sha256: await fileSha256(file),
+        }, { signal });
+        if (session.code === 'uploads_unavailable') {
+            // The server has no resumable uploads (ie: on Windows): send the file whole instead
+            return uploadWhole(file, formData, signal);
+        }
+        if (session.error) {
+            throw new Error(session.error);
+        }
+        const sessionUrl = `${API_BASE_URL}uploads/${session.upload_id}`;
+
+        let offset = session.offset;
+        let failures = 0;
+        while (offset < file.size) {
+            const end = Math.min(offset + session.chunk_size, file.size);
+            try {
+                const { data } = await axios.put(sessionUrl, file.slice(offset, end), {
+                    signal,
+                    headers: {
+                        'Content-Type': 'application/octet-stream',
+                        'Content-Range': `bytes ${offset}-${end - 1}/${file.size}`,
+                    },
+                    onUploadProgress: (progressEvent) => {
+                        setUploadProgress(Math.round(((offset + progressEvent.loaded) * 100) / file.size));
+                    }
+                });
+                if (data.code === 'chunk_in_progress') {
+                    // The server is still receiving the dropped attempt of this chunk: wait, then resume
+                    throw Object.assign(new Error(data.error), { retry: true });
+                }
+                if (data.error && data.offset === undefined) {
+                    throw new Error(data.error);
+                }
+                offset = data.offset;
+                failures = 0;
+            } catch (error) {
+                if (axios.isCancel(error) || !(error.request || error.retry) || ++failures > CHUNK_RETRIES) {
+                    throw error;
+                }
+                await sleep(1000 * 2 ** failures);
+                // Resume from what the server did receive (which may be part of the failed chunk)
+                offset = await axios.get(sessionUrl, { signal }).then(({ data }) => data.offset, () => offset);
+            }
+            setUploadProgress(Math.round((offset * 100) / file.size));
+        }
+        return axios.post(`${sessionUrl}/finish`, formData, { signal, responseType: 'blob' });
+    };
+
+    const handleUpload = async () => {
+        if (!selectedFile) {
+            alert('Please select a PHPP file to upload.');
+            return;
+        }
+
+        setProcessing(true);
+        setUploadButtonIsDisabled(true);
+
+        // The server issues the job's request id, to follow (or cancel) it. Without one, the upload still works.
+        const requestId = await axios.post(`${API_BASE_URL}jobs/`).then(({ data }) => data.request_id, () => null);
+        const controller = new AbortController();
+        jobRef.current = { requestId, controller, events: requestId ? followProgress(requestId) : null };
+
+        const formData = new FormData();
+        if (requestId) {
+            formData.append('request_id', requestId);
+        }
+
+        const request = selectedFile.size >= CHUNKED_UPLOAD_MIN_BYTES
+            ? uploadInChunks(selectedFile, formData, controller.signal)
+            : uploadWhole(selectedFile, formData, controller.signal);
+
+        request
             .then((response) => {
+                finishJob();
                 const contentType = response.headers['content-type'];
                 if (contentType === 'application/zip') {
                     // Create a new Blob object from response data
@@ -87,6 +224,13 @@ const UploadComponent = () => {
                 setUploadButtonIsDisabled(false);
             })
             .catch((error) => {
+                finishJob();
+                if (axios.isCancel(error)) {
+                    setUploadProgress(0.0);
+                    setProcessing(false);
+                    setUploadButtonIsDisabled(false);
+                    return;
+                }
                 console.error('Error:', error);
                 alert('An error occurred while processing the file. Please try again.')
             });
@@ -122,7 +266,7 @@ const UploadComponent = () => {
             >
                 <div>
                     {processing ? <div style={{ display: "flex", alignItems: "center", flexDirection: "row" }}>
-                        <p>Please Wait. Processing...   </p>
+                        <p>Please Wait. {stageMessage || 'Processing...'}   </p>
                         <GridLoader
                             color="#1976d2"
                             loading={processing}
@@ -154,6 +298,9 @@ const UploadComponent = () => {
             >
                 Upload file
             </Button>
+            {processing && <Button onClick={handleCancel} variant="outlined">
+                Cancel
+            </Button>}
         </div>
     );
 };
@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+# -*- Python Version: 3.11 -*-
+
+"""The PHPPData must be left exactly as it was read, by all of the CSV writers."""
+
+import io
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from backend.read_phpp import PHPPData, load_phpp_data
+from backend.sample_workbook import build_sample_workbook
+from backend.write_csv import create_csv_files_from_phpp_data
+
+TABLES = ("df_main", "df_climate", "df_vent", "df_cert_limits", "df_tfa")
+
+
+@pytest.fixture(scope="module")
+def phpp_data() -> PHPPData:
+    return load_phpp_data(io.BytesIO(build_sample_workbook(num_rooms=25)))
+
+
+def _snapshot(_phpp_data: PHPPData) -> dict:
+    """Return a deep copy of every table, and of the compact arrays holding them."""
+    snapshot = {name: getattr(_phpp_data, name).copy(deep=True) for name in TABLES}
+    snapshot["variant_names"] = _phpp_data.variant_names.copy()
+    for name, table in _phpp_data.compact_tables().items():
+        snapshot[f"{name}.values"] = table.values.copy()
+        snapshot[f"{name}.is_int"] = table.is_int.copy()
+        snapshot[f"{name}.labels"] = {i: labels.copy() for i, labels in table.labels.items()}
+        snapshot[f"{name}.other"] = {i: dict(lookup) for i, lookup in table.other.items()}
+    return snapshot
+
+
+def test_phpp_data_unchanged_by_the_writers(phpp_data: PHPPData) -> None:
+    before = _snapshot(phpp_data)
+    csv_files = create_csv_files_from_phpp_data(phpp_data, 5.0, ["Door"], combined_demand_detail=True)
+    after = _snapshot(phpp_data)
+
+    assert csv_files
+    for name in TABLES:
+        if isinstance(before[name], pd.Series):
+            pd.testing.assert_series_equal(after[name], before[name], check_exact=True)
+        else:
+            pd.testing.assert_frame_equal(after[name], before[name], check_exact=True)
+    pd.testing.assert_index_equal(after["variant_names"], before["variant_names"], exact=True)
+    for name, table in phpp_data.compact_tables().items():
+        # -- Bit-identical, NaNs included
+        assert after[f"{name}.values"].tobytes() == before[f"{name}.values"].tobytes()
+        assert np.array_equal(after[f"{name}.is_int"], before[f"{name}.is_int"])
+        assert after[f"{name}.labels"].keys() == before[f"{name}.labels"].keys()
+        for i, labels in before[f"{name}.labels"].items():
+            assert np.array_equal(after[f"{name}.labels"][i].codes, labels.codes)
+            assert after[f"{name}.labels"][i].categories.equals(labels.categories)
+        assert after[f"{name}.other"] == before[f"{name}.other"]
+
+
+def test_compact_arrays_are_read_only(phpp_data: PHPPData) -> None:
+    for name, table in phpp_data.compact_tables().items():
+        assert table.values.flags.writeable is False, name
+        assert table.is_int.flags.writeable is False, name
+        with pytest.raises(ValueError):
+            table.values[...] = 0
+
+
+def test_tables_are_read_only(phpp_data: PHPPData) -> None:
+    df_main = phpp_data.df_main
+    with pytest.raises(ValueError):
+        df_main.loc[df_main.index[0], phpp_data.variant_names[0]] = 1.0
+    with pytest.raises(AttributeError):
+        phpp_data.df_main = df_main